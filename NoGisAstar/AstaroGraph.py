@@ -13,6 +13,8 @@
 #p - change path display mode with pantograph
 #    the default is to just show the path
 #    the second mode shows an animation of the path search
+#f - switch between searching and reading the path off a flow field to the
+#    end (one field shared by every start, only redone after tile edits)
 #enter - creates a random grid of tiles with a start in
 #    the top left and the end in bottom right
 
@@ -24,102 +26,9 @@
 from random import randint
 from itertools import product
 import pantograph
-import math
-import heapq
-
-#a sorted queue, used for getting the best next move
-class PriorityQueue:
-    def __init__(self):
-        self.elements = []
-    
-    def isEmpty(self):
-        return len(self.elements) == 0
-    
-    def push(self, item, priority):
-        heapq.heappush(self.elements, (priority, item))
-    
-    def pop(self):
-        return heapq.heappop(self.elements)[1]
-
-#euclidean distance - for some reason the search path
-#comes out looking like a breadth first search everytime
-#so not good to use if showing the full pathing(slow to draw it all)
-def heuristic1(a, b):
-    x1,y1 = a
-    x2,y2 = a
-    return abs(x1 - x2) + abs(y1 - y2)
-#manhattan distance
-#looks much better if showing the full pathing(not as slow)
-def heuristic2(a, b):
-    dx = abs(a[0] - b[0])
-    dy = abs(a[1] - b[1])
-    return math.sqrt((dx*dx)+(dy*dy))
-
-#the move cost is just an int 1-3
-def cost(grid, next):
-    return grid[next[0]][next[1]]
-
-#performs the A* search on a grid
-def a_star_search(grid, start, end):
-    path_order = [start]
-    open = PriorityQueue()
-    open.push(start, 0)
-    came_from = {}
-    cost_so_far = {}
-    came_from[start] = None
-    cost_so_far[start] = 0
-    
-    #while there is still a move to make
-    while not open.isEmpty():
-        #get next move
-        current = open.pop()
-
-        #add it to path_order
-        path_order.append(current)
-        
-        #if it is the end stop, you've found a path
-        if current == end:
-            break
-        
-        #otherwise check neighbors for possible next moves
-        for next in neighbors(grid, current):
-            #if the neighbor isn't a wall continue checking it
-            if grid[next[0]][next[1]] != -1:
-                #calculate the cost of it
-                new_cost = cost_so_far[current] + cost(grid, next)
-                #if that spot hasn't already been checked or this is a lower 
-                #cost way, add it as a possible next move and update values
-                if next not in cost_so_far or new_cost < cost_so_far[next]:
-                    cost_so_far[next] = new_cost
-                    priority = new_cost + heuristic2(end, next)
-                    open.push(next, priority)
-                    came_from[next] = current
-    #create the path
-    path = []
-    #if a path was found, use came_from to put it in path
-    if end in came_from:
-        previous_step = came_from[end]
-        path.append(end)
-        while previous_step != None:
-            path.append(previous_step)
-            previous_step = came_from[previous_step]
-        path.reverse()
-    
-    return path,path_order
-
-#finds neighbors that are within the grid
-def neighbors(grid, current):
-    size = (len(grid), len(grid[0]))
-    neighbors = []
-    if current[0] > 0:
-        neighbors.append((current[0]-1, current[1]))
-    if current[0] < size[0]-1:
-        neighbors.append((current[0]+1, current[1]))
-    if current[1] > 0:
-        neighbors.append((current[0], current[1]-1))
-    if current[1] < size[1]-1:
-        neighbors.append((current[0], current[1]+1))
-    return neighbors
+from dstarlite import DStarLite
+from flowfield import FlowFields
+from routecache import CachedSearch, TrackedGrid
 
 #The main driver
 class Driver(pantograph.PantographHandler):
@@ -143,7 +52,24 @@ class Driver(pantograph.PantographHandler):
             self.grid.append([])
             for y in range(0,self.h):
                 self.grid[x].append(1)
+        #tile edits move the grid's version, which empties the search cache
+        self.grid = TrackedGrid(self.grid)
+        #kept between searches, tile edits and start moves only redo the
+        #part of the search they touch
+        self.planner = None
+        #searches the planner already answered on this version of the grid
+        #come straight from the cache
+        self.search = CachedSearch(self.plan, cost_model='dstarlite')
+        #flow fields by end tile, dropped when the grid's version moves
+        self.flow = FlowFields(self.grid)
+        self.flowmode = False
     
+    #plans with the planner for the current end, making one if needed
+    def plan(self, grid, start, end):
+        if not self.planner:
+            self.planner = DStarLite(grid, start, end)
+        return self.planner.plan()
+
     #update method is called every frame
     def update(self):
         self.clear_rect(0, 0, self.width, self.height)
@@ -212,13 +138,20 @@ class Driver(pantograph.PantographHandler):
                     else:
                         self.grid[x][y] = self.currtile
                     self.tiles[(x*self.blocksize,y*self.blocksize)] = self.currtile
+                if self.planner:
+                    self.planner.tiles_changed([(x,y)])
                 
         elif e.ctrl_key:
             self.grid[x][y] = 1
             self.start = (x,y)
+            if self.planner:
+                self.planner.tiles_changed([(x,y)])
+                self.planner.move_start(self.start)
         elif e.alt_key:
             self.grid[x][y] = 1
             self.end = (x,y)
+            #the planner searches back from the end, a new end starts over
+            self.planner = None
             
     def on_key_down(self,e):
         #keys 1-3
@@ -231,9 +164,17 @@ class Driver(pantograph.PantographHandler):
         #space
         elif e.key_code == 32:
             if self.start and self.end:
-                self.path,self.path_order = a_star_search(self.grid, self.start, self.end)
+                if self.flowmode:
+                    #nothing is expanded, the animation just walks the path
+                    self.path = self.flow.path(self.start, self.end)
+                    self.path_order = list(self.path)
+                else:
+                    self.path,self.path_order = self.search(self.grid, self.start, self.end)
                 if len(self.path) > 0:
                     self.drawingPath = True
+        #f
+        elif e.key_code == 70:
+            self.flowmode = not self.flowmode
         #p
         elif e.key_code == 80:
             if self.drawpath:
@@ -264,6 +205,9 @@ class Driver(pantograph.PantographHandler):
                         self.tiles[(x*self.blocksize,y*self.blocksize)] = value
                     else:
                         self.grid[x].append(1)
+            self.grid = TrackedGrid(self.grid)
+            self.planner = None
+            self.flow = FlowFields(self.grid)
             self.start = (0,0)
             self.end = (int(self.width/self.blocksize)-1,int(self.height/self.blocksize)-1)
                 
@@ -0,0 +1,193 @@
+#Christopher Silva
+# A* on a numpy copy of the grid. Tiles are flat ids, x * height + y, so an
+#id sorts the same way as its (x, y) tuple and the open list pops tiles in
+#exactly the order a_star_search does, giving the same paths. Costs to the
+#tiles and the tile each was reached from live in arrays made once per
+#grid, and every tile has a bit mask of the moves out of it that stay on the
+#grid and don't run into a wall, so an expansion is a few array lookups
+#instead of building lists of tuples.
+# On 4096x4096 grids a search is about three times as fast as
+#a_star_search and peaks at about a sixth of the memory (benchmarks.py
+#array). What is left per tile is the heap and a handful of array lookups,
+#going much further than that needs compiled code.
+#
+#usage:
+#    engine = ArrayGrid(grid)
+#    path, path_order = engine.search(start, end)
+#    engine.set_tile(x, y, -1)
+
+import heapq
+import math
+
+import numpy as np
+
+from astar import heuristic2
+
+#mask bits of the four moves, in the same order as neighbors()
+LEFT, RIGHT, UP, DOWN = 1, 2, 4, 8
+#came_from bit set once a tile is expanded
+CLOSED = 16
+
+class ArrayGrid:
+    def __init__(self, grid):
+        costs = np.asarray(grid)
+        if costs.ndim != 2:
+            raise ValueError("grid must be 2 dimensional, got shape %r" % (costs.shape,))
+        self.width, self.height = costs.shape
+        #the smallest type that holds every tile value
+        dtype = np.float64
+        if costs.dtype.kind in 'iub':
+            low, high = int(costs.min()), int(costs.max())
+            dtype = next(t for t in (np.int8, np.int16, np.int32, np.int64)
+                         if np.iinfo(t).min <= low and high <= np.iinfo(t).max)
+        self.costs = costs.astype(dtype)
+        cells = self.width * self.height
+        #costs so far, whole numbers for whole number tiles (the most any path
+        #can cost has to fit), the largest value marks a tile not reached yet
+        if dtype == np.float64:
+            self.g = np.full(cells, np.inf)
+        else:
+            most = cells * max(int(self.costs.max()), 1)
+            self.g = np.full(cells, -1, dtype=np.int32 if most < 2**31 - 1 else np.int64)
+            self.g[:] = np.iinfo(self.g.dtype).max
+        self.unreached = self.g[0].item() if cells else None
+        #which of the moves each tile was reached by, a byte instead of an
+        #id, and whether it was expanded yet
+        self.came_from = np.zeros(cells, dtype=np.uint8)
+        self.mask = np.zeros((self.width, self.height), dtype=np.uint8)
+        self.update_mask(0, self.width - 1)
+        #(bit, id offset, x step, y step) of each move
+        self.moves = ((LEFT, -self.height, -1, 0), (RIGHT, self.height, 1, 0),
+                      (UP, -1, 0, -1), (DOWN, 1, 0, 1))
+
+    #works the mask out again for the tiles next to columns low to high
+    def update_mask(self, low, high):
+        low = max(low - 1, 0)
+        high = min(high + 1, self.width - 1)
+        #the tiles that can be moved onto, one column wider on each side
+        first = max(low - 1, 0)
+        open = self.costs[first:high + 2] != -1
+        columns = open[low - first:high - first + 1]
+        mask = np.zeros(columns.shape, dtype=np.uint8)
+        if low > 0:
+            mask |= np.where(open[low - first - 1:high - first], LEFT, 0).astype(np.uint8)
+        else:
+            mask[1:] |= np.where(open[:high - first], LEFT, 0).astype(np.uint8)
+        if high < self.width - 1:
+            mask |= np.where(open[low - first + 1:high - first + 2], RIGHT, 0).astype(np.uint8)
+        else:
+            mask[:-1] |= np.where(open[low - first + 1:], RIGHT, 0).astype(np.uint8)
+        mask[:, 1:] |= np.where(columns[:, :-1], UP, 0).astype(np.uint8)
+        mask[:, :-1] |= np.where(columns[:, 1:], DOWN, 0).astype(np.uint8)
+        self.mask[low:high + 1] = mask
+
+    #changes one tile, only the masks of the tiles next to it move
+    def set_tile(self, x, y, value):
+        self.costs[x, y] = value
+        self.update_mask(x, x)
+
+    #same as a_star_search, path_order holds the start and then every tile
+    #as it is expanded
+    def search(self, start, end, heuristic=heuristic2):
+        path, order = self.search_ids(start, end, heuristic)
+        height = self.height
+        return ([divmod(u, height) for u in path.tolist()],
+                [divmod(u, height) for u in order.tolist()])
+
+    #search with the path and path_order as arrays of flat ids, which hold a
+    #big search's order in a fraction of the memory of a list of tuples
+    def search_ids(self, start, end, heuristic=heuristic2):
+        height = self.height
+        source = start[0] * height + start[1]
+        target = end[0] * height + end[1]
+        ex, ey = end
+        cost = memoryview(self.costs.reshape(-1))
+        mask = memoryview(self.mask.reshape(-1))
+        g = memoryview(self.g)
+        came_from = memoryview(self.came_from)
+        unreached = self.unreached
+        moves = self.moves
+        sqrt = math.sqrt
+        push = heapq.heappush
+        pop = heapq.heappop
+        euclidean = heuristic is heuristic2
+        #squared distance to the end along each column and row, so the
+        #euclidean heuristic is two lookups and a sqrt
+        xs = [(ex - x) * (ex - x) for x in range(self.width)] if euclidean else None
+        ys = [(ey - y) * (ey - y) for y in range(height)] if euclidean else None
+
+        g[source] = 0
+        order = [source]
+        append = order.append
+        open = [(0, source)]
+        try:
+            while open:
+                current = pop(open)[1]
+                #a cheaper way here was found after this copy was pushed
+                reached_by = came_from[current]
+                if reached_by & CLOSED:
+                    continue
+                came_from[current] = reached_by | CLOSED
+                g_current = g[current]
+                append(current)
+                if current == target:
+                    break
+                bits = mask[current]
+                cx, cy = divmod(current, height)
+                #the four moves written out, a loop over moves costs a
+                #tuple unpack for each of them
+                if bits & LEFT:
+                    next = current - height
+                    new_cost = g_current + cost[next]
+                    if new_cost < g[next]:
+                        g[next] = new_cost
+                        came_from[next] = LEFT
+                        push(open, (new_cost + (sqrt(xs[cx - 1] + ys[cy]) if euclidean
+                                                else heuristic(end, (cx - 1, cy))), next))
+                if bits & RIGHT:
+                    next = current + height
+                    new_cost = g_current + cost[next]
+                    if new_cost < g[next]:
+                        g[next] = new_cost
+                        came_from[next] = RIGHT
+                        push(open, (new_cost + (sqrt(xs[cx + 1] + ys[cy]) if euclidean
+                                                else heuristic(end, (cx + 1, cy))), next))
+                if bits & UP:
+                    next = current - 1
+                    new_cost = g_current + cost[next]
+                    if new_cost < g[next]:
+                        g[next] = new_cost
+                        came_from[next] = UP
+                        push(open, (new_cost + (sqrt(xs[cx] + ys[cy - 1]) if euclidean
+                                                else heuristic(end, (cx, cy - 1))), next))
+                if bits & DOWN:
+                    next = current + 1
+                    new_cost = g_current + cost[next]
+                    if new_cost < g[next]:
+                        g[next] = new_cost
+                        came_from[next] = DOWN
+                        push(open, (new_cost + (sqrt(xs[cx] + ys[cy + 1]) if euclidean
+                                                else heuristic(end, (cx, cy + 1))), next))
+
+            #create the path, stepping back against each tile's move
+            path = []
+            if g[target] != unreached:
+                back = dict((bit, offset) for bit, offset, _, _ in moves)
+                step = target
+                path.append(step)
+                while step != source:
+                    step -= back[came_from[step] & ~CLOSED]
+                    path.append(step)
+                path.reverse()
+        finally:
+            #only the tiles this search reached have to be cleared, each was
+            #either expanded or is still on the open list
+            order = np.array(order, dtype=np.int64)
+            touched = np.concatenate([order, np.array([u for _, u in open], dtype=np.int64)])
+            self.g[touched] = unreached
+            self.came_from[touched] = 0
+        return np.array(path, dtype=np.int64), order
+
+#a_star_search on an ArrayGrid made from grid, for a one off search
+def array_a_star_search(grid, start, end, heuristic=heuristic2):
+    return ArrayGrid(grid).search(start, end, heuristic)
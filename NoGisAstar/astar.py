@@ -0,0 +1,312 @@
+#Christopher Silva
+# The A* search used by AstaroGraph, kept apart from the drawing code so it
+#can be run and timed without pantograph. The grid is indexed grid[x][y],
+#each tile holds the cost of moving onto it and -1 is a wall.
+
+#resources - starting A* code taken from http://www.redblobgames.com/pathfinding/a-star/implementation.html
+
+import math
+import heapq
+
+#a sorted queue, used for getting the best next move. Pushing an item that
+#is already in it adds a second copy, the out of date one still comes off
+#later and has to be skipped
+class PriorityQueue:
+    def __init__(self):
+        self.elements = []
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.pops = 0
+        self.peak = 0
+    
+    def isEmpty(self):
+        return len(self.elements) == 0
+    
+    def push(self, item, priority):
+        heapq.heappush(self.elements, (priority, item))
+        self.pushes += 1
+        if len(self.elements) > self.peak:
+            self.peak = len(self.elements)
+    
+    def pop(self):
+        self.pops += 1
+        return heapq.heappop(self.elements)[1]
+
+#a sorted queue that holds each item once. A binary heap of (priority, item)
+#with every item's place in it kept in index, so pushing an item already in
+#the queue with a lower priority moves it up where it is (decrease-key)
+#instead of adding a copy. Equal priorities come off smallest item first,
+#the same order as PriorityQueue, so searches find the same paths
+class IndexedPriorityQueue:
+    def __init__(self):
+        self.elements = []
+        self.index = {}
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.pops = 0
+        self.peak = 0
+
+    def isEmpty(self):
+        return len(self.elements) == 0
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    #adds item, or lowers its priority if it is already in the queue, a
+    #priority no lower than the one it has is ignored. True if anything moved
+    def push(self, item, priority):
+        entry = (priority, item)
+        place = self.index.get(item)
+        if place is None:
+            place = len(self.elements)
+            self.elements.append(entry)
+            self.pushes += 1
+            if place + 1 > self.peak:
+                self.peak = place + 1
+        elif entry < self.elements[place]:
+            self.decrease_keys += 1
+        else:
+            return False
+        self._up(place, entry)
+        return True
+
+    def pop(self):
+        elements = self.elements
+        top = elements[0]
+        last = elements.pop()
+        del self.index[top[1]]
+        if elements:
+            self._down(0, last)
+        self.pops += 1
+        return top[1]
+
+    #moves entry from place towards the top until its parent is smaller
+    def _up(self, place, entry):
+        elements = self.elements
+        index = self.index
+        while place > 0:
+            parent = (place - 1) >> 1
+            above = elements[parent]
+            if not entry < above:
+                break
+            elements[place] = above
+            index[above[1]] = place
+            place = parent
+        elements[place] = entry
+        index[entry[1]] = place
+
+    #puts entry in at place, the top, moving the smaller child up until
+    #reaching the bottom and then entry back up to where it belongs (fewer
+    #comparisons than stopping on the way down, the same as heapq does)
+    def _down(self, place, entry):
+        elements = self.elements
+        index = self.index
+        size = len(elements)
+        child = 2 * place + 1
+        while child < size:
+            if child + 1 < size and not elements[child] < elements[child + 1]:
+                child += 1
+            below = elements[child]
+            elements[place] = below
+            index[below[1]] = place
+            place = child
+            child = 2 * place + 1
+        self._up(place, entry)
+
+#euclidean distance - for some reason the search path
+#comes out looking like a breadth first search everytime
+#so not good to use if showing the full pathing(slow to draw it all)
+def heuristic1(a, b):
+    x1,y1 = a
+    x2,y2 = a
+    return abs(x1 - x2) + abs(y1 - y2)
+#manhattan distance
+#looks much better if showing the full pathing(not as slow)
+def heuristic2(a, b):
+    dx = abs(a[0] - b[0])
+    dy = abs(a[1] - b[1])
+    return math.sqrt((dx*dx)+(dy*dy))
+
+#the move cost is just an int 1-3
+def cost(grid, next):
+    return grid[next[0]][next[1]]
+
+#performs the A* search on a grid, a heuristic of zero makes it Dijkstra.
+#queue is the open list's class, PriorityQueue pushes a copy for every
+#cheaper way found and skips the old one when it comes off (a stale pop),
+#IndexedPriorityQueue lowers the tile's priority in place. Both give the same
+#path and path_order, the indexed one keeps the open list smaller but is
+#slower in python than heapq. If stats is a dict these are added to it:
+#    expansions - tiles expanded
+#    pushes - tiles put on the open list
+#    decrease_keys - priorities lowered in place
+#    pops - everything taken off the open list, stale or not
+#    stale_pops - out of date copies taken off and skipped
+#    peak_open - the most the open list held at once
+def a_star_search(grid, start, end, heuristic=heuristic2, stats=None, queue=PriorityQueue):
+    path_order = [start]
+    open = queue()
+    open.push(start, 0)
+    came_from = {}
+    cost_so_far = {}
+    #the cost each tile had when it was expanded
+    closed = {}
+    stale = 0
+    came_from[start] = None
+    cost_so_far[start] = 0
+    
+    #while there is still a move to make
+    while not open.isEmpty():
+        #get next move
+        current = open.pop()
+        #an out of date copy, this tile was already expanded at its cost
+        #(only a heuristic that can overestimate a step finds a cheaper way
+        #to an expanded tile, it is expanded again then)
+        if closed.get(current) == cost_so_far[current]:
+            stale += 1
+            continue
+        closed[current] = cost_so_far[current]
+
+        #add it to path_order
+        path_order.append(current)
+        
+        #if it is the end stop, you've found a path
+        if current == end:
+            break
+        
+        #otherwise check neighbors for possible next moves
+        for next in neighbors(grid, current):
+            #if the neighbor isn't a wall continue checking it
+            if grid[next[0]][next[1]] != -1:
+                #calculate the cost of it
+                new_cost = cost_so_far[current] + cost(grid, next)
+                #if that spot hasn't already been checked or this is a lower 
+                #cost way, add it as a possible next move and update values
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    priority = new_cost + heuristic(end, next)
+                    open.push(next, priority)
+                    came_from[next] = current
+    if stats is not None:
+        for key, value in (("expansions", len(path_order) - 1), ("pushes", open.pushes),
+                           ("decrease_keys", open.decrease_keys), ("pops", open.pops),
+                           ("stale_pops", stale)):
+            stats[key] = stats.get(key, 0) + value
+        stats["peak_open"] = max(stats.get("peak_open", 0), open.peak)
+    #create the path
+    path = []
+    #if a path was found, use came_from to put it in path
+    if end in came_from:
+        previous_step = came_from[end]
+        path.append(end)
+        while previous_step != None:
+            path.append(previous_step)
+            previous_step = came_from[previous_step]
+        path.reverse()
+    
+    return path,path_order
+
+#finds neighbors that are within the grid
+def neighbors(grid, current):
+    size = (len(grid), len(grid[0]))
+    neighbors = []
+    if current[0] > 0:
+        neighbors.append((current[0]-1, current[1]))
+    if current[0] < size[0]-1:
+        neighbors.append((current[0]+1, current[1]))
+    if current[1] > 0:
+        neighbors.append((current[0], current[1]-1))
+    if current[1] < size[1]-1:
+        neighbors.append((current[0], current[1]+1))
+    return neighbors
+
+#performs A* from both ends at once, the forward search from start and a
+#backward search from end over the same moves reversed (moving onto a tile
+#still costs that tile). Both use half the difference of the distances to
+#end and to start (by heuristic) as the heuristic, which keeps the two searches agreeing,
+#so the search is done once the two smallest priorities add up to the
+#cheapest meeting found so far. Returns the same (path, path_order) as
+#a_star_search, path_order holding the tiles of both searches as they are
+#expanded
+def bidirectional_search(grid, start, end, heuristic=heuristic2):
+    path_order = [start]
+    if start == end:
+        return [start], path_order
+    #nothing can move onto a wall, so a wall at the end can't be reached
+    if grid[end[0]][end[1]] == -1:
+        return [], path_order
+
+    def potential(tile):
+        return (heuristic(end, tile) - heuristic(start, tile)) / 2
+
+    open_f = PriorityQueue()
+    open_b = PriorityQueue()
+    open_f.push(start, 0)
+    open_b.push(end, 0)
+    came_from_f = {start: None}
+    came_from_b = {end: None}
+    cost_f = {start: 0}
+    cost_b = {end: 0}
+    closed_f = set()
+    closed_b = set()
+    best = float('inf')
+    meet = None
+
+    #while both searches still have a move to make
+    while not open_f.isEmpty() and not open_b.isEmpty():
+        top_f = open_f.elements[0][0]
+        top_b = open_b.elements[0][0]
+        #no meeting left to find can beat the best one
+        if top_f + top_b >= best:
+            break
+        if top_f <= top_b:
+            current = open_f.pop()
+            if current in closed_f:
+                continue
+            closed_f.add(current)
+            path_order.append(current)
+            for next in neighbors(grid, current):
+                if grid[next[0]][next[1]] != -1:
+                    new_cost = cost_f[current] + cost(grid, next)
+                    if next not in cost_f or new_cost < cost_f[next]:
+                        cost_f[next] = new_cost
+                        came_from_f[next] = current
+                        open_f.push(next, new_cost + potential(next))
+                        if next in cost_b and new_cost + cost_b[next] < best:
+                            best = new_cost + cost_b[next]
+                            meet = next
+        else:
+            current = open_b.pop()
+            if current in closed_b:
+                continue
+            closed_b.add(current)
+            path_order.append(current)
+            #moving from previous onto current costs current's tile
+            for previous in neighbors(grid, current):
+                if grid[previous[0]][previous[1]] != -1 or previous == start:
+                    new_cost = cost_b[current] + cost(grid, current)
+                    if previous not in cost_b or new_cost < cost_b[previous]:
+                        cost_b[previous] = new_cost
+                        came_from_b[previous] = current
+                        open_b.push(previous, new_cost - potential(previous))
+                        if previous in cost_f and new_cost + cost_f[previous] < best:
+                            best = new_cost + cost_f[previous]
+                            meet = previous
+
+    #create the path, start to meet from came_from_f then on to end
+    path = []
+    if meet is not None:
+        step = meet
+        while step != None:
+            path.append(step)
+            step = came_from_f[step]
+        path.reverse()
+        step = came_from_b[meet]
+        while step != None:
+            path.append(step)
+            step = came_from_b[step]
+
+    return path,path_order
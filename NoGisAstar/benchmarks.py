@@ -0,0 +1,533 @@
+#Christopher Silva
+# Timing comparisons for the grid searches in astar.py, run on random grids
+#made the same way as the enter key in AstaroGraph (mostly dirt, some sand,
+#water and walls) between random start and end tiles. Run from the
+#NoGisAstar folder:
+#    python benchmarks.py bidir [--sizes 64 128 256] [--trials N] [--seed S]
+#    python benchmarks.py isochrone [--sizes 64 128 256] [--trials N] [--seed S]
+#    python benchmarks.py replan [--sizes 64 128 256] [--trials N] [--seed S] [--edits E]
+#    python benchmarks.py array [--sizes 1024 2048 4096] [--trials N] [--seed S]
+#    python benchmarks.py jps [--sizes 128 256 512] [--trials N] [--seed S]
+#    python benchmarks.py hpa [--sizes 256 512 1024] [--trials N] [--seed S] [--cluster C]
+#    python benchmarks.py flow [--sizes 64 128 256] [--trials N] [--seed S] [--agents A]
+#    python benchmarks.py queue [--sizes 64 128 256] [--trials N] [--seed S]
+#    python benchmarks.py suite [--sizes 64 128 256] [--trials N] [--seed S] [-o results.json]
+#    python benchmarks.py compare old.json new.json [--threshold T]
+# suite runs every search on the same seeded short, medium and long problems
+#at each size and writes the latency percentiles, expansions, peak memory and
+#throughput as json (with the commit it ran on), along with the mean time per
+#grid spent building the hpa graphs and flow fields before their searches.
+#compare lines up two such files and flags searches that got slower. The report and the comparison
+#come from shared/benchreport.py, which ProjAstar-1 uses too.
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from arrayastar import ArrayGrid, array_a_star_search
+from astar import IndexedPriorityQueue, PriorityQueue, a_star_search, bidirectional_search, heuristic2
+from dstarlite import DStarLite
+from flowfield import FlowFields
+from hpa import HierarchicalGrid
+from jps import jump_point_search
+from isochrone import isochrone, reachable_within
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from benchreport import compareResults, percentile, writeReport
+
+#same odds as the enter key, 1 in 20 each for a wall, sand and water
+def random_grid(w, h, rng):
+    grid = []
+    for x in range(0, w):
+        grid.append([])
+        for y in range(0, h):
+            value = rng.randint(1,20)
+            if value > 1 and value < 5:
+                grid[x].append(-1 if value == 4 else value)
+            else:
+                grid[x].append(1)
+    return grid
+
+#a grid with random start and end tiles, set to dirt like ctrl and alt
+#clicking does
+def random_problem(w, h, rng):
+    grid = random_grid(w, h, rng)
+    start = (rng.randrange(w), rng.randrange(h))
+    end = (rng.randrange(w), rng.randrange(h))
+    grid[start[0]][start[1]] = 1
+    grid[end[0]][end[1]] = 1
+    return grid, start, end
+
+def no_heuristic(a, b):
+    return 0
+
+#cost of a path, every tile after the first is paid for
+def path_cost(grid, path):
+    return sum(grid[x][y] for x,y in path[1:])
+
+#runs search on every (grid, start, end), returns (costs, expansions, seconds)
+def run_search(search, problems):
+    costs = []
+    expanded = []
+    seconds = []
+    for grid, start, end in problems:
+        begin = time.perf_counter()
+        path,path_order = search(grid, start, end)
+        seconds.append(time.perf_counter() - begin)
+        costs.append(path_cost(grid, path) if path else None)
+        #path_order starts with the start tile before anything is expanded
+        expanded.append(len(path_order) - 1)
+    return costs, expanded, seconds
+
+def bench_bidirectional(sizes, trials, seed):
+    rng = random.Random(seed)
+    print("%-6s %-14s %12s %10s" % ("size", "search", "mean expand", "mean ms"))
+    for size in sizes:
+        problems = [random_problem(size, size, rng) for _ in range(trials)]
+        base_costs = None
+        for label, search, heuristic in (("astar", a_star_search, heuristic2),
+                                         ("bidir astar", bidirectional_search, heuristic2),
+                                         ("dijkstra", a_star_search, no_heuristic),
+                                         ("bidir dijkstra", bidirectional_search, no_heuristic)):
+            costs, e, s = run_search(lambda g, a, b: search(g, a, b, heuristic), problems)
+            if base_costs is None:
+                base_costs = costs
+            elif costs != base_costs:
+                raise AssertionError("%s and astar costs differ on %dx%d" % (label, size, size))
+            print("%-6d %-14s %12.1f %10.3f" % (size, label, sum(e) / len(e), 1000.0 * sum(s) / len(s)))
+
+#time to find every tile within a few budgets of a random start, against a
+#search with no budget (the whole reachable grid)
+def bench_isochrone(sizes, trials, seed):
+    rng = random.Random(seed)
+    print("%-6s %-18s %12s %10s" % ("size", "budget", "mean tiles", "mean ms"))
+    for size in sizes:
+        problems = [random_problem(size, size, rng) for _ in range(trials)]
+        for budget in (size // 4, size, float('inf')):
+            for hull in (None, 'convex', 'concave'):
+                tiles = 0
+                begin = time.perf_counter()
+                for grid, start, end in problems:
+                    tiles += len(isochrone(grid, [start], budget, hull)[0])
+                seconds = time.perf_counter() - begin
+                print("%-6d %-18s %12.1f %10.3f" % (size, "%g %s" % (budget, hull or "tiles only"),
+                                                    tiles / trials, 1000.0 * seconds / trials))
+        #every start and end tile at once
+        grid = problems[0][0]
+        starts = [p[1] for p in problems] + [p[2] for p in problems]
+        begin = time.perf_counter()
+        ids, _ = reachable_within(grid, starts, size // 4)
+        print("%-6d %d starts at once, budget %d: %d tiles in %.3f ms" %
+              (size, len(starts), size // 4, len(ids), 1000.0 * (time.perf_counter() - begin)))
+
+#an agent walking to its end tile while random tiles change under it: after
+#every step edits tiles are set to random values and the path is planned
+#again, by D* Lite keeping its search and by a fresh a_star_search
+def bench_replan(sizes, trials, seed, edits=5):
+    rng = random.Random(seed)
+    print("%-6s %-11s %8s %12s %10s" % ("size", "search", "plans", "mean expand", "mean ms"))
+    for size in sizes:
+        totals = {"dstar first": [0, 0, 0.0], "astar": [0, 0, 0.0], "dstar lite": [0, 0, 0.0]}
+        for _ in range(trials):
+            grid, start, end = random_problem(size, size, rng)
+            begin = time.perf_counter()
+            planner = DStarLite(grid, start, end)
+            path, path_order = planner.plan()
+            totals["dstar first"][0] += 1
+            totals["dstar first"][1] += len(path_order) - 1
+            totals["dstar first"][2] += time.perf_counter() - begin
+            while len(path) > 1:
+                planner.move_start(path[1])
+                changed = []
+                for _ in range(edits):
+                    x, y = rng.randrange(size), rng.randrange(size)
+                    if (x, y) != planner.start and (x, y) != end:
+                        grid[x][y] = rng.choice([-1, 1, 1, 2, 3])
+                        changed.append((x, y))
+                begin = time.perf_counter()
+                planner.tiles_changed(changed)
+                path, path_order = planner.plan()
+                seconds = time.perf_counter() - begin
+                totals["dstar lite"][0] += 1
+                totals["dstar lite"][1] += len(path_order) - 1
+                totals["dstar lite"][2] += seconds
+                begin = time.perf_counter()
+                check, check_order = a_star_search(grid, planner.start, end)
+                seconds = time.perf_counter() - begin
+                totals["astar"][0] += 1
+                totals["astar"][1] += len(check_order) - 1
+                totals["astar"][2] += seconds
+                if path_cost(grid, path) != path_cost(grid, check) or bool(path) != bool(check):
+                    raise AssertionError("dstar lite and astar costs differ on %dx%d" % (size, size))
+        for label in ("dstar first", "astar", "dstar lite"):
+            plans, expanded, seconds = totals[label]
+            print("%-6d %-11s %8d %12.1f %10.3f" % (size, label, plans, expanded / max(plans, 1),
+                                                    1000.0 * seconds / max(plans, 1)))
+
+#a maze of dirt corridors one tile wide between walls, carved by a random
+#depth first walk over every other tile, with a few extra walls knocked out
+#so there is more than one way through
+def random_maze(w, h, rng, loops=0.05):
+    grid = [[-1] * h for _ in range(w)]
+    grid[0][0] = 1
+    stack = [(0, 0)]
+    while stack:
+        x, y = stack[-1]
+        options = [(dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                   if 0 <= x + dx < w and 0 <= y + dy < h and grid[x + dx][y + dy] == -1]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        grid[x + dx // 2][y + dy // 2] = 1
+        grid[x + dx][y + dy] = 1
+        stack.append((x + dx, y + dy))
+    for _ in range(int(loops * w * h)):
+        grid[rng.randrange(w)][rng.randrange(h)] = 1
+    return grid
+
+#open ground, all dirt with a few rectangular blocks of wall
+def block_grid(w, h, rng):
+    grid = [[1] * h for _ in range(w)]
+    for _ in range(max(1, w * h // 2000)):
+        bw, bh = rng.randint(2, w // 8 + 2), rng.randint(2, h // 8 + 2)
+        x, y = rng.randrange(w - bw), rng.randrange(h - bh)
+        for i in range(x, x + bw):
+            for j in range(y, y + bh):
+                grid[i][j] = -1
+    return grid
+
+#a_star_search against jump_point_search on random, maze and block grids,
+#between tiles at opposite corners, counting open list pushes and pops
+def bench_jps(sizes, trials, seed):
+    rng = random.Random(seed)
+    print("%-6s %-7s %-6s %12s %12s %12s %10s" % ("size", "grid", "search", "mean expand", "mean pushes",
+                                                  "mean pops", "mean ms"))
+    for size in sizes:
+        for kind, make in (("random", random_grid), ("maze", random_maze), ("blocks", block_grid)):
+            problems = []
+            for _ in range(trials):
+                grid = make(size, size, rng)
+                start = (rng.randrange(size // 8), rng.randrange(size // 8))
+                end = (size - 1 - rng.randrange(size // 8), size - 1 - rng.randrange(size // 8))
+                #mazes only have corridors on even tiles
+                if kind == "maze":
+                    start = (start[0] // 2 * 2, start[1] // 2 * 2)
+                    end = ((size - 1) // 2 * 2 - start[0] % 2, (size - 1) // 2 * 2)
+                grid[start[0]][start[1]] = 1
+                grid[end[0]][end[1]] = 1
+                problems.append((grid, start, end))
+            base_costs = None
+            for label, search in (("astar", a_star_search), ("jps", jump_point_search)):
+                stats = {}
+                costs, expanded, seconds = run_search(lambda g, a, b: search(g, a, b, stats=stats), problems)
+                if base_costs is None:
+                    base_costs = costs
+                elif costs != base_costs:
+                    raise AssertionError("jps and astar costs differ on %s %dx%d" % (kind, size, size))
+                print("%-6d %-7s %-6s %12.1f %12.1f %12.1f %10.3f" %
+                      (size, kind, label, sum(expanded) / float(trials), stats["pushes"] / float(trials),
+                       stats["pops"] / float(trials), 1000.0 * sum(seconds) / trials))
+
+#a_star_search against HierarchicalGrid.search on one random grid per size
+#between random start and end tiles. Building the abstract graph is timed on
+#its own, and so is an edit: one random tile changed and its clusters redone
+def bench_hpa(sizes, trials, seed, cluster_size=16):
+    rng = random.Random(seed)
+    print("%-6s %10s %10s %10s %8s %10s %10s %10s" % ("size", "build ms", "astar ms", "hpa ms", "speedup",
+                                                      "extra %", "edit ms", "rebuilt"))
+    for size in sizes:
+        grid = random_grid(size, size, rng)
+        begin = time.perf_counter()
+        graph = HierarchicalGrid(grid, cluster_size)
+        build = time.perf_counter() - begin
+        problems = []
+        for _ in range(trials):
+            start = (rng.randrange(size), rng.randrange(size))
+            end = (rng.randrange(size), rng.randrange(size))
+            grid[start[0]][start[1]] = 1
+            grid[end[0]][end[1]] = 1
+            problems.append((grid, start, end))
+        graph.tiles_changed([tile for _, start, end in problems for tile in (start, end)])
+
+        costs, _, flat = run_search(a_star_search, problems)
+        found, _, seconds = run_search(lambda g, a, b: graph.search(a, b), problems)
+        if [c is None for c in costs] != [c is None for c in found]:
+            raise AssertionError("hpa and astar disagree on which ends can be reached on %dx%d" % (size, size))
+        extra = [f / float(c) - 1 for c, f in zip(costs, found) if c]
+
+        edits = []
+        graph.rebuilt = 0
+        for _ in range(trials):
+            x, y = rng.randrange(size), rng.randrange(size)
+            grid[x][y] = rng.choice([-1, 1, 2, 3])
+            begin = time.perf_counter()
+            graph.tiles_changed([(x, y)])
+            edits.append(time.perf_counter() - begin)
+        print("%-6d %10.1f %10.3f %10.3f %7.1fx %10.2f %10.3f %10.2f" %
+              (size, 1000.0 * build, 1000.0 * sum(flat) / trials, 1000.0 * sum(seconds) / trials,
+               sum(flat) / sum(seconds), 100.0 * sum(extra) / max(len(extra), 1),
+               1000.0 * sum(edits) / trials, graph.rebuilt / float(trials)))
+
+#agents spread over one random grid per size all heading to the same end,
+#a_star_search once per agent (timed on the first trials agents only, the
+#total is that mean times the agents) against building one flow field and
+#reading every agent's path off it
+def bench_flow(sizes, trials, seed, agents=1000):
+    rng = random.Random(seed)
+    print("%-6s %8s %12s %12s %12s %12s %12s" % ("size", "agents", "astar ms", "field ms", "read ms",
+                                                  "astar total", "flow total"))
+    for size in sizes:
+        grid = random_grid(size, size, rng)
+        end = (rng.randrange(size), rng.randrange(size))
+        grid[end[0]][end[1]] = 1
+        starts = [(rng.randrange(size), rng.randrange(size)) for _ in range(agents)]
+        for x, y in starts:
+            grid[x][y] = 1
+        problems = [(grid, start, end) for start in starts[:trials]]
+        costs, _, seconds = run_search(a_star_search, problems)
+        astar = sum(seconds) / len(seconds)
+
+        fields = FlowFields(grid)
+        begin = time.perf_counter()
+        field = fields.field(end)
+        build = time.perf_counter() - begin
+        begin = time.perf_counter()
+        paths = fields.paths(starts, end)
+        read = (time.perf_counter() - begin) / agents
+        if [path_cost(grid, path) if path else None for path in paths[:trials]] != costs:
+            raise AssertionError("flow field and astar costs differ on %dx%d" % (size, size))
+        print("%-6d %8d %12.3f %12.1f %12.3f %12.1f %12.1f" %
+              (size, agents, 1000.0 * astar, 1000.0 * build, 1000.0 * read,
+               1000.0 * astar * agents, 1000.0 * (build + read * agents)))
+
+#the open list counters of a_star_search with PriorityQueue (a copy pushed
+#for every cheaper way found) against IndexedPriorityQueue (decrease-key), with
+#the euclidean heuristic and without one, on the same random problems
+def bench_queue(sizes, trials, seed):
+    rng = random.Random(seed)
+    print("%-6s %-10s %-8s %10s %10s %10s %10s %10s %10s" % ("size", "heuristic", "queue", "expand", "pushes",
+                                                             "decrease", "stale", "peak open", "mean ms"))
+    for size in sizes:
+        problems = [random_problem(size, size, rng) for _ in range(trials)]
+        for name, heuristic in (("euclidean", heuristic2), ("none", no_heuristic)):
+            base_costs = None
+            for label, queue in (("lazy", PriorityQueue), ("indexed", IndexedPriorityQueue)):
+                stats = {}
+                costs, _, seconds = run_search(
+                    lambda g, a, b: a_star_search(g, a, b, heuristic, stats, queue), problems)
+                if base_costs is None:
+                    base_costs = costs
+                elif costs != base_costs:
+                    raise AssertionError("queues found different costs on %dx%d" % (size, size))
+                print("%-6d %-10s %-8s %10.1f %10.1f %10.1f %10.1f %10d %10.3f" %
+                      (size, name, label, stats["expansions"] / float(trials), stats["pushes"] / float(trials),
+                       stats["decrease_keys"] / float(trials), stats["stale_pops"] / float(trials),
+                       stats["peak_open"], 1000.0 * sum(seconds) / trials))
+
+#random_grid as a numpy array, for grids too big to fill a tile at a time
+def random_cost_array(w, h, rng):
+    value = rng.integers(1, 21, (w, h))
+    return np.where(value == 4, -1, np.where((value == 2) | (value == 3), value, 1)).astype(np.int8)
+
+#bytes held by a grid as a list of columns (small ints are shared)
+def grid_bytes(grid):
+    return sys.getsizeof(grid) + sum(sys.getsizeof(column) for column in grid)
+
+#a_star_search against ArrayGrid.search on big grids, the end a quarter of
+#the grid away from the start. Peak memory is measured on the first problem
+#only, tracemalloc slows both searches down a lot
+def bench_array(sizes, trials, seed):
+    rng = np.random.default_rng(seed)
+    print("%-6s %-8s %12s %10s %12s %14s %14s" % ("size", "search", "mean expand", "mean ms", "setup ms",
+                                                  "grid bytes", "peak bytes"))
+    for size in sizes:
+        costs = random_cost_array(size, size, rng)
+        grid = costs.tolist()
+        begin = time.perf_counter()
+        engine = ArrayGrid(costs)
+        setup = time.perf_counter() - begin
+        engine_bytes = engine.costs.nbytes + engine.mask.nbytes + engine.g.nbytes + engine.came_from.nbytes
+        problems = []
+        for _ in range(trials):
+            start = tuple(int(v) for v in rng.integers(0, size - size // 4, 2))
+            end = (start[0] + size // 4, start[1] + size // 8)
+            for x, y in (start, end):
+                grid[x][y] = 1
+                engine.set_tile(x, y, 1)
+            problems.append((grid, start, end))
+        rows = []
+        def array_search(grid, start, end):
+            path, order = engine.search_ids(start, end)
+            return [divmod(u, size) for u in path.tolist()], order
+
+        for label, search in (("astar", a_star_search), ("array", array_search)):
+            costs_found, expanded, seconds = run_search(search, problems)
+            rows.append((label, costs_found, expanded, seconds, search))
+        if rows[0][1] != rows[1][1]:
+            raise AssertionError("array and astar costs differ on %dx%d" % (size, size))
+        for label, _, expanded, seconds, search in rows:
+            if label == "astar":
+                path = search(*problems[0])[0]
+                held, setup_ms = grid_bytes(grid), 0.0
+            else:
+                if search(*problems[0])[0] != path:
+                    raise AssertionError("array and astar paths differ on %dx%d" % (size, size))
+                held, setup_ms = engine_bytes, 1000.0 * setup
+            print("%-6d %-8s %12.1f %10.1f %12.1f %14d %14d" %
+                  (size, label, sum(expanded) / float(len(expanded)), 1000.0 * sum(seconds) / len(seconds),
+                   setup_ms, held, peak_bytes(search, problems[:1])))
+
+#route lengths in a suite workload, by manhattan distance from start to end
+#as a fraction of the grid size (low, high]
+BANDS = (("short", 0.0, 0.125), ("medium", 0.25, 0.5), ("long", 1.0, 2.0))
+#p50 changes smaller than this are timer noise, never flagged by compare
+NOISE_MS = 0.05
+#(key, width) of the fields naming a suite result, and the keys of its p50,
+#p95 and mean expansions, for compare
+RESULT_COLUMNS = (("size", 6), ("workload", 8), ("search", 14))
+RESULT_METRICS = ("p50_ms", "p95_ms", "mean_expanded")
+
+#a problem like random_problem with the end low * size to high * size moves
+#(manhattan) away from the start
+def banded_problem(size, low, high, rng):
+    grid = random_grid(size, size, rng)
+    while True:
+        start = (rng.randrange(size), rng.randrange(size))
+        end = (rng.randrange(size), rng.randrange(size))
+        distance = abs(start[0] - end[0]) + abs(start[1] - end[1])
+        if low * size < distance <= high * size:
+            break
+    grid[start[0]][start[1]] = 1
+    grid[end[0]][end[1]] = 1
+    return grid, start, end
+
+#peak bytes allocated by search over problems, under tracemalloc
+def peak_bytes(search, problems):
+    tracemalloc.start()
+    for grid, start, end in problems:
+        search(grid, start, end)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def dstar_lite_search(grid, start, end):
+    return DStarLite(grid, start, end).plan()
+
+#build(grid, end) for every problem, kept in store by grid, returns the
+#seconds it took
+def prepare(build, problems, store):
+    begin = time.perf_counter()
+    for grid, start, end in problems:
+        store[id(grid)] = build(grid, end)
+    return time.perf_counter() - begin
+
+def bench_suite(sizes, trials, seed, output=None, memory_trials=5):
+    rng = random.Random(seed)
+    #the hpa graph and the flow field of each problem, made before its
+    #searches are timed
+    hierarchies = {}
+    fields = {}
+    searches = (("astar", a_star_search),
+                ("dijkstra", lambda g, a, b: a_star_search(g, a, b, no_heuristic)),
+                ("indexed astar", lambda g, a, b: a_star_search(g, a, b, queue=IndexedPriorityQueue)),
+                ("bidir astar", bidirectional_search),
+                ("bidir dijkstra", lambda g, a, b: bidirectional_search(g, a, b, no_heuristic)),
+                ("dstar lite", dstar_lite_search),
+                ("array astar", array_a_star_search),
+                ("jps", jump_point_search),
+                ("hpa", lambda g, a, b: hierarchies[id(g)].search(a, b)),
+                #the field is already made, reading a path expands nothing
+                ("flow field", lambda g, a, b: (fields[id(g)].path(a), [a])))
+    builds = (("hpa", lambda g, b: HierarchicalGrid(g), hierarchies),
+              ("flow field", lambda g, b: FlowFields(g).field(b), fields))
+    #search -> size -> mean seconds per grid
+    preprocessing = dict((label, {}) for label, _, _ in builds)
+    results = []
+    print("%-6s %-8s %-14s %9s %9s %9s %12s %10s %11s" % ("size", "workload", "search", "p50 ms", "p95 ms",
+                                                          "p99 ms", "mean expand", "queries/s", "peak bytes"))
+    for size in sizes:
+        built = dict((label, 0.0) for label, _, _ in builds)
+        for band, low, high in BANDS:
+            problems = [banded_problem(size, low, high, rng) for _ in range(trials)]
+            for label, build, store in builds:
+                store.clear()
+                built[label] += prepare(build, problems, store)
+            base_costs = None
+            for label, search in searches:
+                costs, expanded, seconds = run_search(search, problems)
+                if base_costs is None:
+                    base_costs = costs
+                #hpa paths can cost a few percent more, they only have to
+                #be found for the same problems
+                elif label == "hpa" and [c is None for c in costs] != [c is None for c in base_costs]:
+                    raise AssertionError("hpa and astar disagree on which ends can be reached on %s %dx%d" %
+                                         (band, size, size))
+                elif label != "hpa" and costs != base_costs:
+                    raise AssertionError("%s and astar costs differ on %s %dx%d" % (label, band, size, size))
+                p50, p95, p99 = (1000.0 * percentile(seconds, p) for p in (50, 95, 99))
+                stats = {"size": size, "workload": band, "search": label, "queries": len(problems),
+                         "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+                         "mean_ms": 1000.0 * sum(seconds) / len(seconds),
+                         "mean_expanded": sum(expanded) / float(len(expanded)),
+                         "throughput": len(seconds) / sum(seconds) if sum(seconds) else 0.0,
+                         "peak_bytes": peak_bytes(search, problems[:memory_trials])}
+                results.append(stats)
+                print("%-6d %-8s %-14s %9.3f %9.3f %9.3f %12.1f %10.1f %11d" %
+                      (size, band, label, p50, p95, p99, stats["mean_expanded"], stats["throughput"],
+                       stats["peak_bytes"]))
+        for label, _, _ in builds:
+            preprocessing[label][str(size)] = built[label] / (trials * len(BANDS))
+        print("%-6d preprocessing ms per grid: %s" %
+              (size, ", ".join("%s %.3f" % (label, 1000.0 * preprocessing[label][str(size)])
+                               for label, _, _ in builds)))
+
+    return writeReport("grid", results, output, seed=seed, trials=trials, sizes=sizes,
+                       preprocessing_seconds=preprocessing)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Grid search benchmarks")
+    parser.add_argument('bench', choices=['bidir', 'isochrone', 'replan', 'array', 'jps', 'hpa', 'flow', 'queue', 'suite', 'compare'])
+    parser.add_argument('files', nargs='*', help="old and new results for compare")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help="grid sizes (default 1024 2048 4096 for array, 128 256 512 for jps, "
+                             "256 512 1024 for hpa, 64 128 256 otherwise)")
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--edits', type=int, default=5, help="tile edits per step for replan")
+    parser.add_argument('--agents', type=int, default=1000, help="agents sharing an end for flow")
+    parser.add_argument('--cluster', type=int, default=16, help="cluster size for hpa")
+    parser.add_argument('-o', '--output', help="json file for suite results")
+    parser.add_argument('--threshold', type=float, default=0.1, help="slowdown compare flags, 0.1 for 10%%")
+    args = parser.parse_args()
+    sizes = args.sizes or {'array': [1024, 2048, 4096], 'jps': [128, 256, 512],
+                           'hpa': [256, 512, 1024]}.get(args.bench, [64, 128, 256])
+
+    if args.bench == 'bidir':
+        bench_bidirectional(sizes, args.trials, args.seed)
+    elif args.bench == 'isochrone':
+        bench_isochrone(sizes, args.trials, args.seed)
+    elif args.bench == 'replan':
+        bench_replan(sizes, args.trials, args.seed, args.edits)
+    elif args.bench == 'array':
+        bench_array(sizes, args.trials, args.seed)
+    elif args.bench == 'jps':
+        bench_jps(sizes, args.trials, args.seed)
+    elif args.bench == 'hpa':
+        bench_hpa(sizes, args.trials, args.seed, args.cluster)
+    elif args.bench == 'flow':
+        bench_flow(sizes, args.trials, args.seed, args.agents)
+    elif args.bench == 'queue':
+        bench_queue(sizes, args.trials, args.seed)
+    elif args.bench == 'suite':
+        bench_suite(sizes, args.trials, args.seed, args.output)
+    elif args.bench == 'compare':
+        if len(args.files) != 2:
+            parser.error("compare needs the old and new results files")
+        sys.exit(1 if compareResults(args.files[0], args.files[1], RESULT_COLUMNS, RESULT_METRICS,
+                                     args.threshold, NOISE_MS) else 0)
@@ -0,0 +1,173 @@
+#Christopher Silva
+# D* Lite: a search from the end back towards the start that keeps what it
+#found between plans, so after tiles change or the start moves only the
+#part of the search those changes touch is redone instead of all of it.
+#Same grid and costs as a_star_search, moving onto a tile costs that tile
+#and nothing can move onto a wall (-1).
+#
+#usage:
+#    planner = DStarLite(grid, start, end)
+#    path, path_order = planner.plan()
+#    grid[x][y] = -1
+#    planner.tiles_changed([(x, y)])
+#    planner.move_start(path[1])
+#    path, path_order = planner.plan()
+
+#resources - Koenig and Likhachev, "D* Lite" (AAAI 2002)
+
+import heapq
+
+from astar import heuristic2, neighbors
+
+INF = float('inf')
+
+class DStarLite:
+    def __init__(self, grid, start, end, heuristic=heuristic2):
+        self.grid = grid
+        self.start = start
+        self.end = end
+        self.heuristic = heuristic
+        #tile costs as of the last plan, so edits can be found by comparing
+        self.known = [list(column) for column in grid]
+        #g is the cost to the end as last expanded, rhs the cost one step
+        #ahead of g, tiles where the two differ are in the open list
+        self.g = {}
+        self.rhs = {end: 0}
+        #grows by the heuristic distance every time the start moves, so old
+        #keys in the open list stay lower bounds without being redone
+        self.km = 0
+        self.last = start
+        self.open = []
+        self.open_key = {}
+        self.path_order = []
+        self.push(end, self.key(end))
+
+    #cost of moving onto a tile
+    def cost(self, tile):
+        value = self.known[tile[0]][tile[1]]
+        return INF if value == -1 else value
+
+    def key(self, tile):
+        best = min(self.g.get(tile, INF), self.rhs.get(tile, INF))
+        return (best + self.heuristic(self.start, tile) + self.km, best)
+
+    def push(self, tile, key):
+        self.open_key[tile] = key
+        heapq.heappush(self.open, (key, tile))
+
+    #puts a tile in the open list if its g and rhs differ, or takes it out
+    def queue(self, tile):
+        if self.g.get(tile, INF) != self.rhs.get(tile, INF):
+            self.push(tile, self.key(tile))
+        else:
+            #anything left in the heap for it is skipped when popped
+            self.open_key.pop(tile, None)
+
+    #works rhs out again from every neighbor of a tile
+    def recompute(self, tile):
+        if tile == self.end:
+            return
+        best = INF
+        g = self.g
+        for next in neighbors(self.known, tile):
+            step = self.cost(next) + g.get(next, INF)
+            if step < best:
+                best = step
+        self.rhs[tile] = best
+
+    #the cost of the way through tile to its neighbors went from old to new,
+    #a neighbor only has to look at all its moves again if it was using the
+    #old way and that got dearer
+    def through_changed(self, tile, old, new):
+        rhs = self.rhs
+        for other in neighbors(self.known, tile):
+            if other == self.end:
+                continue
+            if new < rhs.get(other, INF):
+                rhs[other] = new
+            elif old != INF and new > old and rhs.get(other, INF) == old:
+                self.recompute(other)
+            else:
+                continue
+            self.queue(other)
+
+    #expands tiles until the start's cost is settled
+    def compute(self):
+        start = self.start
+        while self.open:
+            key, tile = self.open[0]
+            if self.open_key.get(tile) != key:
+                #stale entry, the tile was updated or taken out since
+                heapq.heappop(self.open)
+                continue
+            if key >= self.key(start) and self.rhs.get(start, INF) == self.g.get(start, INF):
+                break
+            heapq.heappop(self.open)
+            del self.open_key[tile]
+            new_key = self.key(tile)
+            if key < new_key:
+                #the start moved since it was pushed, try again later
+                self.push(tile, new_key)
+                continue
+            self.path_order.append(tile)
+            g = self.g.get(tile, INF)
+            rhs = self.rhs.get(tile, INF)
+            step = self.cost(tile)
+            if g > rhs:
+                self.g[tile] = rhs
+                #nothing can move onto a wall, so its cost is no use to its
+                #neighbors
+                if step != INF:
+                    self.through_changed(tile, g + step, rhs + step)
+            else:
+                self.g[tile] = INF
+                self.queue(tile)
+                if step != INF:
+                    self.through_changed(tile, g + step, INF)
+
+    #re-reads tiles from the grid after they were edited, None compares the
+    #whole grid with the costs of the last plan
+    def tiles_changed(self, tiles=None):
+        if tiles is None:
+            tiles = [(x, y) for x in range(len(self.grid)) for y in range(len(self.grid[x]))
+                     if self.grid[x][y] != self.known[x][y]]
+        changed = False
+        for x, y in tiles:
+            if self.grid[x][y] != self.known[x][y]:
+                g = self.g.get((x, y), INF)
+                old = self.cost((x, y)) + g
+                self.known[x][y] = self.grid[x][y]
+                changed = True
+                #only moves onto (x, y) changed cost, those start next to it
+                self.through_changed((x, y), old, self.cost((x, y)) + g)
+        return changed
+
+    #moves the start, e.g. as an agent walks along its path
+    def move_start(self, start):
+        self.km += self.heuristic(self.last, start)
+        self.last = start
+        self.start = start
+
+    #same (path, path_order) as a_star_search, path_order holding the start
+    #and the tiles expanded by this plan only
+    def plan(self):
+        self.path_order = [self.start]
+        self.compute()
+        path = []
+        tile = self.start
+        if self.g.get(tile, INF) == INF and tile != self.end:
+            return path, self.path_order
+        #walk downhill, each step onto the neighbor with the cheapest way on
+        path.append(tile)
+        while tile != self.end:
+            best = INF
+            for next in neighbors(self.known, tile):
+                step = self.cost(next) + self.g.get(next, INF)
+                if step < best:
+                    best = step
+                    tile_next = next
+            if best == INF:
+                return [], self.path_order
+            tile = tile_next
+            path.append(tile)
+        return path, self.path_order
@@ -0,0 +1,181 @@
+#Christopher Silva
+# Flow fields for many agents heading to the same end tile. One Dijkstra
+#search runs back from the end over the whole grid and leaves two numpy
+#arrays: the cost from every tile to the end and the move to make from every
+#tile (same bits as arrayastar, LEFT, RIGHT, UP, DOWN, 0 where there is no
+#move). Any agent's path is then read off the moves in as many steps as the
+#path is long instead of a search each. Costs are the same as
+#a_star_search's, the paths can be a different one of the cheapest routes.
+# FlowFields keeps the fields of the ends asked for in a RouteCache and drops
+#them all when the grid changes. A TrackedGrid tells it so by itself, any
+#other grid has to be reported with tiles_changed() after it is edited.
+#
+#usage:
+#    fields = FlowFields(grid)
+#    paths = fields.paths(starts, end)
+#    grid[x][y] = -1
+#    fields.tiles_changed()
+#    field = fields.field(end)
+#    agents = field.advance(agents)
+
+import heapq
+
+import numpy as np
+
+from arrayastar import ArrayGrid, LEFT, RIGHT, UP, DOWN
+from routecache import RouteCache, TrackedGrid
+
+#the move back the other way
+OPPOSITE = {LEFT: RIGHT, RIGHT: LEFT, UP: DOWN, DOWN: UP}
+
+class FlowField:
+    def __init__(self, engine, end):
+        self.end = end
+        self.width = engine.width
+        self.height = engine.height
+        height = self.height
+        cells = self.width * self.height
+        self.unreached = engine.unreached
+        dist = np.full(cells, self.unreached, dtype=engine.g.dtype)
+        step = np.zeros(cells, dtype=np.uint8)
+        #id offset of each move bit, so moving is one lookup
+        self.offsets = np.zeros(DOWN + 1, dtype=np.int64)
+        for bit, offset, _, _ in engine.moves:
+            self.offsets[bit] = offset
+
+        costs = engine.costs.reshape(-1)
+        target = end[0] * height + end[1]
+        #getting to the end from the end costs nothing, even on a wall
+        dist[target] = 0
+        if costs[target] != -1:
+            cost = memoryview(costs)
+            mask = memoryview(engine.mask.reshape(-1))
+            g = memoryview(dist)
+            moves = [(bit, offset, OPPOSITE[bit]) for bit, offset, _, _ in engine.moves]
+            push = heapq.heappush
+            pop = heapq.heappop
+            g[target] = 0
+            open = [(0, target)]
+            while open:
+                d, current = pop(open)
+                #a cheaper way here was already expanded
+                if d > g[current]:
+                    continue
+                #every tile next to current pays for moving onto it
+                through = d + cost[current]
+                bits = mask[current]
+                for bit, offset, back in moves:
+                    if bits & bit:
+                        next = current + offset
+                        if through < g[next]:
+                            g[next] = through
+                            step[next] = back
+                            push(open, (through, next))
+
+            #walls can't be moved onto but can be left (like a_star_search
+            #starting on one), each takes its cheapest move onto a tile next to it
+            grid_dist = dist.reshape(self.width, height)
+            walls = engine.costs == -1
+            leave = np.where(grid_dist != self.unreached, grid_dist + engine.costs, self.unreached)
+            leave[walls] = self.unreached
+            best = np.full_like(grid_dist, self.unreached)
+            bits = np.zeros((self.width, height), dtype=np.uint8)
+            whole = slice(None)
+            for bit, here, there in ((LEFT, (slice(1, None), whole), (slice(None, -1), whole)),
+                                     (RIGHT, (slice(None, -1), whole), (slice(1, None), whole)),
+                                     (UP, (whole, slice(1, None)), (whole, slice(None, -1))),
+                                     (DOWN, (whole, slice(None, -1)), (whole, slice(1, None)))):
+                better = leave[there] < best[here]
+                best[here] = np.where(better, leave[there], best[here])
+                bits[here] = np.where(better, bit, bits[here])
+            grid_dist[walls] = best[walls]
+            step.reshape(self.width, height)[walls] = bits[walls]
+
+        #the cost from each tile to the end, unreached where there is no way
+        self.cost = dist.reshape(self.width, height)
+        #the move to make from each tile, 0 at the end and where there is no way
+        self.step = step.reshape(self.width, height)
+
+    #True if the end can be reached from tile
+    def reaches(self, tile):
+        return self.cost[tile[0], tile[1]] != self.unreached
+
+    #same path a_star_search(grid, start, end) would cost, [] if there is none
+    def path(self, start):
+        start = tuple(start)
+        #a_star_search gives [start] even when it is a wall
+        if start == self.end:
+            return [start]
+        if not self.reaches(start):
+            return []
+        height = self.height
+        step = memoryview(self.step.reshape(-1))
+        offsets = self.offsets.tolist()
+        current = start[0] * height + start[1]
+        target = self.end[0] * height + self.end[1]
+        path = [current]
+        while current != target:
+            current += offsets[step[current]]
+            path.append(current)
+        return [divmod(u, height) for u in path]
+
+    #moves every agent in ids (flat ids, x * height + y) one step on, agents
+    #at the end or with no way there stay put
+    def advance(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        return ids + self.offsets[self.step.reshape(-1)[ids]]
+
+#a FlowField to end on grid, for a one off
+def flow_field(grid, end):
+    return FlowField(ArrayGrid(grid), end)
+
+#flow fields of a grid by end tile, least recently used dropped first once
+#they go over max_bytes and all of them dropped when the grid changes
+class FlowFields:
+    def __init__(self, grid, max_bytes=256 << 20):
+        self.grid = grid
+        self.cache = RouteCache(max_bytes)
+        self.engine = None
+        self.version = None
+        #edits reported through tiles_changed()
+        self.edits = 0
+
+    #tells the fields the grid was edited, only needed for a grid that
+    #isn't a TrackedGrid
+    def tiles_changed(self):
+        self.edits += 1
+
+    #which version of the grid the fields are for, a TrackedGrid's own
+    #version or the count of reported edits otherwise
+    def _state(self):
+        if isinstance(self.grid, TrackedGrid):
+            return self.grid.version
+        return self.edits
+
+    #drops every field, e.g. to give the memory back
+    def invalidate(self):
+        self.engine = None
+        self.version = None
+        self.cache.invalidate()
+
+    def field(self, end):
+        end = tuple(end)
+        state = self._state()
+        if self.engine is None or state != self.version:
+            if self.engine is not None:
+                self.cache.invalidate()
+            self.engine = ArrayGrid(self.grid)
+            self.version = state
+        found = self.cache.get(end)
+        if found is None:
+            found = FlowField(self.engine, end)
+            self.cache.put(end, found, found.cost.nbytes + found.step.nbytes)
+        return found
+
+    def path(self, start, end):
+        return self.field(end).path(start)
+
+    #the path of every start in starts to end, off one field
+    def paths(self, starts, end):
+        field = self.field(end)
+        return [field.path(start) for start in starts]
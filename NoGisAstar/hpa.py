@@ -0,0 +1,326 @@
+#Christopher Silva
+# Hierarchical A* (HPA*) for big grids. The grid is cut into square clusters
+#and wherever two clusters share a stretch of open tiles along their border
+#one or two pairs of tiles on it are made entrances. Entrances are the nodes
+#of a much smaller abstract graph: the two tiles of a pair are joined by the
+#step across the border and the entrances of a cluster by the cost of the
+#cheapest way between them that stays inside the cluster. A search connects
+#the start and end to the entrances of their clusters, runs A* on the
+#abstract graph and then fills in each step with a search inside one
+#cluster. The graph is made once and kept, editing tiles only redoes the
+#clusters (and borders) the tiles are in.
+# Same grid and costs as a_star_search, moving onto a tile costs that tile
+#and nothing can move onto a wall (-1). Paths stick to the entrances, so they
+#can cost a little more than a_star_search's (a few percent on the enter key
+#grids, see benchmarks.py hpa).
+#
+#usage:
+#    graph = HierarchicalGrid(grid, cluster_size=16)
+#    path, path_order = graph.search(start, end)
+#    grid[x][y] = -1
+#    graph.tiles_changed([(x, y)])
+
+#resources - Botea, Mueller and Schaeffer, "Near Optimal Hierarchical
+#Path-Finding" (Journal of Game Development, 2004)
+
+import heapq
+
+from astar import heuristic2
+
+INF = float('inf')
+
+#stretches of open border at least this long get an entrance at each end
+#instead of one in the middle
+WIDE_ENTRANCE = 6
+
+class HierarchicalGrid:
+    def __init__(self, grid, cluster_size=16, heuristic=heuristic2):
+        if cluster_size < 1:
+            raise ValueError("cluster_size must be at least 1, got %r" % (cluster_size,))
+        self.grid = grid
+        self.width = len(grid)
+        self.height = len(grid[0])
+        self.size = cluster_size
+        self.heuristic = heuristic
+        self.columns = -(-self.width // cluster_size)
+        self.rows = -(-self.height // cluster_size)
+        #tile costs as of the last rebuild, so edits can be found by comparing
+        self.known = [list(column) for column in grid]
+        #border (cluster, cluster to its right or below) -> entrance pairs
+        self.borders = {}
+        #entrance -> the entrances across a border from it
+        self.links = {}
+        #cluster -> {entrance: {entrance: cost inside the cluster}}
+        self.edges = {}
+        #cluster -> {(entrance, entrance): tiles}, filled in by searches
+        self.paths = {}
+        #clusters worked out again since the graph was made
+        self.rebuilt = 0
+        for cluster in self.clusters():
+            for border in self.cluster_borders(cluster)[1::2]:
+                self.make_border(border)
+        for cluster in self.clusters():
+            self.make_cluster(cluster)
+        self.rebuilt = 0
+
+    def clusters(self):
+        return [(cx, cy) for cx in range(self.columns) for cy in range(self.rows)]
+
+    def cluster_of(self, tile):
+        return (tile[0] // self.size, tile[1] // self.size)
+
+    #tiles x0 to x1 - 1 and y0 to y1 - 1 of a cluster
+    def bounds(self, cluster):
+        x0, y0 = cluster[0] * self.size, cluster[1] * self.size
+        return x0, min(x0 + self.size, self.width), y0, min(y0 + self.size, self.height)
+
+    #the borders of a cluster that are on the grid, left, right, top, bottom
+    #(right and bottom are the ones the cluster owns)
+    def cluster_borders(self, cluster):
+        cx, cy = cluster
+        borders = []
+        for border in (((cx - 1, cy), cluster), (cluster, (cx + 1, cy)),
+                       ((cx, cy - 1), cluster), (cluster, (cx, cy + 1))):
+            a, b = border
+            if a[0] >= 0 and a[1] >= 0 and b[0] < self.columns and b[1] < self.rows:
+                borders.append(border)
+            else:
+                borders.append(None)
+        return borders
+
+    #the pairs of tiles facing each other across a border, in order along it
+    def border_pairs(self, border):
+        a, b = border
+        x0, x1, y0, y1 = self.bounds(a)
+        if a[1] == b[1]:
+            return [((x1 - 1, y), (x1, y)) for y in range(y0, y1)]
+        return [((x, y1 - 1), (x, y1)) for x in range(x0, x1)]
+
+    #works out the entrances along a border again, True if they moved
+    def make_border(self, border):
+        if border is None:
+            return False
+        grid = self.known
+        entrances = []
+        run = []
+        for pair in self.border_pairs(border) + [None]:
+            if pair is not None and grid[pair[0][0]][pair[0][1]] != -1 and grid[pair[1][0]][pair[1][1]] != -1:
+                run.append(pair)
+                continue
+            if len(run) >= WIDE_ENTRANCE:
+                entrances += [run[0], run[-1]]
+            elif run:
+                entrances.append(run[len(run) // 2])
+            run = []
+        old = self.borders.get(border, [])
+        self.borders[border] = entrances
+        if old == entrances:
+            return False
+        links = self.links
+        for a, b in old:
+            links[a].discard(b)
+            links[b].discard(a)
+        for a, b in entrances:
+            links.setdefault(a, set()).add(b)
+            links.setdefault(b, set()).add(a)
+        for tile in [t for pair in old for t in pair]:
+            if not links.get(tile, True):
+                del links[tile]
+        return True
+
+    #Dijkstra inside cluster from sources, moving onto a tile costs that tile.
+    #reverse searches the moves backwards, giving the cost from each tile to
+    #the sources instead. Stops once every tile in targets is expanded,
+    #returns the costs and the tile each was reached from
+    def local(self, cluster, sources, reverse=False, targets=None):
+        x0, x1, y0, y1 = self.bounds(cluster)
+        grid = self.known
+        cost_so_far = dict((source, 0) for source in sources)
+        came_from = dict((source, None) for source in sources)
+        open = [(0, source) for source in sources]
+        heapq.heapify(open)
+        left = len(targets) if targets is not None else -1
+        while open:
+            c, current = heapq.heappop(open)
+            if c > cost_so_far[current]:
+                continue
+            if targets is not None and current in targets:
+                left -= 1
+                if left == 0:
+                    break
+            x, y = current
+            #a backward move from current is a forward move onto it
+            step = grid[x][y] if reverse else 0
+            if reverse and step == -1:
+                continue
+            for next in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                nx, ny = next
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    value = grid[nx][ny]
+                    if value == -1:
+                        continue
+                    new_cost = c + (step if reverse else value)
+                    if next not in cost_so_far or new_cost < cost_so_far[next]:
+                        cost_so_far[next] = new_cost
+                        came_from[next] = current
+                        heapq.heappush(open, (new_cost, next))
+        return cost_so_far, came_from
+
+    #the entrances on the borders of a cluster
+    def entrances(self, cluster):
+        found = set()
+        for border in self.cluster_borders(cluster):
+            if border is not None:
+                side = 0 if border[0] == cluster else 1
+                found.update(pair[side] for pair in self.borders.get(border, ()))
+        return found
+
+    #works out the costs between the entrances of a cluster again
+    def make_cluster(self, cluster):
+        entrances = self.entrances(cluster)
+        edges = {}
+        for entrance in entrances:
+            cost_so_far, _ = self.local(cluster, [entrance], targets=entrances)
+            edges[entrance] = dict((other, cost_so_far[other]) for other in entrances
+                                   if other != entrance and other in cost_so_far)
+        self.edges[cluster] = edges
+        self.paths[cluster] = {}
+        self.rebuilt += 1
+
+    #re-reads tiles from the grid after they were edited and redoes the
+    #clusters they are in, plus the ones across a border whose entrances
+    #moved. None compares the whole grid with the costs of the last rebuild
+    def tiles_changed(self, tiles=None):
+        if tiles is None:
+            tiles = [(x, y) for x in range(self.width) for y in range(self.height)
+                     if self.grid[x][y] != self.known[x][y]]
+        dirty = set()
+        borders = set()
+        for x, y in tiles:
+            if self.grid[x][y] == self.known[x][y]:
+                continue
+            self.known[x][y] = self.grid[x][y]
+            cluster = self.cluster_of((x, y))
+            dirty.add(cluster)
+            x0, x1, y0, y1 = self.bounds(cluster)
+            left, right, top, bottom = self.cluster_borders(cluster)
+            #only tiles along the edge of a cluster can move its entrances
+            for border, edge in ((left, x == x0), (right, x == x1 - 1),
+                                 (top, y == y0), (bottom, y == y1 - 1)):
+                if border is not None and edge:
+                    borders.add(border)
+        for border in borders:
+            if self.make_border(border):
+                dirty.update(border)
+        for cluster in dirty:
+            self.make_cluster(cluster)
+        return bool(dirty)
+
+    #the tiles from a to b inside their cluster, kept until it is redone
+    def local_path(self, cluster, a, b):
+        paths = self.paths[cluster]
+        path = paths.get((a, b))
+        if path is None:
+            _, came_from = self.local(cluster, [a], targets=(b,))
+            path = walk(came_from, b)
+            paths[(a, b)] = path
+        return path
+
+    #same (path, path_order) as a_star_search, path_order holding the start
+    #and then the entrances as the abstract search expands them
+    def search(self, start, end):
+        path_order = [start]
+        if start == end:
+            return [start], path_order
+        if self.known[end[0]][end[1]] == -1:
+            return [], path_order
+        if self.known[start[0]][start[1]] == -1:
+            return self.search_from_wall(start, end)
+        heuristic = self.heuristic
+        first = self.cluster_of(start)
+        last = self.cluster_of(end)
+        #the start and end joined to the entrances of their clusters
+        from_start, start_came = self.local(first, [start])
+        to_end, end_came = self.local(last, [end], reverse=True)
+        extra = {start: dict((e, from_start[e]) for e in self.entrances(first) if e in from_start)}
+        if first == last and end in from_start:
+            extra[start][end] = from_start[end]
+        for e in self.entrances(last):
+            if e in to_end:
+                extra.setdefault(e, {})[end] = to_end[e]
+
+        #A* over the entrances
+        grid = self.known
+        edges = self.edges
+        links = self.links
+        size = self.size
+        cost_so_far = {start: 0}
+        came_from = {start: None}
+        open = [(heuristic(end, start), start)]
+        while open:
+            priority, current = heapq.heappop(open)
+            g = cost_so_far[current]
+            if priority > g + heuristic(end, current):
+                continue
+            if current != start:
+                path_order.append(current)
+            if current == end:
+                break
+            moves = list(extra.get(current, {}).items())
+            cluster = (current[0] // size, current[1] // size)
+            moves += edges[cluster].get(current, {}).items() if cluster in edges else []
+            moves += [(other, grid[other[0]][other[1]]) for other in links.get(current, ())]
+            for next, step in moves:
+                new_cost = g + step
+                if next not in cost_so_far or new_cost < cost_so_far[next]:
+                    cost_so_far[next] = new_cost
+                    came_from[next] = current
+                    heapq.heappush(open, (new_cost + heuristic(end, next), next))
+
+        if end not in came_from:
+            return [], path_order
+        #fill in every abstract step with its tiles
+        steps = walk(came_from, end)
+        path = [start]
+        for a, b in zip(steps, steps[1:]):
+            cluster = self.cluster_of(a)
+            if cluster != self.cluster_of(b):
+                #the step across a border
+                path.append(b)
+            elif a == start:
+                path += walk(start_came, b)[1:]
+            elif b == end:
+                path += walk(end_came, a)[::-1][1:]
+            else:
+                path += self.local_path(cluster, a, b)[1:]
+        return path, path_order
+
+    #a start on a wall can still be left (like a_star_search), but it is no
+    #entrance, so the search is done from each tile next to it instead
+    def search_from_wall(self, start, end):
+        grid = self.known
+        path_order = [start]
+        best = []
+        best_cost = INF
+        x, y = start
+        for next in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= next[0] < self.width and 0 <= next[1] < self.height and grid[next[0]][next[1]] != -1:
+                path, order = self.search(next, end)
+                path_order += order
+                cost = sum(grid[tx][ty] for tx, ty in path)
+                if path and cost < best_cost:
+                    best, best_cost = [start] + path, cost
+        return best, path_order
+
+#the tiles from the search's source to tile, following came_from back
+def walk(came_from, tile):
+    path = []
+    while tile is not None:
+        path.append(tile)
+        tile = came_from[tile]
+    path.reverse()
+    return path
+
+#a one off search on a HierarchicalGrid made from grid
+def hierarchical_search(grid, start, end, cluster_size=16):
+    return HierarchicalGrid(grid, cluster_size).search(start, end)
@@ -0,0 +1,70 @@
+#Christopher Silva
+# Isochrones on the grid: every tile that can be reached within a cost budget
+#from one or more start tiles. A Dijkstra search runs from all the starts at
+#once (a start costs nothing, moving onto any other tile costs that tile) and
+#stops at the budget. Tiles come back as flat ids, x * height + y, with their
+#costs as numpy arrays in order of cost.
+# The reachable area can also come back as a polygon of tile corners, either
+#the convex hull of the tiles or their outline (concave, following the walls
+#and the edge of the budget).
+# The hull and outline come from shared/hulls.py, which ProjAstar-1 uses too.
+
+import heapq
+import os
+import sys
+
+import numpy as np
+
+from astar import neighbors
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from hulls import cellOutline as cell_outline, convexHull as convex_hull
+
+#performs Dijkstra from every start at once, stopping at budget, returns
+#(ids, costs) of every tile it reached for at most budget
+def reachable_within(grid, starts, budget):
+    height = len(grid[0])
+    cost_so_far = {}
+    open = []
+    for start in starts:
+        start = tuple(start)
+        if start not in cost_so_far:
+            cost_so_far[start] = 0
+            open.append((0, start))
+    heapq.heapify(open)
+    ids = []
+    costs = []
+    while open:
+        c, current = heapq.heappop(open)
+        #a cheaper way here was already expanded
+        if c > cost_so_far[current]:
+            continue
+        ids.append(current[0] * height + current[1])
+        costs.append(c)
+        for next in neighbors(grid, current):
+            step = grid[next[0]][next[1]]
+            if step != -1:
+                new_cost = c + step
+                if new_cost <= budget and (next not in cost_so_far or new_cost < cost_so_far[next]):
+                    cost_so_far[next] = new_cost
+                    heapq.heappush(open, (new_cost, next))
+    return np.array(ids, dtype=np.int64), np.array(costs, dtype=np.float64)
+
+#(ids, costs, hull) of the tiles within budget of any of the starts, hull is
+#None, 'convex' or 'concave' and comes back as None or tile corners
+def isochrone(grid, starts, budget, hull=None):
+    ids, costs = reachable_within(grid, starts, budget)
+    if hull is None:
+        return ids, costs, None
+    xs, ys = np.divmod(ids, len(grid[0]))
+    if hull == 'convex':
+        #every corner of every tile, so the hull covers whole tiles
+        return ids, costs, convex_hull(np.concatenate([xs, xs + 1, xs, xs + 1]),
+                                       np.concatenate([ys, ys, ys + 1, ys + 1]))
+    if hull == 'concave':
+        return ids, costs, cell_outline(xs, ys)
+    raise ValueError("hull must be None, 'convex' or 'concave', not %r" % (hull,))
+
+#one isochrone for each start
+def isochrones(grid, starts, budget, hull=None):
+    return [isochrone(grid, [start], budget, hull) for start in starts]
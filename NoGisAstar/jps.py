@@ -0,0 +1,168 @@
+#Christopher Silva
+# Jump point search for the 4 way grid with tile costs. Instead of putting
+#every tile on the open list it runs straight across stretches of tiles that
+#cost the same and only stops at tiles where a cheapest path may have to
+#turn: the end, tiles with a forced neighbor (a tile beside the run that
+#can't be reached as cheaply any other way, because the tile before it on
+#that side is a wall or costs something else) and, when running up or down,
+#tiles from which a run to the left or right finds such a tile. Tiles next
+#to a tile of another cost are where regions meet, they are stopped at too
+#and searched from in every direction like plain A* does. Paths are as
+#cheap as a_star_search's but can take a different one of the cheapest
+#routes.
+
+#resources - Harabor and Grastien, "Online Graph Pruning for Pathfinding on
+#Grid Maps" (AAAI 2011), and the 4 way version of it in PathFinding.js
+
+import heapq
+
+from astar import heuristic2
+
+#the moves out of a tile, same order as neighbors()
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+class JumpPointSearch:
+    def __init__(self, grid, end):
+        self.grid = grid
+        self.width = len(grid)
+        self.height = len(grid[0])
+        self.end = end
+        #(x, y, dx, dy, c) -> where a run from (x, y) stops. Every tile a run
+        #passes over stops at the same place, so they are all filled in and
+        #no stretch of the grid is run over twice in one direction
+        self.runs = {}
+
+    #True if (x, y) is on the grid and costs c
+    def same(self, x, y, c):
+        return 0 <= x < self.width and 0 <= y < self.height and self.grid[x][y] == c
+
+    #True if a tile next to (x, y) costs something other than c and isn't a
+    #wall, the tile is where two regions meet
+    def boundary(self, x, y, c):
+        grid = self.grid
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                value = grid[nx][ny]
+                if value != c and value != -1:
+                    return True
+        return False
+
+    #runs from (x, y) in direction (dx, dy) over tiles costing c, returns the
+    #first tile worth stopping at or None if the run hits a wall, the edge
+    #of the grid or a tile of another cost first
+    def jump(self, x, y, dx, dy, c):
+        runs = self.runs
+        passed = []
+        stop = self.run(x, y, dx, dy, c, passed)
+        for tile in passed:
+            runs[(tile[0], tile[1], dx, dy, c)] = stop
+        return stop
+
+    def run(self, x, y, dx, dy, c, passed):
+        grid = self.grid
+        width = self.width
+        height = self.height
+        end = self.end
+        runs = self.runs
+        same = self.same
+        while True:
+            stop = runs.get((x, y, dx, dy, c), False)
+            if stop is not False:
+                return stop
+            passed.append((x, y))
+            x += dx
+            y += dy
+            if not (0 <= x < width and 0 <= y < height) or grid[x][y] != c:
+                return None
+            if (x, y) == end:
+                return (x, y)
+            #the tiles around this one, None off the grid
+            left = grid[x - 1][y] if x > 0 else None
+            right = grid[x + 1][y] if x < width - 1 else None
+            column = grid[x]
+            up = column[y - 1] if y > 0 else None
+            down = column[y + 1] if y < height - 1 else None
+            #where regions meet
+            for value in (left, right, up, down):
+                if value is not None and value != c and value != -1:
+                    return (x, y)
+            if dx:
+                #a tile above or below that the tile behind it can't lead to
+                if (up == c and not same(x - dx, y - 1, c)) or (down == c and not same(x - dx, y + 1, c)):
+                    return (x, y)
+            else:
+                if (left == c and not same(x - 1, y - dy, c)) or (right == c and not same(x + 1, y - dy, c)):
+                    return (x, y)
+                #running up or down, stop where a run to the side finds
+                #somewhere to stop
+                if self.jump(x, y, 1, 0, c) or self.jump(x, y, -1, 0, c):
+                    return (x, y)
+
+#performs the search, returns the same (path, path_order) as a_star_search,
+#path_order holding the start and then the jump points as they are expanded.
+#If stats is a dict, the number of pushes and pops on the open list are
+#added to its "pushes" and "pops"
+def jump_point_search(grid, start, end, heuristic=heuristic2, stats=None):
+    search = JumpPointSearch(grid, end)
+    path_order = [start]
+    open = [(0, start)]
+    came_from = {start: None}
+    cost_so_far = {start: 0}
+    #the direction each jump point was reached in
+    direction = {start: None}
+    pushes = 1
+    pops = 0
+
+    #while there is still a move to make
+    while open:
+        priority, current = heapq.heappop(open)
+        pops += 1
+        #a cheaper way here was found after this copy was pushed
+        if priority > cost_so_far[current] + heuristic(end, current):
+            continue
+        path_order.append(current)
+        if current == end:
+            break
+        x, y = current
+        came = direction[current]
+        for dx, dy in DIRECTIONS:
+            #going back the way it came is never cheaper
+            if came is not None and (dx, dy) == (-came[0], -came[1]):
+                continue
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < search.width and 0 <= ny < search.height):
+                continue
+            #the run is over tiles costing the same as the first one
+            c = grid[nx][ny]
+            if c == -1:
+                continue
+            next = search.jump(x, y, dx, dy, c)
+            if next is None:
+                continue
+            new_cost = cost_so_far[current] + c * (abs(next[0] - x) + abs(next[1] - y))
+            if next not in cost_so_far or new_cost < cost_so_far[next]:
+                cost_so_far[next] = new_cost
+                came_from[next] = current
+                direction[next] = (dx, dy)
+                heapq.heappush(open, (new_cost + heuristic(end, next), next))
+                pushes += 1
+
+    if stats is not None:
+        stats["pushes"] = stats.get("pushes", 0) + pushes
+        stats["pops"] = stats.get("pops", 0) + pops
+
+    #create the path, filling in the tiles between jump points
+    path = []
+    if end in came_from:
+        step = end
+        while came_from[step] is not None:
+            previous = came_from[step]
+            dx = (step[0] > previous[0]) - (step[0] < previous[0])
+            dy = (step[1] > previous[1]) - (step[1] < previous[1])
+            while step != previous:
+                path.append(step)
+                step = (step[0] - dx, step[1] - dy)
+        path.append(start)
+        path.reverse()
+    return path, path_order
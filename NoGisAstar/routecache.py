@@ -0,0 +1,121 @@
+#Christopher Silva
+# Cache of grid search results for repeated start/end pairs. Results are
+#keyed by (start, end, cost model), the least recently used ones are dropped
+#once the cache goes over its memory budget, and the whole cache is dropped
+#when the grid changes. A TrackedGrid counts its own changes, any other grid
+#has to be reported with tiles_changed() after it is edited (comparing it
+#tile by tile on every lookup would cost as much as a search).
+# RouteCache is the LRUCache in shared/lrucache.py, which ProjAstar-1 uses too.
+
+import os
+import sys
+
+from astar import a_star_search
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from lrucache import LRUCache as RouteCache
+
+#bytes a tile tuple in a cached path costs on top of the list slot holding it
+TILE_BYTES = 64
+
+#a row of a TrackedGrid, any change to it moves the grid's version
+class TrackedRow(list):
+    def __init__(self, grid, values=()):
+        list.__init__(self, values)
+        self.grid = grid
+
+def _tracked(method):
+    def changed(self, *args):
+        result = method(self, *args)
+        grid = self.grid if isinstance(self, TrackedRow) else self
+        grid.version += 1
+        return result
+    return changed
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append', 'extend',
+              'insert', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(TrackedRow, _name, _tracked(getattr(list, _name)))
+
+#a grid (list of columns, grid[x][y]) with a version that moves every time
+#a tile or column changes, so caches can tell it is out of date cheaply
+class TrackedGrid(list):
+    def __init__(self, columns=()):
+        self.version = 0
+        list.__init__(self, (TrackedRow(self, column) for column in columns))
+
+    def _row(self, column):
+        return column if isinstance(column, TrackedRow) and column.grid is self else TrackedRow(self, column)
+
+    def __setitem__(self, index, column):
+        if isinstance(index, slice):
+            column = [self._row(c) for c in column]
+        else:
+            column = self._row(column)
+        list.__setitem__(self, index, column)
+        self.version += 1
+
+    def append(self, column):
+        list.append(self, self._row(column))
+        self.version += 1
+
+    def insert(self, index, column):
+        list.insert(self, index, self._row(column))
+        self.version += 1
+
+    def extend(self, columns):
+        list.extend(self, [self._row(c) for c in columns])
+        self.version += 1
+
+    def __iadd__(self, columns):
+        self.extend(columns)
+        return self
+
+for _name in ('__delitem__', '__imul__', 'pop', 'remove', 'clear', 'sort', 'reverse'):
+    setattr(TrackedGrid, _name, _tracked(getattr(list, _name)))
+
+#rough memory held by a list of tiles
+def path_bytes(path):
+    return sys.getsizeof(path) + TILE_BYTES * len(path)
+
+#a grid search (a_star_search or anything returning (path, path_order)) with
+#a RouteCache in front, called the same way as the search. cost_model names
+#the search and tile costs so caches can be shared without mixing answers
+class CachedSearch:
+    def __init__(self, search=a_star_search, cost_model='tiles', cache=None, max_bytes=16 << 20):
+        self.search = search
+        self.cost_model = cost_model
+        self.cache = cache if cache is not None else RouteCache(max_bytes)
+        self.grid = None
+        self.version = None
+        #edits reported through tiles_changed()
+        self.edits = 0
+
+    #tells the cache the grid was edited, only needed for a grid that isn't
+    #a TrackedGrid
+    def tiles_changed(self):
+        self.edits += 1
+
+    #which version of the grid the cache holds answers for, a TrackedGrid's
+    #own version or the count of reported edits otherwise
+    def _state(self, grid):
+        if isinstance(grid, TrackedGrid):
+            return grid.version
+        return self.edits
+
+    def __call__(self, grid, start, end):
+        state = self._state(grid)
+        if grid is not self.grid or state != self.version:
+            if self.grid is not None:
+                self.cache.invalidate()
+            self.grid = grid
+            self.version = state
+        key = (start, end, self.cost_model)
+        found = self.cache.get(key)
+        if found is not None:
+            path, path_order = found
+            return list(path), list(path_order)
+        path, path_order = self.search(grid, start, end)
+        #kept as tuples so a caller changing its lists can't change the cache
+        stored = (tuple(path), tuple(path_order))
+        self.cache.put(key, stored, path_bytes(stored[0]) + path_bytes(stored[1]))
+        return path, path_order
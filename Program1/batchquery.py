@@ -0,0 +1,197 @@
+"""
+@author - Christopher Silva
+@description - Answers a file of city queries in bulk. The query file is read
+as a stream in chunks, the chunks are answered by a pool of processes that
+each memory map the same index snapshot, and the answers are written out in
+query order as soon as each chunk is done, so memory stays flat no matter how
+long the file is. Per query latency percentiles are printed at the end.
+
+Query lines (fields split on whitespace or commas, # starts a comment):
+    bbox    lat lon lat lon             same box semantics as intersect()
+    region  minLat minLon maxLat maxLon east from minLon, may cross the dateline
+    radius  lat lon distance [unit]     unit is miles (default) or kilometers
+    nearest lat lon k [maxDistance]     maxDistance in miles
+
+Output lines (tab separated):
+    line number, query kind, match count, comma separated rows
+    (or | separated names with --names)
+    line number, "error", message
+
+Usage:
+    python batchquery.py queries.txt [-o results.tsv] [--processes N] [--names]
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+from array import array
+from collections import deque
+
+import numpy as np
+
+from snapshot import loadCityIndex, loadSnapshot
+
+#index of the current worker process, set up once by _initWorker
+_index = None
+_names = False
+
+
+def _initWorker(snapshotPath, names):
+    global _index, _names
+    _index = loadSnapshot(snapshotPath)
+    _names = names
+
+
+def _fields(text):
+    return text.replace(',', ' ').split()
+
+
+def answerQuery(index, text):
+    """
+    Answers one query line.
+    Returns:
+        (kind, rows)
+    Raises:
+        ValueError for a line that is not a query.
+    """
+    fields = _fields(text)
+    kind = fields[0].lower()
+    args = fields[1:]
+    if kind == 'bbox' and len(args) == 4:
+        return kind, index.intersect(tuple(float(a) for a in args))
+    if kind == 'region' and len(args) == 4:
+        return kind, index.intersectRegion(tuple(float(a) for a in args))
+    if kind == 'radius' and len(args) in (3, 4):
+        unit = args[3] if len(args) == 4 else "miles"
+        return kind, index.within_radius(float(args[0]), float(args[1]), float(args[2]), unit)
+    if kind == 'nearest' and len(args) in (3, 4):
+        maxDistance = float(args[3]) if len(args) == 4 else None
+        rows, _ = index.nearest(float(args[0]), float(args[1]), int(args[2]), maxDistance)
+        return kind, rows
+    raise ValueError("can't parse query %r" % text)
+
+
+def answerChunk(chunk, index=None, names=None):
+    """
+    Answers a list of (line number, query text) pairs.
+    Returns:
+        (output text, list of (kind, seconds) per answered query)
+    """
+    index = _index if index is None else index
+    names = _names if names is None else names
+    lines = []
+    timings = []
+    for lineNo, text in chunk:
+        start = time.perf_counter()
+        try:
+            kind, rows = answerQuery(index, text)
+        except (ValueError, IndexError) as e:
+            lines.append("%d\terror\t%s\n" % (lineNo, e))
+            continue
+        if names:
+            found = "|".join(index.cities.names(rows))
+        else:
+            found = ",".join(map(str, rows.tolist()))
+        timings.append((kind, time.perf_counter() - start))
+        lines.append("%d\t%s\t%d\t%s\n" % (lineNo, kind, len(rows), found))
+    return "".join(lines), timings
+
+
+def readChunks(queryFile, chunkSize):
+    """
+    Yields lists of up to chunkSize (line number, query text) pairs, skipping
+    blank lines and comments.
+    """
+    chunk = []
+    for lineNo, line in enumerate(queryFile, 1):
+        text = line.split('#', 1)[0].strip()
+        if not text:
+            continue
+        chunk.append((lineNo, text))
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def runBatch(queryFile, output, snapshotPath='citylist.snap', csvPath='citylist.csv',
+             processes=None, chunkSize=1000, names=False):
+    """
+    Streams queryFile through a process pool and writes answers to output in
+    query order. At most two chunks per process are in flight at once.
+    Args:
+        processes: Pool size, None for one per cpu and 0 to answer everything
+                   in this process.
+    Returns:
+        A dict of query kind -> array of per query seconds.
+    """
+    #make sure the snapshot is current before the workers map it
+    index = loadCityIndex(csvPath, snapshotPath)
+    timings = {}
+
+    def collect(result):
+        text, chunkTimings = result
+        output.write(text)
+        for kind, seconds in chunkTimings:
+            timings.setdefault(kind, array('d')).append(seconds)
+
+    if processes == 0:
+        for chunk in readChunks(queryFile, chunkSize):
+            collect(answerChunk(chunk, index, names))
+        return timings
+
+    pool = multiprocessing.Pool(processes, _initWorker, (snapshotPath, names))
+    try:
+        maxInFlight = 2 * (processes or multiprocessing.cpu_count())
+        pending = deque()
+        for chunk in readChunks(queryFile, chunkSize):
+            pending.append(pool.apply_async(answerChunk, (chunk,)))
+            if len(pending) >= maxInFlight:
+                collect(pending.popleft().get())
+        while pending:
+            collect(pending.popleft().get())
+    finally:
+        pool.close()
+        pool.join()
+    return timings
+
+
+def latencyReport(timings, seconds, out=sys.stderr):
+    """
+    Prints query count, throughput and latency percentiles per query kind
+    """
+    total = sum(len(t) for t in timings.values())
+    out.write("%d queries in %.3f seconds (%.0f queries/sec)\n" %
+              (total, seconds, total / seconds if seconds else 0.0))
+    out.write("%-8s %10s %10s %10s %10s %10s\n" % ("kind", "count", "p50 ms", "p90 ms", "p99 ms", "max ms"))
+    for kind in sorted(timings):
+        t = np.frombuffer(timings[kind], dtype=np.float64) * 1000.0
+        p50, p90, p99 = np.percentile(t, [50, 90, 99])
+        out.write("%-8s %10d %10.3f %10.3f %10.3f %10.3f\n" % (kind, len(t), p50, p90, p99, t.max()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Answer a file of city queries")
+    parser.add_argument('queries', help="query file, - for stdin")
+    parser.add_argument('-o', '--output', help="results file (default stdout)")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes, 0 to run in this process (default one per cpu)")
+    parser.add_argument('--chunk', type=int, default=1000, help="queries per work unit")
+    parser.add_argument('--names', action='store_true', help="write city names instead of rows")
+    parser.add_argument('--csv', default='citylist.csv')
+    parser.add_argument('--snapshot', default='citylist.snap')
+    args = parser.parse_args()
+
+    queryFile = sys.stdin if args.queries == '-' else open(args.queries, 'r')
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        timings = runBatch(queryFile, output, args.snapshot, args.csv,
+                           args.processes, args.chunk, args.names)
+    finally:
+        if queryFile is not sys.stdin:
+            queryFile.close()
+        if output is not sys.stdout:
+            output.close()
+    latencyReport(timings, time.perf_counter() - start)
@@ -0,0 +1,374 @@
+"""
+@author - Christopher Silva
+@description - Timing and memory comparisons for the Program 1 city loaders.
+Run from the Program1 folder:
+    python benchmarks.py loader [--copies N]
+    python benchmarks.py displace [--bearings N]
+    python benchmarks.py index [--copies N] [--queries N]
+    python benchmarks.py snapshot [--copies N]
+    python benchmarks.py regions [--copies N] [--queries N]
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pyqtree
+
+from citytable import loadCities
+from geo import displace
+from packedrtree import PackedRTree
+from cellindex import CellIndex
+from cityindex import CityIndex
+from snapshot import loadSnapshot, saveSnapshot
+
+
+def loadCityDicts(path='citylist.csv'):
+    """
+    The original loader, one dict per row with the coordinates left as strings.
+    Kept here as the baseline the column loader is measured against.
+    """
+    citys = []
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        citysCsv = csv.reader(csvfile, delimiter=',', quotechar='"')
+        for city in citysCsv:
+            citys.append({"Name":city[0],"Country":city[1],"lat":city[2],"lon":city[3]})
+    return citys
+
+
+def loadCityDictsParsed(path='citylist.csv'):
+    """
+    The original loader plus the float() parsing main() did on every row
+    before inserting it, which is the work the column loader replaces.
+    """
+    citys = loadCityDicts(path)
+    for c in citys:
+        c['lat'] = float(c['lat'])
+        c['lon'] = float(c['lon'])
+    return citys
+
+
+def displaceScalar(lat,lng,theta, distance,unit="miles"):
+    """
+    The original float32, one point at a time displace(), kept as the
+    baseline for the vectorized version in geo.py.
+    """
+    theta = np.float32(theta)
+    if unit == "miles":
+        radius = 3959
+    else:
+        radius = 6371
+
+    delta = np.divide(np.float32(distance), np.float32(radius))
+
+    theta = np.divide(np.dot(theta, np.pi), np.float32(180.0))
+    lat1 = np.divide(np.dot(lat, np.pi), np.float32(180.0))
+    lng1 = np.divide(np.dot(lng, np.pi), np.float32(180.0))
+
+    lat2 = np.arcsin( np.sin(lat1) * np.cos(delta) +
+                      np.cos(lat1) * np.sin(delta) * np.cos(theta) )
+
+    lng2 = lng1 + np.arctan2( np.sin(theta) * np.sin(delta) * np.cos(lat1),
+                              np.cos(delta) - np.sin(lat1) * np.sin(lat2))
+
+    lng2 = (lng2 + 3 * np.pi) % (2 * np.pi) - np.pi
+
+    return [np.divide(np.dot(lat2, np.float32(180.0)), np.pi),
+            np.divide(np.dot(lng2, np.float32(180.0)), np.pi)]
+
+
+def measure(fn, *args, **kwargs):
+    """
+    Times fn(*args) (best of `repeat` runs, tracemalloc off) and then runs it
+    once more under tracemalloc.
+    Returns:
+        (result, seconds, bytes still held by the result, peak bytes)
+    """
+    repeat = kwargs.get('repeat', 3)
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        del result
+        if seconds is None or elapsed < seconds:
+            seconds = elapsed
+    tracemalloc.start()
+    result = fn(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, current, peak
+
+
+def scaledCsv(path, copies):
+    """
+    Writes a temporary csv holding `copies` copies of path so the loaders can
+    be measured at gazetteer sizes. Returns the temporary file name.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    fd, name = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(fd, 'wb') as out:
+        for _ in range(copies):
+            out.write(data)
+    return name
+
+
+def benchLoader(path='citylist.csv', copies=1):
+    if copies > 1:
+        path = scaledCsv(path, copies)
+    try:
+        print("%-12s %10s %8s %14s %14s %10s" %
+              ("loader", "rows", "seconds", "held bytes", "peak bytes", "bytes/row"))
+        for label, loader in (("dicts", loadCityDicts),
+                              ("dicts+parse", loadCityDictsParsed),
+                              ("columns", loadCities)):
+            cities, seconds, held, peak = measure(loader, path)
+            rows = len(cities)
+            print("%-12s %10d %8.3f %14d %14d %10.1f" %
+                  (label, rows, seconds, held, peak, held / float(rows)))
+            del cities
+    finally:
+        if copies > 1:
+            os.remove(path)
+
+
+def benchDisplace(bearings=3600, points=100):
+    """
+    Builds a search ring of `bearings` bearings around `points` centers, once
+    with a scalar displace call per bearing and once with a single broadcast
+    call, and compares throughput and the error of each against the float64
+    ring.
+    """
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-80, 80, points)
+    lon = rng.uniform(-180, 180, points)
+    theta = np.linspace(0, 360, bearings, endpoint=False)
+    distance = 500.0
+
+    start = time.perf_counter()
+    scalar = [[displaceScalar(la, lo, t, distance) for t in theta.tolist()]
+              for la, lo in zip(lat.tolist(), lon.tolist())]
+    scalarSeconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ringLat, ringLon = displace(lat[:, None], lon[:, None], theta[None, :], distance)
+    vectorSeconds = time.perf_counter() - start
+
+    scalar = np.array(scalar, dtype=np.float64)
+    latError = np.abs(scalar[:, :, 0] - ringLat).max()
+    lonError = np.abs((scalar[:, :, 1] - ringLon + 180.0) % 360.0 - 180.0).max()
+    total = bearings * points
+    print("%-8s %10s %8s %14s" % ("displace", "points", "seconds", "points/sec"))
+    print("%-8s %10d %8.3f %14.0f" % ("scalar", total, scalarSeconds, total / scalarSeconds))
+    print("%-8s %10d %8.3f %14.0f" % ("vector", total, vectorSeconds, total / vectorSeconds))
+    print("largest float32 error against float64: %.2e deg lat, %.2e deg lon" % (latError, lonError))
+
+
+def buildQuadtree(lat, lon):
+    """
+    The old index build, one pyqtree insert per city
+    """
+    spindex = pyqtree.Index(bbox=[-90, -180, 90, 180])
+    for i, (cityLat, cityLon) in enumerate(zip(lat.tolist(), lon.tolist())):
+        spindex.insert(item=i, bbox=[cityLat, cityLon, cityLat, cityLon])
+    return spindex
+
+
+def quadtreeNodeCount(tree):
+    count = 1
+    for child in tree.children:
+        count += quadtreeNodeCount(child)
+    return count
+
+
+def randomBoxes(count, maxSize, seed=0):
+    """
+    `count` random (lat, lon, lat, lon) boxes up to maxSize degrees on a side
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-80, 80, count)
+    lon = rng.uniform(-180, 180, count)
+    size = rng.uniform(0.1, maxSize, (2, count))
+    return list(zip(lat.tolist(), lon.tolist(),
+                    (lat + size[0]).tolist(), (lon + size[1]).tolist()))
+
+
+def benchIndex(path='citylist.csv', copies=1, queries=2000):
+    """
+    Build time, node count and box query latency of the pyqtree index next to
+    the packed R-tree.
+    """
+    if copies > 1:
+        path = scaledCsv(path, copies)
+    try:
+        cities = loadCities(path)
+    finally:
+        if copies > 1:
+            os.remove(path)
+
+    indexes = []
+    start = time.perf_counter()
+    quadtree = buildQuadtree(cities.lat, cities.lon)
+    indexes.append(("pyqtree", quadtree, time.perf_counter() - start, quadtreeNodeCount(quadtree)))
+    start = time.perf_counter()
+    packed = PackedRTree(cities.lat, cities.lon)
+    indexes.append(("packed", packed, time.perf_counter() - start, packed.nodeCount))
+
+    print("%d cities" % len(cities))
+    print("%-8s %10s %10s" % ("index", "build sec", "nodes"))
+    for label, _, seconds, nodes in indexes:
+        print("%-8s %10.3f %10d" % (label, seconds, nodes))
+
+    print("%-8s %10s %12s %12s" % ("index", "box deg", "us/query", "avg matches"))
+    for maxSize in (1, 10, 60):
+        boxes = randomBoxes(queries, maxSize)
+        for label, index, _, _ in indexes:
+            found = 0
+            start = time.perf_counter()
+            for bbox in boxes:
+                found += len(index.intersect(bbox))
+            seconds = time.perf_counter() - start
+            print("%-8s %10d %12.1f %12.1f" % (label, maxSize, seconds / queries * 1e6,
+                                              found / float(queries)))
+
+
+def benchSnapshot(path='citylist.csv', copies=1):
+    """
+    Time to a first answered query when parsing the csv and building the
+    index against mapping a saved snapshot.
+    """
+    if copies > 1:
+        path = scaledCsv(path, copies)
+    fd, snapPath = tempfile.mkstemp(suffix='.snap')
+    os.close(fd)
+    bbox = (45.011419, -111.071777, 40.996484, -104.040527)
+    try:
+        start = time.perf_counter()
+        index = CityIndex(loadCities(path))
+        index.intersect(bbox)
+        buildSeconds = time.perf_counter() - start
+        saveSnapshot(index, snapPath)
+        del index
+
+        start = time.perf_counter()
+        index = loadSnapshot(snapPath)
+        index.intersect(bbox)
+        mapSeconds = time.perf_counter() - start
+
+        print("%d cities, snapshot %d bytes" % (len(index.cities), os.path.getsize(snapPath)))
+        print("%-10s %10s" % ("start", "seconds"))
+        print("%-10s %10.4f" % ("csv+build", buildSeconds))
+        print("%-10s %10.4f" % ("mmap", mapSeconds))
+    finally:
+        os.remove(snapPath)
+        if copies > 1:
+            os.remove(path)
+
+
+def regionWorkloads(count, seed=0):
+    """
+    Region boxes (minLat, minLon, maxLat, maxLon) running east from minLon,
+    grouped by the kind of trouble they give a flat index.
+    """
+    rng = np.random.default_rng(seed)
+    height = rng.uniform(1, 15, count)
+    width = rng.uniform(2, 30, count)
+
+    lat = rng.uniform(-60, 60, count)
+    lon = rng.uniform(-150, 150 - width)
+    midLatitude = list(zip(lat, lon, lat + height, lon + width))
+
+    #straddle the dateline, so minLon > maxLon
+    lon = 180.0 - width * rng.uniform(0.1, 0.9, count)
+    lat = rng.uniform(-60, 60, count)
+    dateline = list(zip(lat, lon, lat + height, lon + width - 360.0))
+
+    #reach up to (or down to) a pole
+    height = height * 2
+    lat = np.where(rng.random(count) < 0.5, 90.0 - height, -90.0)
+    lon = rng.uniform(-180, 180 - width)
+    polar = list(zip(lat, lon, lat + height, lon + width))
+    return [("mid-latitude", midLatitude), ("dateline", dateline), ("polar", polar)]
+
+
+def scanRegion(lat, lon, bbox):
+    """
+    Rows inside a region by checking every city, the answer the indexes are
+    checked against. The latitudes are clamped to the poles and the region
+    runs east from minLon, so a city is in it when it is no further east of
+    minLon (going round past the dateline) than maxLon is.
+    """
+    lat1, minLon, lat2, maxLon = bbox
+    minLat = max(min(lat1, lat2), -90.0)
+    maxLat = min(max(lat1, lat2), 90.0)
+    if maxLon - minLon >= 360.0:
+        inside = np.ones(len(lon), dtype=bool)
+    else:
+        inside = (np.asarray(lon) - minLon) % 360.0 <= (maxLon - minLon) % 360.0
+    return np.flatnonzero(inside & (lat >= minLat) & (lat <= maxLat))
+
+
+def benchRegions(path='citylist.csv', copies=1, queries=2000):
+    """
+    Region queries through CityIndex (the R-tree with the boxes split at the
+    dateline) against the cell index and the old single pyqtree box, each
+    checked against a scan of every city.
+    """
+    if copies > 1:
+        path = scaledCsv(path, copies)
+    try:
+        cities = loadCities(path)
+    finally:
+        if copies > 1:
+            os.remove(path)
+    index = CityIndex(cities)
+    cells = CellIndex(cities.lat, cities.lon)
+    quadtree = buildQuadtree(cities.lat, cities.lon)
+
+    def oldRegion(box):
+        return np.array(quadtree.intersect(box), dtype=np.int64)
+
+    print("%d cities" % len(cities))
+    print("%-13s %-8s %10s %12s %8s" % ("workload", "index", "us/query", "avg matches", "wrong"))
+    for label, boxes in regionWorkloads(queries):
+        truth = [scanRegion(cities.lat, cities.lon, box) for box in boxes]
+        for name, query in (("rtree", index.intersectRegion), ("cells", cells.intersect),
+                            ("pyqtree", oldRegion)):
+            start = time.perf_counter()
+            answers = [query(box) for box in boxes]
+            seconds = time.perf_counter() - start
+            wrong = sum(1 for answer, right in zip(answers, truth)
+                        if not np.array_equal(np.sort(answer), right))
+            found = sum(len(answer) for answer in answers)
+            print("%-13s %-8s %10.1f %12.1f %8d" % (label, name, seconds / len(boxes) * 1e6,
+                                                   found / float(len(boxes)), wrong))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Program 1 benchmarks")
+    parser.add_argument('bench', choices=['loader', 'displace', 'index', 'snapshot', 'regions'])
+    parser.add_argument('--csv', default='citylist.csv')
+    parser.add_argument('--copies', type=int, default=1,
+                        help="repeat the csv this many times to simulate a larger gazetteer")
+    parser.add_argument('--bearings', type=int, default=3600,
+                        help="bearings per point for the displace benchmark")
+    parser.add_argument('--queries', type=int, default=2000,
+                        help="queries per workload for the index and regions benchmarks")
+    args = parser.parse_args()
+
+    if args.bench == 'loader':
+        benchLoader(args.csv, args.copies)
+    elif args.bench == 'displace':
+        benchDisplace(args.bearings)
+    elif args.bench == 'index':
+        benchIndex(args.csv, args.copies, args.queries)
+    elif args.bench == 'snapshot':
+        benchSnapshot(args.csv, args.copies)
+    elif args.bench == 'regions':
+        benchRegions(args.csv, args.copies, args.queries)
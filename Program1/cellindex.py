@@ -0,0 +1,174 @@
+"""
+@author - Christopher Silva
+@description - Geographic cell index over the city columns. The globe is cut
+into a 2^level by 2^level grid of lat/lon cells numbered along a Z-order
+(quad key) curve, the cities are sorted by cell key and a box query becomes a
+few binary searched key ranges. Boxes that cross the dateline are split into
+their two longitude ranges and latitudes are clamped at the poles, so neither
+needs the canvas remapping the old index used.
+
+CityIndex doesn't use it: its R-tree with the box split at the dateline
+answers dateline and polar regions faster (benchmarks.py regions), the cells
+only win on wide mid-latitude boxes.
+"""
+import numpy as np
+
+from geo import clampLat, splitLonRange
+
+
+def _spreadBits(v):
+    #moves bit i of a 32 bit value to bit 2i
+    v = v.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+def quadKeys(lat, lon, level):
+    """
+    Z-order cell key of each point: the cell column (longitude) bits in the
+    even positions and the cell row (latitude) bits in the odd positions.
+    """
+    cellX, cellY = cellCoords(lat, lon, level)
+    return (_spreadBits(cellX) | (_spreadBits(cellY) << np.uint64(1))).astype(np.int64)
+
+
+#_SPREAD[b] is byte b with a zero bit put after each of its bits
+_SPREAD = [int(_spreadBits(np.array([b]))[0]) for b in range(256)]
+
+
+def _spread(v):
+    #_spreadBits of one int, a byte at a time
+    key = 0
+    shift = 0
+    while v:
+        key |= _SPREAD[v & 255] << shift
+        v >>= 8
+        shift += 16
+    return key
+
+
+def cellCoords(lat, lon, level):
+    """
+    Column and row of the level cell holding each point
+    """
+    cells = 1 << level
+    cellX = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * cells)
+    cellY = np.floor((clampLat(lat) + 90.0) / 180.0 * cells)
+    return (np.clip(cellX, 0, cells - 1).astype(np.int64),
+            np.clip(cellY, 0, cells - 1).astype(np.int64))
+
+
+class CellIndex:
+    """
+    keys is sorted and rows[i] is the table row of the city with key keys[i].
+    lat and lon are the coordinates in the same (key) order so refining a
+    range reads contiguous memory. When keys and rows are passed in lat and
+    lon must already be in key order.
+    """
+    #finest cells, 2^16 cells around the equator is about 0.4 miles wide
+    LEVEL = 16
+    #most cells a box is covered with before moving up to coarser cells,
+    #refining the extra cities of a few wide cells costs less than working
+    #out the keys of many narrow ones
+    MAX_RANGES = 4
+
+    def __init__(self, lat, lon, level=LEVEL, keys=None, rows=None):
+        self.level = level
+        if keys is None:
+            keys = quadKeys(lat, lon, level)
+            rows = np.argsort(keys, kind='stable')
+            keys = keys[rows]
+            lat = np.asarray(lat)[rows]
+            lon = np.asarray(lon)[rows]
+        self.keys = keys
+        self.rows = rows
+        self.lat = lat
+        self.lon = lon
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cell(self, lat, lon, depth):
+        #column and row of the depth cell holding one point
+        cells = 1 << depth
+        col = int((lon + 180.0) / 360.0 * cells)
+        row = int((min(max(lat, -90.0), 90.0) + 90.0) / 180.0 * cells)
+        return min(max(col, 0), cells - 1), min(max(row, 0), cells - 1)
+
+    def keyRanges(self, minLat, minLon, maxLat, maxLon):
+        """
+        Covers one non wrapping box with [start, end) key ranges: every cell
+        of the finest depth at which the box touches no more than MAX_RANGES
+        cells, with touching ranges merged.
+        """
+        colLow, rowLow = self._cell(minLat, minLon, self.level)
+        colHigh, rowHigh = self._cell(maxLat, maxLon, self.level)
+        #the span of the box in cells only halves as shift goes up, so start
+        #close to the answer
+        shift = max(0, max(colHigh - colLow, rowHigh - rowLow).bit_length() - self.MAX_RANGES.bit_length())
+        while ((colHigh >> shift) - (colLow >> shift) + 1) * \
+                ((rowHigh >> shift) - (rowLow >> shift) + 1) > self.MAX_RANGES:
+            shift += 1
+
+        spread = _spread
+        size = 1 << (2 * shift)
+        cols = [spread(col) for col in range(colLow >> shift, (colHigh >> shift) + 1)]
+        ranges = sorted((spread(row) << 1 | col) << (2 * shift)
+                        for row in range(rowLow >> shift, (rowHigh >> shift) + 1) for col in cols)
+        merged = []
+        for start in ranges:
+            if merged and start == merged[-1][1]:
+                merged[-1][1] = start + size
+            else:
+                merged.append([start, start + size])
+        return merged
+
+    def intersect(self, bbox):
+        """
+        Rows of every city inside bbox = (minLat, minLon, maxLat, maxLon). The
+        latitudes may come in either order, but the box always runs east from
+        minLon to maxLon, so minLon > maxLon is a box across the dateline.
+        The key ranges of both halves of such a box are looked up with one
+        binary search and the cities in them refined together.
+        Returns:
+            The rows as an int64 array.
+        """
+        lat1, minLon, lat2, maxLon = (float(v) for v in bbox)
+        minLat = min(max(min(lat1, lat2), -90.0), 90.0)
+        maxLat = min(max(max(lat1, lat2), -90.0), 90.0)
+        lonRanges = splitLonRange(minLon, maxLon)
+        ranges = self.keyRanges(minLat, lonRanges[0][0], maxLat, lonRanges[0][1])
+        if len(lonRanges) == 2:
+            #the halves can share coarse cells, each key is looked up once
+            ranges = sorted(ranges + self.keyRanges(minLat, lonRanges[1][0], maxLat, lonRanges[1][1]))
+            merged = [ranges[0]]
+            for start, end in ranges[1:]:
+                if start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            ranges = merged
+        bounds = np.searchsorted(self.keys, [key for pair in ranges for key in pair]).tolist()
+        #the stretches of key order the ranges cover, most boxes have one or
+        #two with anything in them
+        slices = [slice(first, last) for first, last in zip(bounds[::2], bounds[1::2]) if last > first]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        if len(slices) == 1:
+            lat, lon, rows = self.lat[slices[0]], self.lon[slices[0]], self.rows[slices[0]]
+        else:
+            lat = np.concatenate([self.lat[part] for part in slices])
+            lon = np.concatenate([self.lon[part] for part in slices])
+            rows = np.concatenate([self.rows[part] for part in slices])
+        keep = (lat >= minLat) & (lat <= maxLat)
+        if len(lonRanges) == 1:
+            (lonLow, lonHigh), = lonRanges
+            keep &= (lon >= lonLow) & (lon <= lonHigh)
+        else:
+            (lowWest, highWest), (lowEast, highEast) = lonRanges
+            keep &= ((lon >= lowWest) & (lon <= highWest)) | ((lon >= lowEast) & (lon <= highEast))
+        return rows[keep]
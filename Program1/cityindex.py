@@ -0,0 +1,112 @@
+"""
+@author - Christopher Silva
+@description - Spatial index over a CityTable. Boxes are given the way
+program1 always has, (lat, lon, lat, lon), and results come back as row
+numbers into the table.
+"""
+import numpy as np
+
+from geo import boxDistance, haversine, radiusBbox, splitLonRange
+from packedrtree import PackedRTree
+
+
+class CityIndex:
+    """
+    Wraps the packed R-tree bulk loaded from the city columns (lat as x, lon
+    as y) and answers box, region, radius and nearest queries with row
+    numbers.
+    """
+    def __init__(self, cities, spindex=None):
+        self.cities = cities
+        self.lat = cities.lat
+        self.lon = cities.lon
+        if spindex is None:
+            spindex = PackedRTree(self.lat, self.lon)
+        self.spindex = spindex
+
+    def intersect(self, bbox):
+        """
+        Rows of every city inside bbox = (lat, lon, lat, lon). The corners may
+        be given in either order.
+        """
+        return self.spindex.intersect(bbox)
+
+    def intersectRegion(self, bbox):
+        """
+        Rows of every city inside the region bbox = (minLat, minLon, maxLat,
+        maxLon). Unlike intersect() the region always runs east from minLon
+        to maxLon, so minLon > maxLon is a region across the dateline. Such a
+        region is split into its two halves, each an R-tree box (which beat
+        the cell index on dateline and polar regions, see benchmarks.py
+        regions).
+        """
+        minLat, minLon, maxLat, maxLon = bbox
+        return self._lonRangeRows(min(minLat, maxLat), minLon, max(minLat, maxLat), maxLon)
+
+    def _lonRangeRows(self, minLat, minLon, maxLat, maxLon):
+        #a range with minLon > maxLon wraps the dateline, search both halves
+        ranges = splitLonRange(minLon, maxLon)
+        if len(ranges) == 1:
+            return self.intersect((minLat, ranges[0][0], maxLat, ranges[0][1]))
+        return np.concatenate([self.intersect((minLat, low, maxLat, high)) for low, high in ranges])
+
+    def within_radius(self, lat, lon, distance, unit="miles"):
+        """
+        Finds the cities within a great circle distance of a point. The
+        candidates come from the index using the bbox of the circle and are
+        then filtered with one haversine pass over all of them.
+        Args:
+            lat, lon: The center, or arrays of centers for a batch query.
+            distance: The radius in unit, a scalar or one per center.
+            unit:     enum("miles","kilometers")
+        Returns:
+            An array of rows for a single center, or a list with an array of
+            rows per center for a batch.
+        """
+        single = np.ndim(lat) == 0 and np.ndim(lon) == 0
+        lat, lon, distance = np.broadcast_arrays(np.atleast_1d(np.asarray(lat, dtype=np.float64)),
+                                                 np.atleast_1d(np.asarray(lon, dtype=np.float64)),
+                                                 np.asarray(distance, dtype=np.float64))
+        #an empty batch, np.split below would give one empty array for it
+        if len(lat) == 0:
+            return []
+        minLat, minLon, maxLat, maxLon = radiusBbox(lat, lon, distance, unit)
+
+        candidates = [self._lonRangeRows(*box) for box in
+                      zip(minLat.tolist(), minLon.tolist(), maxLat.tolist(), maxLon.tolist())]
+        counts = np.array([len(rows) for rows in candidates], dtype=np.int64)
+        rows = np.concatenate(candidates) if candidates else np.empty(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(lat)), counts)
+
+        keep = haversine(lat[owner], lon[owner], self.lat[rows], self.lon[rows], unit) <= distance[owner]
+        found = np.split(rows[keep], np.cumsum(np.bincount(owner[keep], minlength=len(lat)))[:-1])
+        if single:
+            return found[0]
+        return found
+
+    def nearest(self, lat, lon, k=1, maxDistance=None, unit="miles"):
+        """
+        Finds the k cities closest to a point by great circle distance with a
+        best first walk of the R-tree, so no bbox has to be guessed and grown.
+        Args:
+            lat, lon:    The point, or arrays of points for a batch query.
+            k:           How many cities to return per point.
+            maxDistance: Optional cutoff in unit, cities further away are left
+                         out even if that leaves fewer than k.
+            unit:        enum("miles","kilometers")
+        Returns:
+            (rows, distances) closest first for a single point, or a list of
+            them for a batch.
+        """
+        single = np.ndim(lat) == 0 and np.ndim(lon) == 0
+        lat, lon = np.broadcast_arrays(np.atleast_1d(np.asarray(lat, dtype=np.float64)),
+                                       np.atleast_1d(np.asarray(lon, dtype=np.float64)))
+        found = []
+        for pointLat, pointLon in zip(lat.tolist(), lon.tolist()):
+            pointDistance = lambda x, y: haversine(pointLat, pointLon, x, y, unit)
+            nodeDistance = lambda minX, minY, maxX, maxY: boxDistance(pointLat, pointLon, minX, minY,
+                                                                      maxX, maxY, unit)
+            found.append(self.spindex.nearest(pointDistance, nodeDistance, k, maxDistance))
+        if single:
+            return found[0]
+        return found
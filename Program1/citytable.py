@@ -0,0 +1,98 @@
+"""
+@author - Christopher Silva
+@description - Column oriented storage for the city list. Coordinates are kept
+in contiguous float64 arrays and the names are kept in one utf-8 blob with an
+offset table so a city costs a handful of bytes instead of a dict per row.
+"""
+import csv
+from array import array
+import numpy as np
+
+
+class CityTable:
+    """
+    Holds the city list as columns. Row i of the table is described by
+    lat[i], lon[i], the name bytes nameData[nameOffsets[i]:nameOffsets[i+1]]
+    and countries[countryCodes[i]].
+    """
+    def __init__(self, lat, lon, nameData, nameOffsets, countryCodes, countries):
+        self.lat = lat
+        self.lon = lon
+        self.nameData = nameData
+        self.nameOffsets = nameOffsets
+        self.countryCodes = countryCodes
+        self.countries = countries
+
+    def __len__(self):
+        return len(self.lat)
+
+    def name(self, i):
+        """
+        Returns the name of the city in row i
+        """
+        start = self.nameOffsets[i]
+        end = self.nameOffsets[i + 1]
+        return self.nameData[start:end].tobytes().decode('utf-8')
+
+    def names(self, rows):
+        """
+        Returns the names of the cities in the given rows
+        """
+        return [self.name(i) for i in rows]
+
+    def country(self, i):
+        """
+        Returns the country of the city in row i
+        """
+        return self.countries[self.countryCodes[i]]
+
+    def row(self, i):
+        """
+        Returns row i in the same dict form the old loader produced
+        """
+        return {"Name": self.name(i), "Country": self.country(i),
+                "lat": float(self.lat[i]), "lon": float(self.lon[i])}
+
+
+def loadCities(path='citylist.csv'):
+    """
+    Reads the city csv (name, country, lat, lon) straight into columns.
+    Args:
+        path: The csv file to read.
+    Returns:
+        A CityTable.
+    """
+    lat = array('d')
+    lon = array('d')
+    nameData = bytearray()
+    nameOffsets = array('q', [0])
+    countryCodes = array('i')
+    countries = []
+    countryIndex = {}
+
+    #bind the appends once, this loop runs once per city
+    latAppend = lat.append
+    lonAppend = lon.append
+    nameExtend = nameData.extend
+    offsetAppend = nameOffsets.append
+    codeAppend = countryCodes.append
+
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        citysCsv = csv.reader(csvfile, delimiter=',', quotechar='"')
+        for name, country, cityLat, cityLon in citysCsv:
+            latAppend(float(cityLat))
+            lonAppend(float(cityLon))
+            nameExtend(name.encode('utf-8'))
+            offsetAppend(len(nameData))
+            code = countryIndex.get(country)
+            if code is None:
+                code = countryIndex[country] = len(countries)
+                countries.append(country)
+            codeAppend(code)
+
+    return CityTable(np.frombuffer(lat, dtype=np.float64),
+                     np.frombuffer(lon, dtype=np.float64),
+                     np.frombuffer(nameData, dtype=np.uint8),
+                     np.frombuffer(nameOffsets, dtype=np.int64),
+                     np.frombuffer(countryCodes, dtype=np.int32),
+                     countries)
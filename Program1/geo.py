@@ -0,0 +1,182 @@
+"""
+@author - Christopher Silva
+@description - Great circle helpers shared by the Program 1 index and queries.
+"""
+import numpy as np
+
+#mean earth radius in each supported unit
+EARTH_RADIUS = {"miles": 3959, "kilometers": 6371}
+
+#degrees added around radius boxes to absorb rounding in displace()
+BBOX_PAD = 1e-5
+
+def displace(lat,lng,theta, distance,unit="miles"):
+    """
+    Displace a LatLng theta degrees clockwise and some feet in that direction.
+    Notes:
+        http://www.movable-type.co.uk/scripts/latlong.html
+        0 DEGREES IS THE VERTICAL Y AXIS! IMPORTANT!
+    Args:
+        lat, lng: The start point in degrees.
+        theta:    A number in degrees where:
+                  0   = North
+                  90  = East
+                  180 = South
+                  270 = West
+        distance: A number in specified unit.
+        unit:     enum("miles","kilometers")
+        lat, lng, theta and distance may be arrays, they broadcast against
+        each other (e.g. one point and an array of bearings for a ring).
+    Returns:
+        A new LatLng, as float64 arrays when any input was an array.
+    """
+    delta = np.divide(np.asarray(distance, dtype=np.float64), earthRadius(unit))
+
+    theta = deg2rad(theta)
+    lat1 = deg2rad(lat)
+    lng1 = deg2rad(lng)
+
+    sinLat1 = np.sin(lat1)
+    cosLat1 = np.cos(lat1)
+    sinDelta = np.sin(delta)
+    cosDelta = np.cos(delta)
+
+    lat2 = np.arcsin( sinLat1 * cosDelta +
+                      cosLat1 * sinDelta * np.cos(theta) )
+
+    lng2 = lng1 + np.arctan2( np.sin(theta) * sinDelta * cosLat1,
+                              cosDelta - sinLat1 * np.sin(lat2))
+
+    lng2 = (lng2 + 3 * np.pi) % (2 * np.pi) - np.pi
+
+    return [rad2deg(lat2), rad2deg(lng2)]
+
+def deg2rad(theta):
+    return np.multiply(np.asarray(theta, dtype=np.float64), np.pi / 180.0)
+
+def rad2deg(theta):
+    return np.multiply(np.asarray(theta, dtype=np.float64), 180.0 / np.pi)
+
+def clampLat(lat):
+    """
+    Clamps latitudes to [-90, 90]
+    """
+    return np.clip(np.asarray(lat, dtype=np.float64), -90.0, 90.0)
+
+def wrapLon(lon):
+    """
+    Wraps longitudes into [-180, 180)
+    """
+    return (np.asarray(lon, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+def splitLonRange(minLon, maxLon):
+    """
+    Splits the longitude range running east from minLon to maxLon into
+    ranges that do not cross the dateline. 180 and -180 are both accepted as
+    the dateline, anything else is wrapped into [-180, 180) first.
+    Returns:
+        A list of one or two (low, high) ranges.
+    """
+    #plain floats, wrapLon's arrays cost more than the rest of the split
+    minLon, maxLon = float(minLon), float(maxLon)
+    if maxLon - minLon >= 360.0:
+        return [(-180.0, 180.0)]
+    if minLon == maxLon:
+        lon = (minLon + 180.0) % 360.0 - 180.0
+        return [(lon, lon), (180.0, 180.0)] if lon == -180.0 else [(lon, lon)]
+    low = (minLon + 180.0) % 360.0 - 180.0 if minLon != 180.0 else -180.0
+    high = (maxLon + 180.0) % 360.0 - 180.0 if maxLon != 180.0 else 180.0
+    if high == -180.0 and low > high:
+        high = 180.0
+    if low <= high:
+        return [(low, high)]
+    return [(low, 180.0), (-180.0, high)]
+
+def earthRadius(unit="miles"):
+    """
+    Returns the earth radius in unit, anything but "miles" is kilometers
+    like displace() assumes.
+    """
+    if unit == "miles":
+        return EARTH_RADIUS["miles"]
+    return EARTH_RADIUS["kilometers"]
+
+def haversine(lat1, lon1, lat2, lon2, unit="miles"):
+    """
+    Great circle distance between two points (or two arrays of points, the
+    arguments broadcast against each other) in degrees.
+    Returns:
+        The distance in unit as a float64 (array).
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * earthRadius(unit) * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def radiusBbox(lat, lon, distance, unit="miles"):
+    """
+    Bounding box of every point within distance of (lat, lon). The latitude
+    bounds come from displacing the center due north and due south. A box that
+    reaches a pole covers every longitude, and a box that crosses the dateline
+    comes back with minLon > maxLon. All arguments broadcast.
+    Returns:
+        (minLat, minLon, maxLat, maxLon) as float64 arrays.
+    """
+    lat, lon, distance = np.broadcast_arrays(np.asarray(lat, dtype=np.float64),
+                                             np.asarray(lon, dtype=np.float64),
+                                             np.asarray(distance, dtype=np.float64))
+    delta = distance / earthRadius(unit)
+    latRad = np.radians(lat)
+
+    maxLat = np.asarray(displace(lat, lon, 0, distance, unit)[0], dtype=np.float64)
+    minLat = np.asarray(displace(lat, lon, 180, distance, unit)[0], dtype=np.float64)
+
+    #displacing over a pole comes back down the other side, so clamp instead
+    northPole = latRad + delta >= np.pi / 2
+    southPole = latRad - delta <= -np.pi / 2
+    maxLat = np.where(northPole, 90.0, np.minimum(maxLat + BBOX_PAD, 90.0))
+    minLat = np.where(southPole, -90.0, np.maximum(minLat - BBOX_PAD, -90.0))
+
+    #widest longitude is where a meridian is tangent to the circle, which is
+    #further out than displacing due east or west
+    with np.errstate(invalid='ignore', divide='ignore'):
+        halfWidth = np.degrees(np.arcsin(np.clip(np.sin(delta) / np.cos(latRad), -1.0, 1.0)))
+    halfWidth = halfWidth + BBOX_PAD
+    allLon = northPole | southPole | (delta >= np.pi / 2) | ~(halfWidth < 180.0)
+
+    minLon = (lon - halfWidth + 180.0) % 360.0 - 180.0
+    maxLon = (lon + halfWidth + 180.0) % 360.0 - 180.0
+    minLon = np.where(allLon, -180.0, minLon)
+    maxLon = np.where(allLon, 180.0, maxLon)
+    return minLat, minLon, maxLat, maxLon
+
+def boxDistance(lat, lon, minLat, minLon, maxLat, maxLon, unit="miles"):
+    """
+    Smallest great circle distance from (lat, lon) to each (non wrapping)
+    lat/lon box, zero for boxes holding the point. If the point's longitude
+    is inside the box the nearest point is straight north or south of it.
+    Otherwise it is on one of the two edge meridians, either at the foot of
+    the perpendicular from the point (when that falls on the edge) or at a
+    corner.
+    Returns:
+        The distances in unit as a float64 array.
+    """
+    lat = np.float64(lat)
+    lon = np.float64(lon)
+    minLat = np.asarray(minLat, dtype=np.float64)
+    maxLat = np.asarray(maxLat, dtype=np.float64)
+    inLon = (minLon <= lon) & (lon <= maxLon)
+    along = np.radians(np.abs(lat - np.clip(lat, minLat, maxLat))) * earthRadius(unit)
+
+    #both edge meridians and three candidate latitudes on each (the two
+    #corners and the clipped foot) go through a single haversine call
+    edge = np.concatenate((minLon, maxLon))
+    low = np.concatenate((minLat, minLat))
+    high = np.concatenate((maxLat, maxLat))
+    latRad = np.radians(lat)
+    foot = np.degrees(np.arctan2(np.sin(latRad), np.cos(latRad) * np.cos(np.radians(lon - edge))))
+    candidates = np.concatenate((low, high, np.clip(foot, low, high)))
+    best = haversine(lat, lon, candidates, np.tile(edge, 3), unit).reshape(6, -1).min(axis=0)
+    return np.where(inLon, along, best)
@@ -0,0 +1,202 @@
+"""
+@author - Christopher Silva
+@description - A static R-tree bulk loaded with sort-tile-recursive packing.
+The whole tree is a handful of flat arrays built in one pass over the point
+columns, so building it does not depend on insertion order and it can be
+written to disk as is.
+"""
+import heapq
+import math
+import numpy as np
+
+
+def strOrder(x, y, nodeSize):
+    """
+    Sort-tile-recursive order of the points: sort by x, cut into vertical
+    slices of about sqrt(leaf count) leaves each and sort each slice by y.
+    Returns:
+        The permutation of the point indexes as an int64 array.
+    """
+    n = len(x)
+    leaves = int(math.ceil(n / float(nodeSize)))
+    slices = int(math.ceil(math.sqrt(leaves)))
+    byX = np.argsort(x, kind='stable')
+    sliceId = np.arange(n) // (slices * nodeSize)
+    return byX[np.lexsort((y[byX], sliceId))]
+
+
+class PackedRTree:
+    """
+    Level 0 is the points themselves in STR order (items[i] is the original
+    index of point i). Level k > 0 node j covers nodes j*nodeSize up to
+    (j+1)*nodeSize - 1 of level k-1. The node boxes of every level above the
+    points are stored back to back in boxes, level k starting at
+    levelStarts[k-1], and the root is the last box.
+    """
+    #frontiers up to this many nodes are tested in a python loop
+    PYTHON_FRONTIER = 64
+
+    def __init__(self, x, y, nodeSize=16, items=None, boxes=None, levelStarts=None):
+        self.nodeSize = nodeSize
+        if items is None:
+            x = np.asarray(x, dtype=np.float64)
+            y = np.asarray(y, dtype=np.float64)
+            items = strOrder(x, y, nodeSize)
+            x = x[items]
+            y = y[items]
+            boxes, levelStarts = self._pack(x, y)
+        self.items = items
+        self.x = x
+        self.y = y
+        self.boxes = boxes
+        self.levelStarts = levelStarts
+        self._boxView = None
+
+    def _pack(self, x, y):
+        #each pass groups nodeSize consecutive boxes of the level below,
+        #until a level with a single root is left
+        levels = []
+        below = (x, y, x, y)
+        while len(below[0]) > 0 and (not levels or len(below[0]) > 1):
+            starts = np.arange(0, len(below[0]), self.nodeSize)
+            level = np.column_stack((np.minimum.reduceat(below[0], starts),
+                                     np.minimum.reduceat(below[1], starts),
+                                     np.maximum.reduceat(below[2], starts),
+                                     np.maximum.reduceat(below[3], starts)))
+            levels.append(level)
+            below = (level[:, 0], level[:, 1], level[:, 2], level[:, 3])
+        levelStarts = np.cumsum([0] + [len(level) for level in levels]).astype(np.int64)
+        if not levels:
+            return np.empty((0, 4), dtype=np.float64), levelStarts
+        return np.concatenate(levels), levelStarts
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def depth(self):
+        """
+        Number of node levels above the points
+        """
+        return len(self.levelStarts) - 1
+
+    @property
+    def nodeCount(self):
+        return len(self.boxes)
+
+    def levelBoxes(self, level):
+        """
+        The (count, 4) boxes of node level 1..depth
+        """
+        return self.boxes[self.levelStarts[level - 1]:self.levelStarts[level]]
+
+    def children(self, level, nodes):
+        """
+        Indexes (into level - 1) of the children of the given nodes of level
+        """
+        below = self._levelSize(level - 1)
+        kids = (np.asarray(nodes, dtype=np.int64)[:, None] * self.nodeSize +
+                np.arange(self.nodeSize)[None, :]).ravel()
+        return kids[kids < below]
+
+    def _levelSize(self, level):
+        if level == 0:
+            return len(self.items)
+        return int(self.levelStarts[level] - self.levelStarts[level - 1])
+
+    def _views(self):
+        #memoryviews read single floats without numpy's per call overhead and
+        #without copying, so they also work on a memory mapped tree
+        if self._boxView is None:
+            self._boxView = memoryview(np.ascontiguousarray(self.boxes)).cast('B').cast('d')
+            self._xView = memoryview(np.ascontiguousarray(self.x))
+            self._yView = memoryview(np.ascontiguousarray(self.y))
+            self._itemView = memoryview(np.ascontiguousarray(self.items))
+            self._levels = [(int(self.levelStarts[level - 1]), self._levelSize(level - 1))
+                            for level in range(1, self.depth + 1)]
+        return self._boxView, self._xView, self._yView
+
+    def intersect(self, bbox):
+        """
+        Intersects bbox = (xmin, ymin, xmax, ymax) with the points, the corners
+        may be given in either order like pyqtree accepts.
+        Returns:
+            The items inside bbox (edges included) as an int64 array.
+        """
+        x1, y1, x2, y2 = bbox
+        minX, maxX = min(x1, x2), max(x1, x2)
+        minY, maxY = min(y1, y2), max(y1, y2)
+        if len(self.items) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        #small frontiers are walked in python, large ones are tested with numpy
+        boxView, xView, yView = self._views()
+        nodeSize = self.nodeSize
+        nodes = [0]
+        for level in range(self.depth, 0, -1):
+            base, below = self._levels[level - 1]
+            if len(nodes) <= self.PYTHON_FRONTIER:
+                kids = []
+                for j in nodes:
+                    b = 4 * (base + j)
+                    if (boxView[b] <= maxX and boxView[b + 2] >= minX and
+                            boxView[b + 1] <= maxY and boxView[b + 3] >= minY):
+                        kids.extend(range(j * nodeSize, min(j * nodeSize + nodeSize, below)))
+                nodes = kids
+            else:
+                nodes = np.asarray(nodes, dtype=np.int64)
+                box = self.boxes[base + nodes]
+                nodes = self.children(level, nodes[(box[:, 0] <= maxX) & (box[:, 2] >= minX) &
+                                                   (box[:, 1] <= maxY) & (box[:, 3] >= minY)])
+            if len(nodes) == 0:
+                return np.empty(0, dtype=np.int64)
+
+        if len(nodes) <= self.PYTHON_FRONTIER * nodeSize:
+            itemView = self._itemView
+            return np.array([itemView[i] for i in nodes
+                             if minX <= xView[i] <= maxX and minY <= yView[i] <= maxY], dtype=np.int64)
+        nodes = np.asarray(nodes, dtype=np.int64)
+        px = self.x[nodes]
+        py = self.y[nodes]
+        return self.items[nodes[(px >= minX) & (px <= maxX) & (py >= minY) & (py <= maxY)]]
+
+    def nearest(self, pointDistance, boxDistance, k=1, maxDistance=None):
+        """
+        Best first search for the k closest points. The heap holds nodes keyed
+        by a lower bound on the distance to anything under them and points
+        keyed by their distance, so points come off the heap in order and the
+        search stops after the k-th one.
+        Args:
+            pointDistance: f(x, y) -> distances from the query to arrays of points.
+            boxDistance:   f(minX, minY, maxX, maxY) -> lower bounds from the
+                           query to arrays of boxes.
+            k:             How many points to find.
+            maxDistance:   Points (and nodes) further than this are skipped.
+        Returns:
+            (items, distances) of up to k points, closest first.
+        """
+        items = []
+        distances = []
+        if len(self.items) == 0 or k <= 0:
+            return np.array(items, dtype=np.int64), np.array(distances, dtype=np.float64)
+
+        heap = [(0.0, self.depth, 0)]
+        while heap and len(items) < k:
+            distance, level, index = heapq.heappop(heap)
+            if maxDistance is not None and distance > maxDistance:
+                break
+            if level == 0:
+                items.append(index)
+                distances.append(distance)
+                continue
+            kids = self.children(level, [index])
+            if level == 1:
+                kidDistance = pointDistance(self.x[kids], self.y[kids])
+            else:
+                box = self.levelBoxes(level - 1)[kids]
+                kidDistance = boxDistance(box[:, 0], box[:, 1], box[:, 2], box[:, 3])
+            for kidDist, kid in zip(kidDistance.tolist(), kids.tolist()):
+                if maxDistance is None or kidDist <= maxDistance:
+                    heapq.heappush(heap, (kidDist, level - 1, kid))
+
+        return self.items[np.array(items, dtype=np.int64)], np.array(distances, dtype=np.float64)
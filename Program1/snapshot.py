@@ -0,0 +1,124 @@
+"""
+@author - Christopher Silva
+@description - Saves a built CityIndex (the city columns and the packed
+R-tree) to one binary file and maps it back in without parsing
+the csv or rebuilding anything.
+
+File layout: the magic bytes, a little endian uint64 header length, a json
+header naming each array with its dtype, shape and byte offset, then the raw
+arrays, each starting on a 64 byte boundary.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from citytable import CityTable, loadCities
+from cityindex import CityIndex
+from packedrtree import PackedRTree
+
+MAGIC = b'CITYSNAP'
+VERSION = 3
+ALIGN = 64
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def saveSnapshot(index, path):
+    """
+    Writes index (a CityIndex with its PackedRTree) to path.
+    The file is written next to path first and renamed over it so readers
+    never see half a file.
+    """
+    cities = index.cities
+    tree = index.spindex
+    arrays = [("lat", cities.lat), ("lon", cities.lon),
+              ("nameData", cities.nameData), ("nameOffsets", cities.nameOffsets),
+              ("countryCodes", cities.countryCodes),
+              ("items", tree.items), ("x", tree.x), ("y", tree.y),
+              ("boxes", tree.boxes), ("levelStarts", tree.levelStarts)]
+
+    header = {"version": VERSION, "nodeSize": tree.nodeSize,
+              "countries": cities.countries, "arrays": {}}
+    #offsets are relative to the end of the header, which is only known once
+    #the header is encoded, so lay the arrays out from zero first
+    offset = 0
+    for name, array in arrays:
+        array = np.ascontiguousarray(array)
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                                  "offset": offset}
+        offset = _align(offset + array.nbytes)
+    headerBytes = json.dumps(header).encode('utf-8')
+    dataStart = _align(len(MAGIC) + 8 + len(headerBytes))
+
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(headerBytes)))
+        f.write(headerBytes)
+        for name, array in arrays:
+            f.seek(dataStart + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(dataStart + offset)
+    os.replace(tmpPath, path)
+
+
+def loadSnapshot(path):
+    """
+    Memory maps a file written by saveSnapshot. Nothing but the header is read
+    up front, the arrays are views into the mapping and are paged in by the
+    queries that touch them.
+    Returns:
+        A CityIndex.
+    Raises:
+        ValueError if path is not a snapshot this version can read.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("%s is not a city index snapshot" % path)
+        try:
+            headerLength, = struct.unpack('<Q', f.read(8))
+        except struct.error:
+            raise ValueError("%s is a truncated snapshot" % path)
+        header = json.loads(f.read(headerLength).decode('utf-8'))
+    if header.get("version") != VERSION:
+        raise ValueError("%s is snapshot version %s, expected %s" %
+                         (path, header.get("version"), VERSION))
+
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    dataStart = _align(len(MAGIC) + 8 + headerLength)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"]))
+        start = dataStart + info["offset"]
+        view = data[start:start + count * dtype.itemsize].view(dtype)
+        arrays[name] = view.reshape(info["shape"])
+
+    cities = CityTable(arrays["lat"], arrays["lon"], arrays["nameData"],
+                       arrays["nameOffsets"], arrays["countryCodes"], header["countries"])
+    tree = PackedRTree(arrays["x"], arrays["y"], header["nodeSize"], items=arrays["items"],
+                       boxes=arrays["boxes"], levelStarts=arrays["levelStarts"])
+    return CityIndex(cities, tree)
+
+
+def loadCityIndex(csvPath='citylist.csv', snapshotPath='citylist.snap'):
+    """
+    Loads the snapshot when it is newer than the csv, otherwise (or if the
+    snapshot can't be read) rebuilds the index from the csv and saves a new
+    snapshot.
+    Returns:
+        A CityIndex.
+    """
+    if (os.path.exists(snapshotPath) and
+            os.path.getmtime(snapshotPath) >= os.path.getmtime(csvPath)):
+        try:
+            return loadSnapshot(snapshotPath)
+        except (ValueError, KeyError, OSError, struct.error):
+            pass
+    index = CityIndex(loadCities(csvPath))
+    saveSnapshot(index, snapshotPath)
+    return index
@@ -0,0 +1,473 @@
+"""
+@author - Christopher Silva
+@description - Timing and memory comparisons for the road network code.
+Run from the ProjAstar-1 folder:
+    python benchmarks.py load
+    python benchmarks.py route [--queries N] [--seed S]
+    python benchmarks.py ch [--queries N] [--seed S]
+    python benchmarks.py alt [--queries N] [--seed S] [--landmarks K]
+    python benchmarks.py bidir [--queries N] [--seed S]
+    python benchmarks.py matrix [--sources N] [--targets M] [--seed S] [--processes P]
+    python benchmarks.py snap [--fixes N] [--seed S]
+    python benchmarks.py cache [--queries N] [--seed S]
+    python benchmarks.py isochrone [--queries N] [--seed S]
+    python benchmarks.py suite [--queries N] [--seed S] [--landmarks K] [-o results.json]
+    python benchmarks.py compare old.json new.json [--threshold T]
+
+suite runs every search on the same seeded short, medium and long routes and
+writes the latency percentiles, expansions, peak memory and throughput as
+json (with the commit it ran on), compare lines up two such files and flags
+searches that got slower. The report and the comparison come from
+shared/benchreport.py, which NoGisAstar uses too.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from contraction import buildHierarchy, loadHierarchy, saveHierarchy
+from distancematrix import distanceMatrix
+from isochrone import IsochroneFinder, boundedDijkstra
+from landmarks import selectLandmarks
+from roadgraph import buildRoadGraph, loadRoadGraph, loadRoadGraphCache, saveRoadGraph
+from routecache import CachedRouter
+from routing import INF, RoadRouter, astar, dijkstraArray
+from snapping import SegmentIndex
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from benchreport import compareResults, writeReport
+
+
+def loadLists(nodesPath='nodes.csv', edgesPath='edges.csv'):
+    """
+    The original loader, every row kept as a list of strings
+    """
+    nodes = []
+    edges = []
+    with open(nodesPath, 'r') as csvfile:
+        for row in csv.reader(csvfile, delimiter=',', quotechar='"'):
+            nodes.append(row)
+    with open(edgesPath, 'r') as csvfile:
+        for row in csv.reader(csvfile, delimiter=',', quotechar='"'):
+            edges.append(row)
+    return nodes, edges
+
+
+def measure(fn, *args):
+    """
+    Runs fn(*args) once for time and once under tracemalloc.
+    Returns:
+        (result, seconds, bytes still held by the result, peak bytes)
+    """
+    start = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, current, peak
+
+
+def benchLoad(nodesPath='nodes.csv', edgesPath='edges.csv'):
+    fd, cachePath = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        saveRoadGraph(buildRoadGraph(nodesPath, edgesPath), cachePath)
+        print("%-10s %8s %14s %14s" % ("loader", "seconds", "held bytes", "peak bytes"))
+        for label, fn, args in (("lists", loadLists, (nodesPath, edgesPath)),
+                                ("csr build", buildRoadGraph, (nodesPath, edgesPath)),
+                                ("csr cache", loadRoadGraphCache, (cachePath,))):
+            _, seconds, held, peak = measure(fn, *args)
+            print("%-10s %8.4f %14d %14d" % (label, seconds, held, peak))
+        print("cache file %d bytes" % os.path.getsize(cachePath))
+    finally:
+        os.remove(cachePath)
+
+
+def reachablePairs(router, count, seed=0):
+    """
+    count random (source, target) node pairs with a route between them. The
+    network is many small pieces, so the target is drawn from the nodes a
+    full search from the source reaches.
+    """
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < count:
+        source = rng.randrange(router.graph.nodeCount)
+        _, parents, _ = astar(router.offsets, router.targets, router.weights, source, -1)
+        reached = sorted(parents)
+        if len(reached) > 1:
+            pairs.append((source, rng.choice([u for u in reached if u != source])))
+    return pairs
+
+
+def timeQueries(query, pairs):
+    """
+    Runs query(source, target) for every pair.
+    Returns:
+        (array of costs, array of expansions, array of seconds)
+    """
+    costs = np.empty(len(pairs))
+    expanded = np.empty(len(pairs), dtype=np.int64)
+    seconds = np.empty(len(pairs))
+    for i, (source, target) in enumerate(pairs):
+        start = time.perf_counter()
+        _, costs[i], expanded[i] = query(source, target)
+        seconds[i] = time.perf_counter() - start
+    return costs, expanded, seconds
+
+
+def printQueryTable(rows):
+    """
+    rows is a list of (label, expansions, seconds) arrays from timeQueries
+    """
+    print("%-12s %12s %10s %10s %10s" % ("search", "mean expand", "p50 ms", "p95 ms", "max ms"))
+    for label, expanded, seconds in rows:
+        p50, p95 = np.percentile(seconds * 1000.0, [50, 95])
+        print("%-12s %12.1f %10.3f %10.3f %10.3f" %
+              (label, expanded.mean(), p50, p95, seconds.max() * 1000.0))
+
+
+def benchRoute(graph, queries=500, seed=0):
+    router = RoadRouter(graph)
+    pairs = reachablePairs(router, queries, seed)
+
+    def dijkstra(source, target):
+        return router.routeNodes(source, target, potential=lambda u: 0.0)
+
+    baseCosts, baseExpanded, baseSeconds = timeQueries(dijkstra, pairs)
+    costs, expanded, seconds = timeQueries(router.routeNodes, pairs)
+    if not np.allclose(costs, baseCosts):
+        raise AssertionError("A* and Dijkstra disagree on %d routes" %
+                             np.count_nonzero(~np.isclose(costs, baseCosts)))
+    print("%d routed pairs, lengthPerKm %.3f" % (len(pairs), graph.lengthPerKm()))
+    printQueryTable([("dijkstra", baseExpanded, baseSeconds), ("astar", expanded, seconds)])
+
+
+def benchHierarchy(graph, queries=500, seed=0):
+    router = RoadRouter(graph)
+    start = time.perf_counter()
+    ch = buildHierarchy(graph)
+    buildSeconds = time.perf_counter() - start
+    fd, cachePath = tempfile.mkstemp(suffix='.ch')
+    os.close(fd)
+    try:
+        saveHierarchy(ch, graph, cachePath)
+        start = time.perf_counter()
+        loadHierarchy(graph, cachePath)
+        loadSeconds = time.perf_counter() - start
+        cacheBytes = os.path.getsize(cachePath)
+    finally:
+        os.remove(cachePath)
+    print("preprocessing %.3f s, %d shortcuts on %d edges (+%.1f%%), cache %d bytes loads in %.2f ms" %
+          (buildSeconds, ch.shortcutCount, graph.edgeCount, 100.0 * ch.shortcutCount / graph.edgeCount,
+           cacheBytes, loadSeconds * 1000.0))
+
+    pairs = reachablePairs(router, queries, seed)
+    baseCosts, baseExpanded, baseSeconds = timeQueries(router.routeNodes, pairs)
+    costs, expanded, seconds = timeQueries(ch.routeNodes, pairs)
+    if not np.allclose(costs, baseCosts):
+        raise AssertionError("hierarchy and A* disagree on %d routes" %
+                             np.count_nonzero(~np.isclose(costs, baseCosts)))
+    printQueryTable([("astar", baseExpanded, baseSeconds), ("ch", expanded, seconds)])
+    print("mean query speedup %.2fx" % (baseSeconds.mean() / seconds.mean()))
+
+
+def benchLandmarks(graph, queries=500, seed=0, count=16):
+    router = RoadRouter(graph)
+    start = time.perf_counter()
+    landmarks = selectLandmarks(graph, count)
+    selectSeconds = time.perf_counter() - start
+    altRouter = RoadRouter(graph, landmarks)
+    print("%d landmarks picked in %.3f s, %d bytes of float32 costs" %
+          (len(landmarks), selectSeconds, landmarks.fromLandmark.nbytes + landmarks.toLandmark.nbytes))
+
+    pairs = reachablePairs(router, queries, seed)
+    baseCosts, baseExpanded, baseSeconds = timeQueries(router.routeNodes, pairs)
+    costs, expanded, seconds = timeQueries(altRouter.routeNodes, pairs)
+    if not np.allclose(costs, baseCosts):
+        raise AssertionError("ALT and A* disagree on %d routes" %
+                             np.count_nonzero(~np.isclose(costs, baseCosts)))
+    printQueryTable([("haversine", baseExpanded, baseSeconds), ("alt", expanded, seconds)])
+    print("expansions %.1f%% of haversine, mean latency %.2fx" %
+          (100.0 * expanded.sum() / baseExpanded.sum(), baseSeconds.mean() / seconds.mean()))
+
+
+def benchBidirectional(graph, queries=500, seed=0):
+    router = RoadRouter(graph)
+    pairs = reachablePairs(router, queries, seed)
+    searches = (("dijkstra", lambda s, t: router.routeNodes(s, t, potential=lambda u: 0.0)),
+                ("bidir dijk", lambda s, t: router.routeBidirectional(s, t, bounds=False)),
+                ("astar", router.routeNodes),
+                ("bidir astar", router.routeBidirectional))
+    rows = []
+    baseCosts = None
+    for label, query in searches:
+        costs, expanded, seconds = timeQueries(query, pairs)
+        if baseCosts is None:
+            baseCosts = costs
+        elif not np.allclose(costs, baseCosts):
+            raise AssertionError("%s and dijkstra disagree on %d routes" %
+                                 (label, np.count_nonzero(~np.isclose(costs, baseCosts))))
+        rows.append((label, expanded, seconds))
+    printQueryTable(rows)
+
+
+def benchMatrix(graph, cachePath, sources=200, targets=2000, seed=0, processes=None):
+    router = RoadRouter(graph)
+    rng = np.random.default_rng(seed)
+    sourceNodes = rng.integers(0, graph.nodeCount, sources)
+    targetNodes = rng.integers(0, graph.nodeCount, targets)
+    pairs = sources * targets
+    print("%d x %d matrix, %d pairs" % (sources, targets, pairs))
+    print("%-16s %10s %14s" % ("method", "seconds", "pairs/sec"))
+
+    #single pair A* is far too slow for the whole matrix, time a sample
+    sample = [(int(s), int(t)) for s, t in zip(rng.choice(sourceNodes, 2000), rng.choice(targetNodes, 2000))]
+    start = time.perf_counter()
+    for s, t in sample:
+        router.routeNodes(s, t)
+    perPair = (time.perf_counter() - start) / len(sample)
+    print("%-16s %10.3f %14.0f  (from %d sampled pairs)" % ("astar per pair", perPair * pairs, 1.0 / perPair, len(sample)))
+
+    results = {}
+    for label, procs in (("matrix 1 proc", 0), ("matrix pool", processes)):
+        start = time.perf_counter()
+        results[label] = distanceMatrix(sourceNodes, targetNodes, cachePath, procs)
+        seconds = time.perf_counter() - start
+        print("%-16s %10.3f %14.0f" % (label, seconds, pairs / seconds))
+    if not np.array_equal(results["matrix 1 proc"], results["matrix pool"]):
+        raise AssertionError("pool and in process matrices differ")
+
+
+def benchSnap(graph, fixes=300000, seed=0):
+    rng = np.random.default_rng(seed)
+    #fixes scattered a few hundred meters around random segment centers
+    nodes = rng.integers(0, graph.nodeCount, fixes)
+    lat = graph.lat[nodes] + rng.normal(0.0, 0.002, fixes)
+    lon = graph.lon[nodes] + rng.normal(0.0, 0.002, fixes)
+    start = time.perf_counter()
+    index = SegmentIndex(graph)
+    print("index of %d cells built in %.3f s" % (len(index.keys), time.perf_counter() - start))
+    start = time.perf_counter()
+    _, _, _, _, _, distance = index.snapMany(lat, lon)
+    seconds = time.perf_counter() - start
+    print("%d fixes snapped in %.3f s (%.0f fixes/minute), median distance %.3f km" %
+          (fixes, seconds, 60.0 * fixes / seconds, np.median(distance)))
+    start = time.perf_counter()
+    for i in range(1000):
+        index.snap(lat[i], lon[i])
+    print("single snap %.3f ms each" % (time.perf_counter() - start))
+
+
+def benchCache(graph, queries=20000, seed=0):
+    router = RoadRouter(graph)
+    #skewed traffic: a few pairs make up most of the requests (zipf ranks)
+    pairs = reachablePairs(router, 2000, seed)
+    rng = np.random.default_rng(seed)
+    ranks = np.minimum(rng.zipf(1.2, queries), len(pairs)) - 1
+    workload = [pairs[r] for r in ranks]
+    _, expanded, seconds = timeQueries(router.routeNodes, workload)
+    print("%-12s %10.3f s %10.1f mean expand" % ("no cache", seconds.sum(), expanded.mean()))
+    for label, budget in (("cache 64 KB", 64 << 10), ("cache 1 MB", 1 << 20)):
+        cached = CachedRouter(router, maxBytes=budget)
+        _, expanded, seconds = timeQueries(cached.routeNodes, workload)
+        print("%-12s %10.3f s %10.1f mean expand" % (label, seconds.sum(), expanded.mean()))
+        print("    %s" % cached.cache.stats())
+
+
+def benchIsochrone(graph, queries=500, seed=0):
+    router = RoadRouter(graph)
+    finder = IsochroneFinder(router)
+    rng = random.Random(seed)
+    origins = [rng.randrange(graph.nodeCount) for _ in range(queries)]
+    offsets, targets, weights = router.offsets, router.targets, router.weights
+    start = time.perf_counter()
+    for origin in origins:
+        dijkstraArray(offsets, targets, weights, graph.nodeCount, origin)
+    print("%-22s %10.3f ms" % ("full dijkstra", 1000.0 * (time.perf_counter() - start) / queries))
+    print("%-22s %10s %12s" % ("budget", "mean ms", "mean reached"))
+    for budget in (100.0, 500.0, 2000.0, float('inf')):
+        for hull in (None, 'convex', 'concave'):
+            reached = 0
+            start = time.perf_counter()
+            for origin in origins:
+                reached += len(finder.reachable([int(graph.ids[origin])], budget, hull).nodes)
+            seconds = time.perf_counter() - start
+            print("%-22s %10.3f %12.1f" % ("%g %s" % (budget, hull or "ids only"),
+                                            1000.0 * seconds / queries, reached / queries))
+    #every origin in one search
+    start = time.perf_counter()
+    nodes, _ = boundedDijkstra(offsets, targets, weights, origins, 2000.0)
+    print("%d origins at once, budget 2000: %d reached in %.3f ms" %
+          (queries, len(nodes), 1000.0 * (time.perf_counter() - start)))
+
+
+#route lengths in a suite workload, by thirds of the costs of random routes
+BANDS = ('short', 'medium', 'long')
+#p50 changes smaller than this are timer noise, never flagged by compare
+NOISE_MS = 0.01
+#(key, width) of the fields naming a suite result, and the keys of its p50,
+#p95 and mean expansions, for compare
+RESULT_COLUMNS = (("workload", 8), ("search", 12))
+RESULT_METRICS = ("p50Ms", "p95Ms", "meanExpanded")
+
+
+def bandedPairs(router, count, seed=0, poolSources=300):
+    """
+    count random (source, target) pairs with a route for each of BANDS. The
+    band limits are the thirds of the costs of every route from poolSources
+    random sources, more sources are drawn until every band is full.
+    Returns:
+        (dict of band -> pairs, [short/medium limit, medium/long limit])
+    """
+    rng = random.Random(seed)
+    g = router.graph
+
+    def routesFrom(source):
+        costs = dijkstraArray(router.offsets, router.targets, router.weights, g.nodeCount, source)
+        reached = np.flatnonzero(costs < INF)
+        reached = reached[reached != source]
+        return reached, costs[reached]
+
+    pool = []
+    while len(pool) < poolSources:
+        source = rng.randrange(g.nodeCount)
+        reached, costs = routesFrom(source)
+        if len(reached):
+            pool.append(costs)
+    limits = np.percentile(np.concatenate(pool), [100.0 / 3, 200.0 / 3]).tolist()
+
+    bands = dict((band, []) for band in BANDS)
+    while any(len(pairs) < count for pairs in bands.values()):
+        source = rng.randrange(g.nodeCount)
+        reached, costs = routesFrom(source)
+        if not len(reached):
+            continue
+        which = np.searchsorted(limits, costs, side='right')
+        for i, band in enumerate(BANDS):
+            choices = reached[which == i]
+            if len(choices) and len(bands[band]) < count:
+                bands[band].append((source, int(choices[rng.randrange(len(choices))])))
+    return bands, limits
+
+
+def peakBytes(query, pairs):
+    """
+    Peak bytes allocated by query(source, target) over pairs, under tracemalloc
+    """
+    tracemalloc.start()
+    for source, target in pairs:
+        query(source, target)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def queryStats(expanded, seconds):
+    """
+    The suite's numbers for one search on one workload as a dict
+    """
+    p50, p95, p99 = np.percentile(seconds * 1000.0, [50, 95, 99])
+    return {"queries": len(seconds), "p50Ms": p50, "p95Ms": p95, "p99Ms": p99,
+            "meanMs": seconds.mean() * 1000.0, "meanExpanded": float(expanded.mean()),
+            "throughput": len(seconds) / seconds.sum() if seconds.sum() else 0.0}
+
+
+def benchSuite(graph, queries=500, seed=0, count=16, outputPath=None, memoryQueries=50):
+    router = RoadRouter(graph)
+    preprocessing = {}
+    start = time.perf_counter()
+    landmarks = selectLandmarks(graph, count)
+    preprocessing["alt"] = time.perf_counter() - start
+    altRouter = RoadRouter(graph, landmarks)
+    start = time.perf_counter()
+    ch = buildHierarchy(graph)
+    preprocessing["ch"] = time.perf_counter() - start
+    searches = (("dijkstra", lambda s, t: router.routeNodes(s, t, potential=lambda u: 0.0)),
+                ("astar", router.routeNodes),
+                ("alt", altRouter.routeNodes),
+                ("bidir dijk", lambda s, t: router.routeBidirectional(s, t, bounds=False)),
+                ("bidir astar", router.routeBidirectional),
+                ("ch", ch.routeNodes))
+
+    bands, limits = bandedPairs(router, queries, seed)
+    results = []
+    for band in BANDS:
+        pairs = bands[band]
+        baseCosts = None
+        print("%s routes (%d pairs)" % (band, len(pairs)))
+        print("%-12s %10s %10s %10s %12s %12s %12s" %
+              ("search", "p50 ms", "p95 ms", "p99 ms", "mean expand", "queries/s", "peak bytes"))
+        for label, query in searches:
+            costs, expanded, seconds = timeQueries(query, pairs)
+            if baseCosts is None:
+                baseCosts = costs
+            elif not np.allclose(costs, baseCosts):
+                raise AssertionError("%s and dijkstra disagree on %d %s routes" %
+                                     (label, np.count_nonzero(~np.isclose(costs, baseCosts)), band))
+            stats = queryStats(expanded, seconds)
+            stats["peakBytes"] = peakBytes(query, pairs[:memoryQueries])
+            stats.update({"workload": band, "search": label})
+            results.append(stats)
+            print("%-12s %10.3f %10.3f %10.3f %12.1f %12.0f %12d" %
+                  (label, stats["p50Ms"], stats["p95Ms"], stats["p99Ms"], stats["meanExpanded"],
+                   stats["throughput"], stats["peakBytes"]))
+
+    return writeReport("road", results, outputPath, seed=seed, queries=queries, nodes=graph.nodeCount,
+                       edges=graph.edgeCount, bandLimits=limits, preprocessingSeconds=preprocessing)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Road network benchmarks")
+    parser.add_argument('bench', choices=['load', 'route', 'ch', 'alt', 'bidir', 'matrix', 'snap', 'cache',
+                                          'isochrone', 'suite', 'compare'])
+    parser.add_argument('files', nargs='*', help="old and new results for compare")
+    parser.add_argument('--nodes', default='nodes.csv')
+    parser.add_argument('--edges', default='edges.csv')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--landmarks', type=int, default=16)
+    parser.add_argument('--sources', type=int, default=200)
+    parser.add_argument('--targets', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--fixes', type=int, default=300000)
+    parser.add_argument('-o', '--output', help="json file for suite results")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="slowdown compare flags, 0.1 for 10%%")
+    args = parser.parse_args()
+
+    if args.bench == 'load':
+        benchLoad(args.nodes, args.edges)
+    elif args.bench == 'route':
+        benchRoute(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed)
+    elif args.bench == 'ch':
+        benchHierarchy(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed)
+    elif args.bench == 'alt':
+        benchLandmarks(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed, args.landmarks)
+    elif args.bench == 'bidir':
+        benchBidirectional(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed)
+    elif args.bench == 'matrix':
+        benchMatrix(loadRoadGraph(args.nodes, args.edges, 'roadgraph.bin'), 'roadgraph.bin',
+                    args.sources, args.targets, args.seed, args.processes)
+    elif args.bench == 'snap':
+        benchSnap(loadRoadGraph(args.nodes, args.edges), args.fixes, args.seed)
+    elif args.bench == 'cache':
+        benchCache(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed)
+    elif args.bench == 'isochrone':
+        benchIsochrone(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed)
+    elif args.bench == 'suite':
+        benchSuite(loadRoadGraph(args.nodes, args.edges), args.queries, args.seed, args.landmarks, args.output)
+    elif args.bench == 'compare':
+        if len(args.files) != 2:
+            parser.error("compare needs the old and new results files")
+        sys.exit(1 if compareResults(args.files[0], args.files[1], RESULT_COLUMNS, RESULT_METRICS,
+                                     args.threshold, NOISE_MS) else 0)
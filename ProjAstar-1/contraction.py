@@ -0,0 +1,284 @@
+"""
+@author - Christopher Silva
+@description - Contraction hierarchy for the road graph. Nodes are
+contracted one at a time, least important first, and every shortest path
+that ran through a contracted node is kept as a shortcut edge between its
+neighbors. A query then only searches upward in contraction order, forward
+from the start and backward from the end, and the two searches meet at the
+most important node of the route.
+
+The hierarchy is saved in the same cache layout as roadgraph.bin (see
+roadgraph.saveArrays) so it is built once per road network.
+"""
+import heapq
+
+import numpy as np
+
+from roadgraph import graphDigest, loadArrays, saveArrays
+
+MAGIC = b'ROADCH01'
+INF = float('inf')
+#settled nodes a witness search may look at before it gives up and the
+#shortcut is added anyway, which keeps contraction fast at the cost of a few
+#unneeded shortcuts
+WITNESS_LIMIT = 60
+
+
+def _witnessCosts(out, source, skip, limit):
+    #costs from source without passing through skip, up to limit
+    cost = {source: 0.0}
+    open = [(0.0, source)]
+    settled = 0
+    while open and settled < WITNESS_LIMIT:
+        c, u = heapq.heappop(open)
+        if c > cost[u]:
+            continue
+        if c > limit:
+            break
+        settled += 1
+        for w, cw in out[u].items():
+            newCost = c + cw
+            if w != skip and newCost < cost.get(w, INF):
+                cost[w] = newCost
+                heapq.heappush(open, (newCost, w))
+    return cost
+
+
+def _shortcuts(out, inn, v):
+    #(u, w, cost) for every u -> v -> w that no witness path beats
+    shortcuts = []
+    for u, cu in inn[v].items():
+        via = [(w, cu + cw) for w, cw in out[v].items() if w != u]
+        if not via:
+            continue
+        cost = _witnessCosts(out, u, v, max(c for _, c in via))
+        shortcuts.extend((u, w, c) for w, c in via if cost.get(w, INF) > c)
+    return shortcuts
+
+
+def _importance(out, inn, deleted, v):
+    #edge difference plus contracted neighbors, smaller goes first
+    return len(_shortcuts(out, inn, v)) - len(out[v]) - len(inn[v]) + deleted[v]
+
+
+class ContractionHierarchy:
+    """
+    rank[u] is the contraction order of node u. The upward edges of u are
+    upTargets[upOffsets[u]:upOffsets[u+1]], the edges u -> w with w ranked
+    higher, and the downward edges into u are downSources[downOffsets[u]:
+    downOffsets[u+1]], the edges w -> u with w ranked higher. A middle of -1
+    is an original edge, anything else the contracted node a shortcut skips.
+    """
+    ARRAYS = ("rank", "upOffsets", "upTargets", "upWeights", "upMiddle",
+              "downOffsets", "downSources", "downWeights", "downMiddle")
+
+    def __init__(self, rank, upOffsets, upTargets, upWeights, upMiddle,
+                 downOffsets, downSources, downWeights, downMiddle, shortcutCount=0):
+        self.rank = rank
+        self.upOffsets = upOffsets
+        self.upTargets = upTargets
+        self.upWeights = upWeights
+        self.upMiddle = upMiddle
+        self.downOffsets = downOffsets
+        self.downSources = downSources
+        self.downWeights = downWeights
+        self.downMiddle = downMiddle
+        self.shortcutCount = shortcutCount
+        self._rank = memoryview(np.ascontiguousarray(rank))
+        self._up = [memoryview(np.ascontiguousarray(a)) for a in (upOffsets, upTargets, upWeights, upMiddle)]
+        self._down = [memoryview(np.ascontiguousarray(a)) for a in
+                      (downOffsets, downSources, downWeights, downMiddle)]
+
+    @property
+    def nodeCount(self):
+        return len(self.rank)
+
+    def _edge(self, a, b):
+        #(cost, middle) of the hierarchy edge a -> b, which is one of a's up
+        #edges when b is ranked higher and one of b's down edges otherwise
+        rank = self._rank
+        if rank[b] > rank[a]:
+            offsets, ends, weights, middles = self._up
+            node, other = a, b
+        else:
+            offsets, ends, weights, middles = self._down
+            node, other = b, a
+        for e in range(offsets[node], offsets[node + 1]):
+            if ends[e] == other:
+                return weights[e], middles[e]
+        raise KeyError((a, b))
+
+    def _unpack(self, a, b, path):
+        #appends the original nodes after a on the edge a -> b
+        _, middle = self._edge(a, b)
+        if middle == -1:
+            path.append(b)
+            return
+        self._unpack(a, middle, path)
+        self._unpack(middle, b, path)
+
+    def query(self, source, target):
+        """
+        Bidirectional upward search between two node indexes.
+        Returns:
+            (cost, meeting node or -1, forward parents, backward parents,
+             settled nodes)
+        """
+        costs = ({source: 0.0}, {target: 0.0})
+        parents = ({source: -1}, {target: -1})
+        opens = ([(0.0, source)], [(0.0, target)])
+        edges = (self._up[:3], self._down[:3])
+        best = 0.0 if source == target else INF
+        meet = source if source == target else -1
+        settled = 0
+        while True:
+            #take the direction with the smaller key, both searches are done
+            #once neither key can beat the best meeting found so far
+            forward = opens[0][0][0] if opens[0] else INF
+            backward = opens[1][0][0] if opens[1] else INF
+            if min(forward, backward) >= best:
+                break
+            side = 0 if forward <= backward else 1
+            c, u = heapq.heappop(opens[side])
+            cost = costs[side]
+            if c > cost[u]:
+                continue
+            settled += 1
+            other = costs[1 - side]
+            offsets, ends, weights = edges[side]
+            for e in range(offsets[u], offsets[u + 1]):
+                w = ends[e]
+                newCost = c + weights[e]
+                if newCost < cost.get(w, INF):
+                    cost[w] = newCost
+                    parents[side][w] = u
+                    heapq.heappush(opens[side], (newCost, w))
+                    if w in other and newCost + other[w] < best:
+                        best = newCost + other[w]
+                        meet = w
+        return best, meet, parents[0], parents[1], settled
+
+    def routeNodes(self, source, target):
+        """
+        Shortest route between two node indexes, shortcuts unpacked.
+        Returns:
+            (list of node indexes, cost, settled nodes)
+        """
+        cost, meet, forward, backward, settled = self.query(source, target)
+        if meet == -1:
+            return [], INF, settled
+        #the hierarchy nodes from source up to meet and back down to target
+        nodes = []
+        u = meet
+        while u != -1:
+            nodes.append(u)
+            u = forward[u]
+        nodes.reverse()
+        u = backward[meet]
+        while u != -1:
+            nodes.append(u)
+            u = backward[u]
+        path = [nodes[0]]
+        for a, b in zip(nodes, nodes[1:]):
+            self._unpack(a, b, path)
+        return path, cost, settled
+
+
+def buildHierarchy(graph):
+    """
+    Contracts every node of a RoadGraph, lazily re-checking each node's
+    importance as it comes off the queue.
+    Returns:
+        A ContractionHierarchy.
+    """
+    n = graph.nodeCount
+    out = [{} for _ in range(n)]
+    inn = [{} for _ in range(n)]
+    middle = {}
+    offsets = graph.offsets.tolist()
+    targets = graph.targets.tolist()
+    weights = graph.weights.tolist()
+    for u in range(n):
+        for e in range(offsets[u], offsets[u + 1]):
+            w = targets[e]
+            if w != u and weights[e] < out[u].get(w, INF):
+                out[u][w] = weights[e]
+                inn[w][u] = weights[e]
+
+    deleted = [0] * n
+    open = [(_importance(out, inn, deleted, v), v) for v in range(n)]
+    heapq.heapify(open)
+    rank = np.empty(n, dtype=np.int32)
+    up = [None] * n
+    down = [None] * n
+    shortcutCount = 0
+    order = 0
+    while open:
+        _, v = heapq.heappop(open)
+        importance = _importance(out, inn, deleted, v)
+        if open and importance > open[0][0]:
+            heapq.heappush(open, (importance, v))
+            continue
+        shortcuts = _shortcuts(out, inn, v)
+        rank[v] = order
+        order += 1
+        up[v] = [(w, c, middle.get((v, w), -1)) for w, c in out[v].items()]
+        down[v] = [(u, c, middle.get((u, v), -1)) for u, c in inn[v].items()]
+        for w in out[v]:
+            del inn[w][v]
+            deleted[w] += 1
+        for u in inn[v]:
+            del out[u][v]
+            deleted[u] += 1
+        out[v] = {}
+        inn[v] = {}
+        for u, w, c in shortcuts:
+            if c < out[u].get(w, INF):
+                if w not in out[u]:
+                    shortcutCount += 1
+                out[u][w] = c
+                inn[w][u] = c
+                middle[(u, w)] = v
+
+    def pack(lists):
+        counts = np.array([len(l) for l in lists], dtype=np.int64)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        flat = [edge for l in lists for edge in l]
+        ends = np.array([edge[0] for edge in flat], dtype=np.int32)
+        weights = np.array([edge[1] for edge in flat], dtype=np.float64)
+        middles = np.array([edge[2] for edge in flat], dtype=np.int32)
+        return offsets, ends, weights, middles
+
+    return ContractionHierarchy(rank, *pack(up), *pack(down), shortcutCount=shortcutCount)
+
+
+def _graphKey(graph):
+    #tells whether a saved hierarchy was built from this graph, any edit to
+    #an edge or its weight changes the digest
+    return {"nodes": int(graph.nodeCount), "edges": int(graph.edgeCount), "digest": graphDigest(graph)}
+
+
+def saveHierarchy(ch, graph, path):
+    meta = _graphKey(graph)
+    meta["shortcuts"] = ch.shortcutCount
+    saveArrays(path, MAGIC, [(name, getattr(ch, name)) for name in ContractionHierarchy.ARRAYS], meta)
+
+
+def loadHierarchy(graph, cachePath='roadgraph.ch'):
+    """
+    Maps the saved hierarchy when it was built from graph, otherwise (or when
+    it can't be read) contracts graph and saves the result.
+    Returns:
+        A ContractionHierarchy.
+    """
+    try:
+        arrays, meta = loadArrays(cachePath, MAGIC)
+        if all(meta.get(k) == v for k, v in _graphKey(graph).items()):
+            return ContractionHierarchy(*[arrays[name] for name in ContractionHierarchy.ARRAYS],
+                                        shortcutCount=meta["shortcuts"])
+    except (ValueError, KeyError, OSError):
+        pass
+    ch = buildHierarchy(graph)
+    saveHierarchy(ch, graph, cachePath)
+    return ch
@@ -0,0 +1,192 @@
+"""
+@author - Christopher Silva
+@description - Travel cost matrices between many sources and many targets on
+the road network. Each source is one Dijkstra search that stops once every
+target is settled, the sources are split into chunks answered by a pool of
+processes that each memory map the same roadgraph.bin, and the rows come
+back in source order as soon as each chunk is done so a huge matrix never
+has to be held in memory.
+
+Point files hold one segment id or lat,lon per line. The matrix is written
+as a .npy file (filled in row by row through a memory map) or as comma
+separated text, inf where there is no route. Throughput goes to stderr.
+
+Usage:
+    python distancematrix.py sources.txt targets.txt -o matrix.npy [--processes N]
+"""
+import argparse
+import heapq
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from roadgraph import loadRoadGraph, loadRoadGraphCache
+from routing import INF, RoadRouter, parsePoint
+
+#csr views and target columns of the current worker process, set up once by
+#_initWorker
+_graph = None
+_targetColumns = None
+
+
+def _initWorker(cachePath, targets):
+    global _graph, _targetColumns
+    graph = loadRoadGraphCache(cachePath)
+    _graph = tuple(memoryview(np.ascontiguousarray(a)) for a in (graph.offsets, graph.targets, graph.weights))
+    _targetColumns = _columns(targets)
+
+
+def oneToMany(offsets, targets, weights, source, columns):
+    """
+    Costs from source to many nodes with one Dijkstra search that stops as
+    soon as all of them are settled.
+    Args:
+        columns: Dict of node -> list of the row positions it fills.
+    Returns:
+        The row as a float64 array, inf where there is no route.
+    """
+    row = np.full(sum(len(c) for c in columns.values()), INF)
+    left = len(columns)
+    cost = {source: 0.0}
+    open = [(0.0, source)]
+    push = heapq.heappush
+    pop = heapq.heappop
+    while open and left:
+        c, u = pop(open)
+        if c > cost[u]:
+            continue
+        if u in columns:
+            row[columns[u]] = c
+            left -= 1
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            newCost = c + weights[e]
+            if newCost < cost.get(v, INF):
+                cost[v] = newCost
+                push(open, (newCost, v))
+    return row
+
+
+def _columns(targets):
+    #node -> positions, a node may be asked for more than once
+    columns = {}
+    for i, node in enumerate(targets):
+        columns.setdefault(int(node), []).append(i)
+    return columns
+
+
+def answerChunk(first, sources, graph=None, columns=None):
+    """
+    Rows of the matrix for a list of source nodes.
+    Args:
+        graph, columns: The csr views and the _columns of the targets, the
+                        worker's own when None.
+    Returns:
+        (first, block of len(sources) rows)
+    """
+    offsets, ends, weights = _graph if graph is None else graph
+    columns = _targetColumns if columns is None else columns
+    block = np.empty((len(sources), sum(len(c) for c in columns.values())))
+    for i, source in enumerate(sources):
+        block[i] = oneToMany(offsets, ends, weights, int(source), columns)
+    return first, block
+
+
+def matrixBlocks(sources, targets, cachePath='roadgraph.bin', processes=None, chunkSize=16):
+    """
+    Yields (first row, block of rows) in source order. cachePath must hold
+    the current graph (loadRoadGraph writes it). At most two chunks per
+    process are in flight at once.
+    Args:
+        processes: Pool size, None for one per cpu and 0 to work in this
+                   process.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    chunks = ((first, sources[first:first + chunkSize]) for first in range(0, len(sources), chunkSize))
+    if processes == 0:
+        graph = loadRoadGraphCache(cachePath)
+        views = tuple(memoryview(np.ascontiguousarray(a)) for a in (graph.offsets, graph.targets, graph.weights))
+        columns = _columns(targets)
+        for first, chunk in chunks:
+            yield answerChunk(first, chunk, views, columns)
+        return
+
+    pool = multiprocessing.Pool(processes, _initWorker, (cachePath, targets))
+    try:
+        maxInFlight = 2 * (processes or multiprocessing.cpu_count())
+        pending = deque()
+        for first, chunk in chunks:
+            pending.append(pool.apply_async(answerChunk, (first, chunk)))
+            if len(pending) >= maxInFlight:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+
+def distanceMatrix(sources, targets, cachePath='roadgraph.bin', processes=None, chunkSize=16):
+    """
+    The len(sources) by len(targets) matrix of travel costs between node
+    indexes, inf where there is no route
+    """
+    matrix = np.empty((len(sources), len(targets)))
+    for first, block in matrixBlocks(sources, targets, cachePath, processes, chunkSize):
+        matrix[first:first + len(block)] = block
+    return matrix
+
+
+def readPoints(path, router):
+    """
+    Node indexes of the segment ids / lat,lon points in a file, one a line
+    """
+    with open(path, 'r') as f:
+        return np.array([router.resolve(parsePoint(line.strip())) for line in f if line.strip()],
+                        dtype=np.int64)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Road travel cost matrix")
+    parser.add_argument('sources', help="file of source segment ids or lat,lon points")
+    parser.add_argument('targets', help="file of target segment ids or lat,lon points")
+    parser.add_argument('-o', '--output', help="matrix file, .npy or text (default text to stdout)")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="worker processes, 0 to run in this process (default one per cpu)")
+    parser.add_argument('--chunk', type=int, default=16, help="sources per work unit")
+    parser.add_argument('--nodes', default='nodes.csv')
+    parser.add_argument('--edges', default='edges.csv')
+    parser.add_argument('--cache', default='roadgraph.bin')
+    args = parser.parse_args()
+
+    #make sure the cache is current before the workers map it
+    router = RoadRouter(loadRoadGraph(args.nodes, args.edges, args.cache))
+    sources = readPoints(args.sources, router)
+    targets = readPoints(args.targets, router)
+
+    start = time.perf_counter()
+    blocks = matrixBlocks(sources, targets, args.cache, args.processes, args.chunk)
+    if args.output and args.output.endswith('.npy'):
+        matrix = np.lib.format.open_memmap(args.output, mode='w+', dtype=np.float64,
+                                           shape=(len(sources), len(targets)))
+        for first, block in blocks:
+            matrix[first:first + len(block)] = block
+        matrix.flush()
+        del matrix
+    else:
+        output = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            for _, block in blocks:
+                for row in block:
+                    output.write(",".join(repr(float(c)) for c in row) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    seconds = time.perf_counter() - start
+    pairs = len(sources) * len(targets)
+    sys.stderr.write("%d x %d matrix, %d pairs in %.3f seconds (%.0f pairs/sec)\n" %
+                     (len(sources), len(targets), pairs, seconds, pairs / seconds if seconds else 0.0))
@@ -0,0 +1,155 @@
+"""
+@author - Christopher Silva
+@description - Random access to nodegeometry.json without loading it. One
+pass over the file records the byte offset of every node's line, the offsets
+are saved beside the file (nodegeometry.json.idx) and a lookup seeks to the
+line and parses just that record. Recently used geometries are kept in a
+small LRU cache.
+"""
+import json
+import os
+import re
+from collections import OrderedDict
+
+import numpy as np
+
+from roadgraph import isFresh, loadArrays, saveArrays
+
+MAGIC = b'GEOINDX2'
+#the id when it is the first key of the line's object, so an "id" nested in
+#the properties or the geometry can't be taken for it
+ID_PATTERN = re.compile(rb'\s*\{\s*"id"\s*:\s*"?([^",}\s]+)')
+
+
+def buildGeometryIndex(path):
+    """
+    Scans the json lines file once.
+    Returns:
+        (ids, offsets) with ids a sorted bytes array and offsets[i] the byte
+        offset of the line for ids[i].
+    """
+    ids = []
+    offsets = []
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            #the id is found with a regex, only lines where it isn't the
+            #first key pay for json.loads
+            match = ID_PATTERN.match(line)
+            if match:
+                ids.append(match.group(1))
+                offsets.append(offset)
+            elif line.strip():
+                ids.append(str(json.loads(line)['id']).encode('utf-8'))
+                offsets.append(offset)
+            offset += len(line)
+    ids = np.array(ids, dtype=np.bytes_) if ids else np.empty(0, dtype='S1')
+    offsets = np.array(offsets, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    return ids[order], offsets[order]
+
+
+class GeometryStore:
+    """
+    Maps node id -> list of points for a nodegeometry.json style file (one
+    json object per line with an "id" and a json encoded "geometry").
+    """
+    def __init__(self, path='nodegeometry.json', indexPath=None, cacheSize=1024):
+        self.path = path
+        self.indexPath = indexPath or path + '.idx'
+        self.cacheSize = cacheSize
+        self._cache = OrderedDict()
+        self._file = None
+        self.ids, self.offsets = self._loadIndex()
+
+    def _loadIndex(self):
+        #reuse the saved index only if it is newer than the file and was
+        #built from a file of the same size
+        size = os.path.getsize(self.path)
+        if isFresh(self.indexPath, self.path):
+            try:
+                arrays, meta = loadArrays(self.indexPath, MAGIC)
+                if meta.get("size") == size:
+                    return arrays["ids"], arrays["offsets"]
+            except (ValueError, KeyError, OSError):
+                pass
+        ids, offsets = buildGeometryIndex(self.path)
+        saveArrays(self.indexPath, MAGIC, [("ids", ids), ("offsets", offsets)], {"size": size})
+        return ids, offsets
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, nodeId):
+        return self._offset(nodeId) is not None
+
+    def __getitem__(self, nodeId):
+        return self.get(nodeId)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _offset(self, nodeId):
+        key = str(nodeId).encode('utf-8')
+        i = int(np.searchsorted(self.ids, key))
+        if i == len(self.ids) or self.ids[i] != key:
+            return None
+        return int(self.offsets[i])
+
+    def _read(self, offset):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        self._file.seek(offset)
+        record = json.loads(self._file.readline())
+        geometry = record['geometry']
+        #the geometry is itself a json string in the file
+        if isinstance(geometry, str):
+            geometry = json.loads(geometry)
+        return geometry
+
+    def _remember(self, key, geometry):
+        self._cache[key] = geometry
+        if len(self._cache) > self.cacheSize:
+            self._cache.popitem(last=False)
+
+    def get(self, nodeId, default=None):
+        """
+        The list of points of one node, or default when the id is unknown
+        """
+        key = str(nodeId)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        offset = self._offset(key)
+        if offset is None:
+            return default
+        geometry = self._read(offset)
+        self._remember(key, geometry)
+        return geometry
+
+    def get_many(self, nodeIds):
+        """
+        Geometries of many nodes. Records that are not cached are read in file
+        order so a large batch is one forward sweep through the file.
+        Returns:
+            A dict of id (as a string) -> list of points, unknown ids left out.
+        """
+        found = {}
+        toRead = []
+        for nodeId in nodeIds:
+            key = str(nodeId)
+            if key in found:
+                continue
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                found[key] = self._cache[key]
+                continue
+            offset = self._offset(key)
+            if offset is not None:
+                toRead.append((offset, key))
+        for offset, key in sorted(toRead):
+            found[key] = self._read(offset)
+            self._remember(key, found[key])
+        return found
@@ -0,0 +1,133 @@
+"""
+@author - Christopher Silva
+@description - Isochrones on the road network: every segment reachable
+within a cost budget of one or more origins. A Dijkstra search runs from all
+origins at once and stops at the budget, so the answer costs no more than
+the area it covers.
+
+The reachable area can come back as a polygon over the segment centers,
+either their convex hull or a concave outline: the boundary of the grid
+cells (resolution degrees on a side) that hold a reachable center, which
+follows the shape of the road network instead of spanning its gaps. Both
+polygons come from shared/hulls.py.
+
+Usage:
+    python isochrone.py budget origin [origin ...] [--hull convex|concave]
+"""
+import argparse
+import heapq
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from roadgraph import loadRoadGraph
+from routing import INF, RoadRouter, parsePoint
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from hulls import cellOutline, convexHull
+
+#nodes are node indexes in cost order, ids their segment ids, costs the
+#cost of reaching each from the nearest origin and hull None or a (k, 2)
+#array of (lat, lon) polygon corners, counter clockwise
+Isochrone = namedtuple('Isochrone', ['nodes', 'ids', 'costs', 'hull'])
+
+
+def boundedDijkstra(offsets, targets, weights, sources, budget):
+    """
+    Dijkstra from every source at once, stopping at budget.
+    Returns:
+        (node indexes, costs) as arrays in order of cost, every node that
+        can be reached from some source for at most budget.
+    """
+    cost = {}
+    open = []
+    for source in sources:
+        source = int(source)
+        if source not in cost:
+            cost[source] = 0.0
+            open.append((0.0, source))
+    heapq.heapify(open)
+    nodes = []
+    costs = []
+    push = heapq.heappush
+    pop = heapq.heappop
+    while open:
+        c, u = pop(open)
+        if c > cost[u]:
+            continue
+        if c > budget:
+            break
+        nodes.append(u)
+        costs.append(c)
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            newCost = c + weights[e]
+            if newCost <= budget and newCost < cost.get(v, INF):
+                cost[v] = newCost
+                push(open, (newCost, v))
+    return np.array(nodes, dtype=np.int64), np.array(costs, dtype=np.float64)
+
+
+class IsochroneFinder:
+    """
+    Isochrone queries on a RoadRouter's graph
+    """
+    def __init__(self, router):
+        self.router = router
+        self.graph = router.graph
+
+    def reachable(self, origins, budget, hull=None, resolution=0.01):
+        """
+        Every segment within budget of any of the origins (segment ids or
+        (lat, lon) points).
+        Args:
+            hull: None, 'convex' or 'concave'.
+            resolution: Cell size in degrees of the concave outline.
+        Returns:
+            An Isochrone.
+        """
+        router = self.router
+        if router.version != self.graph.version:
+            router._refresh()
+        sources = [router.resolve(origin) for origin in origins]
+        nodes, costs = boundedDijkstra(router.offsets, router.targets, router.weights, sources, budget)
+        return Isochrone(nodes, self.graph.ids[nodes], costs, self._hull(nodes, hull, resolution))
+
+    def isochrones(self, origins, budget, hull=None, resolution=0.01):
+        """
+        One Isochrone per origin
+        """
+        return [self.reachable([origin], budget, hull, resolution) for origin in origins]
+
+    def _hull(self, nodes, hull, resolution):
+        if hull is None:
+            return None
+        lat = self.graph.lat[nodes]
+        lon = self.graph.lon[nodes]
+        if hull == 'convex':
+            corners = convexHull(lon, lat)
+            return corners[:, ::-1].astype(np.float64)
+        if hull == 'concave':
+            corners = cellOutline(np.floor(lon / resolution).astype(np.int64),
+                                  np.floor(lat / resolution).astype(np.int64))
+            return corners[:, ::-1] * resolution
+        raise ValueError("hull must be None, 'convex' or 'concave', not %r" % (hull,))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Segments reachable within a budget")
+    parser.add_argument('budget', type=float)
+    parser.add_argument('origins', nargs='+', help="segment ids or lat,lon points")
+    parser.add_argument('--hull', choices=['convex', 'concave'])
+    parser.add_argument('--resolution', type=float, default=0.01)
+    args = parser.parse_args()
+
+    finder = IsochroneFinder(RoadRouter(loadRoadGraph('nodes.csv', 'edges.csv', 'roadgraph.bin')))
+    result = finder.reachable([parsePoint(o) for o in args.origins], args.budget, args.hull, args.resolution)
+    print('%d segments reachable' % len(result.nodes))
+    for segmentId, cost in zip(result.ids.tolist(), result.costs.tolist()):
+        print('%d\t%.3f' % (segmentId, cost))
+    if result.hull is not None:
+        print('hull ' + ' '.join('%.6f,%.6f' % (lat, lon) for lat, lon in result.hull.tolist()))
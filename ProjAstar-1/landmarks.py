@@ -0,0 +1,181 @@
+"""
+@author - Christopher Silva
+@description - Landmark (ALT) lower bounds for road routing. For a landmark L
+the triangle inequality gives
+    cost(u, t) >= cost(u, L) - cost(t, L)
+    cost(u, t) >= cost(L, t) - cost(L, u)
+so with the costs to and from a few landmarks stored for every node, the
+largest of those differences is a lower bound that follows the roads instead
+of the straight line.
+
+The road network is mostly one way chains (the largest strongly connected
+piece is about a hundred segments), so a landmark only bounds the routes
+that can reach it or be reached from it. Landmarks are picked to cover as
+many nodes as possible before falling back to farthest-first.
+"""
+import heapq
+
+import numpy as np
+
+from roadgraph import graphDigest, loadArrays, saveArrays
+from routing import dijkstraArray
+
+MAGIC = b'ROADALT1'
+INF = float('inf')
+#float32 costs are off by at most a few units in the last place, a bound is
+#lowered by this fraction of the largest stored cost to stay below the truth
+ROUNDING = 4.0 * float(np.finfo(np.float32).eps)
+
+
+def _reach(offsets, ends, source):
+    #every node reachable from source over the csr arrays, as a set
+    seen = {source}
+    stack = [source]
+    while stack:
+        u = stack.pop()
+        for e in range(offsets[u], offsets[u + 1]):
+            v = ends[e]
+            if v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return seen
+
+
+class Landmarks:
+    """
+    nodes[i] is landmark i, fromLandmark[i, u] the cost from it to node u and
+    toLandmark[i, u] the cost from node u to it (float32, inf if no route).
+    """
+    def __init__(self, nodes, fromLandmark, toLandmark):
+        self.nodes = nodes
+        self.fromLandmark = fromLandmark
+        self.toLandmark = toLandmark
+        self._from = [memoryview(np.ascontiguousarray(row)) for row in fromLandmark]
+        self._to = [memoryview(np.ascontiguousarray(row)) for row in toLandmark]
+        finite = np.concatenate([fromLandmark[np.isfinite(fromLandmark)],
+                                 toLandmark[np.isfinite(toLandmark)], [0.0]])
+        self.slack = ROUNDING * float(finite.max())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def potential(self, target, fallback=None):
+        """
+        The landmark lower bound on the cost of reaching node target, or the
+        larger of it and fallback(u). Only landmarks with a route to or from
+        target can bound anything, so the others are left out.
+        """
+        terms = []
+        for i in range(len(self.nodes)):
+            toT = float(self.toLandmark[i, target])
+            fromT = float(self.fromLandmark[i, target])
+            if toT < INF or fromT < INF:
+                terms.append((self._to[i], toT, self._from[i], fromT))
+        slack = self.slack
+
+        def h(u):
+            best = fallback(u) if fallback else 0.0
+            for toL, toT, fromL, fromT in terms:
+                #u can't get to L but target can (or L gets to u but not to
+                #target), then u can't get to target either
+                bound = max(toL[u] - toT if toT < INF else -INF,
+                            fromT - fromL[u] if fromL[u] < INF else -INF)
+                if bound == INF:
+                    return INF
+                if bound - slack > best:
+                    best = bound - slack
+            return best
+        return h
+
+
+def selectLandmarks(graph, count=16, candidates=256, seed=0):
+    """
+    Picks up to count landmarks and computes their costs. A route s -> t is
+    bounded by a landmark that t can reach or that can reach s, so while that
+    leaves some nodes out, the next landmark is the node that covers the most
+    of them (each pick avoids the parts the earlier ones already bound).
+    Working out what a node covers walks everything it reaches, so only a
+    seeded sample of candidates nodes is tried, topped up after every pick
+    with a quarter as many nodes no landmark bounds yet. That keeps picking
+    linear in the size of the graph. After that each landmark is the node
+    farthest from the ones already picked.
+    Returns:
+        A Landmarks.
+    """
+    forward = [memoryview(np.ascontiguousarray(a)) for a in (graph.offsets, graph.targets, graph.weights)]
+    backward = [memoryview(np.ascontiguousarray(a)) for a in graph.reverse()]
+    n = graph.nodeCount
+    reachesTo = set()
+    reachedFrom = set()
+
+    def gain(v):
+        return (len(_reach(backward[0], backward[1], v) - reachesTo) +
+                len(_reach(forward[0], forward[1], v) - reachedFrom))
+
+    #lazy greedy, a node's gain only shrinks as landmarks are added
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(n, min(n, candidates), replace=False)
+    open = [(-gain(v), v) for v in sample.tolist()]
+    heapq.heapify(open)
+    #cost from each node to its nearest landmark, either direction
+    gap = np.full(n, INF)
+    nodes, fromRows, toRows = [], [], []
+    while len(nodes) < count:
+        if nodes:
+            unbound = np.flatnonzero(np.isinf(gap))
+            if len(unbound):
+                for v in rng.choice(unbound, min(len(unbound), candidates // 4), replace=False).tolist():
+                    heapq.heappush(open, (-gain(v), v))
+        node = -1
+        while open and open[0][0] < 0:
+            _, v = heapq.heappop(open)
+            fresh = gain(v)
+            if not open or -fresh <= open[0][0]:
+                if fresh > 0:
+                    node = v
+                break
+            heapq.heappush(open, (-fresh, v))
+        if node == -1:
+            finite = np.where(np.isfinite(gap), gap, -1.0)
+            if finite.max() <= 0.0:
+                break
+            node = int(np.argmax(finite))
+        else:
+            reachesTo |= _reach(backward[0], backward[1], node)
+            reachedFrom |= _reach(forward[0], forward[1], node)
+        fromNode = dijkstraArray(forward[0], forward[1], forward[2], n, node)
+        toNode = dijkstraArray(backward[0], backward[1], backward[2], n, node)
+        nodes.append(node)
+        fromRows.append(fromNode)
+        toRows.append(toNode)
+        gap = np.minimum(gap, np.minimum(fromNode, toNode))
+    shape = (len(nodes), n)
+    return Landmarks(np.array(nodes, dtype=np.int32),
+                     np.array(fromRows, dtype=np.float32).reshape(shape),
+                     np.array(toRows, dtype=np.float32).reshape(shape))
+
+
+def _graphKey(graph, count):
+    #tells whether saved landmarks were picked on this graph with count
+    return {"nodes": int(graph.nodeCount), "edges": int(graph.edgeCount), "digest": graphDigest(graph),
+            "count": count}
+
+
+def loadLandmarks(graph, count=16, cachePath='roadgraph.alt'):
+    """
+    Maps saved landmarks when they were picked on graph with the same count,
+    otherwise picks them and saves them.
+    Returns:
+        A Landmarks.
+    """
+    key = _graphKey(graph, count)
+    try:
+        arrays, meta = loadArrays(cachePath, MAGIC)
+        if meta == key:
+            return Landmarks(arrays["nodes"], arrays["fromLandmark"], arrays["toLandmark"])
+    except (ValueError, KeyError, OSError):
+        pass
+    landmarks = selectLandmarks(graph, count)
+    saveArrays(cachePath, MAGIC, [("nodes", landmarks.nodes), ("fromLandmark", landmarks.fromLandmark),
+                                  ("toLandmark", landmarks.toLandmark)], key)
+    return landmarks
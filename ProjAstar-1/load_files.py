@@ -4,35 +4,20 @@
 @description - This program loads the nodes, edges, and geometry files so
 that they can be using in other programs
 """
-import csv
-import json
+from geometrystore import GeometryStore
+from roadgraph import loadRoadGraph
 
 print ('Christopher Silva\nProgram 5 - Part 1\n')
 
-nodes =[]
-edges = []
-geometry = {}
+#maps roadgraph.bin when it is newer than the csv files, otherwise rebuilds it
+graph = loadRoadGraph('nodes.csv', 'edges.csv', 'roadgraph.bin')
+print ('nodes.csv read containing ',graph.nodeCount,' nodes.')
+print ('edges.csv read containing ',graph.edgeCount,' edges.\n')
 
-with open('nodes.csv', 'r') as csvfile:
-    rows = csv.reader(csvfile, delimiter=',', quotechar='"')
-    for row in rows:
-        nodes.append(row)
-    print ('nodes.csv read containing ',len(nodes),' nodes.')
-    
-with open('edges.csv', 'r') as csvfile:
-    rows = csv.reader(csvfile, delimiter=',', quotechar='"')
-    for row in rows:
-        edges.append(row)
-    print ('edges.csv read containing ',len(edges),' edges.\n')
-
-f = open('nodegeometry.json', 'r')
-
-for line in f:
-    line = json.loads(line)
-    #use json.loads on line['geometry'] so that the value for the node id is a list
-    #instead of a string
-    geometry[line['id']] = json.loads(line['geometry'])
+#only the id -> byte offset index (nodegeometry.json.idx) is kept in memory,
+#a node's geometry is read from the file when it is asked for
+geometry = GeometryStore('nodegeometry.json')
 
 print ('Node 202451 contains ',len(geometry['202451']),' points. The geometry follows:\n')
 for point in geometry['202451']:
-    print(point)
\ No newline at end of file
+    print(point)
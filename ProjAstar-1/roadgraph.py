@@ -0,0 +1,315 @@
+"""
+@author - Christopher Silva
+@description - Loads the road network (nodes.csv, edges.csv) into a compact
+compressed sparse row graph and caches it as a binary file that later runs
+memory map instead of parsing the csv files again.
+
+Each row of nodes.csv is a road segment: id, start lat, start lon, end lat,
+end lon, ..., length. The segments are the nodes of the graph and edges.csv
+says which segment can be driven onto from which. Node ids are remapped to
+dense indexes 0..n-1 in id order, so ids[i] is the id of node i.
+
+Moving from segment u onto segment v costs half of each segment's length
+(center of u to center of v), so a route costs the length driven between the
+centers of its first and last segment.
+
+Cache layout: the magic bytes, a little endian uint64 header length, a json
+header naming each array with its dtype, shape and byte offset, then the raw
+arrays, each starting on a 64 byte boundary.
+"""
+import csv
+import hashlib
+import json
+import os
+import struct
+from array import array
+
+import numpy as np
+
+MAGIC = b'ROADCSR1'
+VERSION = 1
+ALIGN = 64
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversineKm(lat1, lon1, lat2, lon2):
+    """
+    Great circle distance in kilometers, broadcasts over numpy arrays
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin(np.radians(np.subtract(lon2, lon1)) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class RoadGraph:
+    """
+    Forward adjacency of node u is targets[offsets[u]:offsets[u+1]] with the
+    matching weights. lat/lon are segment centers, lat1/lon1/lat2/lon2 the
+    segment end points and length the length column.
+    """
+    ARRAYS = ("ids", "lat1", "lon1", "lat2", "lon2", "length", "offsets", "targets", "weights")
+
+    def __init__(self, ids, lat1, lon1, lat2, lon2, length, offsets, targets, weights):
+        self.ids = ids
+        self.lat1 = lat1
+        self.lon1 = lon1
+        self.lat2 = lat2
+        self.lon2 = lon2
+        self.length = length
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.lat = (lat1 + lat2) / 2.0
+        self.lon = (lon1 + lon2) / 2.0
+        self._reverse = None
+        self._lengthPerKm = None
+        #bumped by every change to the weights, so anything built from them
+        #(routers, route caches) can tell it is out of date
+        self.version = 0
+
+    @property
+    def nodeCount(self):
+        return len(self.ids)
+
+    @property
+    def edgeCount(self):
+        return len(self.targets)
+
+    def index(self, nodeId):
+        """
+        Dense index of an original node id (e.g. 202448)
+        Raises:
+            KeyError if there is no such node.
+        """
+        i = int(np.searchsorted(self.ids, nodeId))
+        if i == len(self.ids) or self.ids[i] != nodeId:
+            raise KeyError(nodeId)
+        return i
+
+    def indexes(self, nodeIds):
+        """
+        Dense indexes of an array of original node ids, -1 where missing
+        """
+        nodeIds = np.asarray(nodeIds, dtype=np.int64)
+        i = np.searchsorted(self.ids, nodeIds)
+        i[i == len(self.ids)] = 0
+        return np.where(self.ids[i] == nodeIds, i, -1)
+
+    def neighbors(self, u):
+        """
+        (targets, weights) of the edges leaving node u
+        """
+        start, end = self.offsets[u], self.offsets[u + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def reverse(self):
+        """
+        The backward adjacency as (offsets, sources, weights): the edges into
+        node v are sources[offsets[v]:offsets[v+1]]. Built on first use.
+        """
+        if self._reverse is None:
+            sources = np.repeat(np.arange(self.nodeCount, dtype=np.int32), np.diff(self.offsets))
+            order = np.argsort(self.targets, kind='stable')
+            offsets = np.zeros(self.nodeCount + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=self.nodeCount), out=offsets[1:])
+            self._reverse = (offsets, sources[order], self.weights[order])
+        return self._reverse
+
+    def updateWeights(self, edges, weights):
+        """
+        Sets the weights of some edges (positions in targets/weights), for
+        closures or traffic. A graph mapped from the cache gets its own copy
+        of the weights first. Hierarchies and landmarks built on the old
+        weights have to be built again (their loaders check the weights).
+        """
+        if not self.weights.flags.writeable:
+            self.weights = np.array(self.weights)
+        self.weights[edges] = weights
+        self._reverse = None
+        self._lengthPerKm = None
+        self.version += 1
+
+    def lengthPerKm(self):
+        """
+        Largest factor f with f * (great circle km between the centers of u
+        and v) <= weight(u, v) on every edge. f * km between two centers is
+        then a lower bound on the road cost between them that never drops by
+        more than an edge weight across an edge, so A* can use it as is.
+        """
+        if self._lengthPerKm is None:
+            sources = np.repeat(np.arange(self.nodeCount), np.diff(self.offsets))
+            km = haversineKm(self.lat[sources], self.lon[sources],
+                             self.lat[self.targets], self.lon[self.targets])
+            ratio = self.weights[km > 0] / km[km > 0]
+            self._lengthPerKm = float(ratio.min()) if len(ratio) else 0.0
+        return self._lengthPerKm
+
+
+def _readNodes(path):
+    ids = array('q')
+    columns = [array('d') for _ in range(5)]
+    appends = [ids.append] + [c.append for c in columns]
+    with open(path, 'r', newline='') as csvfile:
+        for row in csv.reader(csvfile, delimiter=',', quotechar='"'):
+            appends[0](int(row[0]))
+            for append, value in zip(appends[1:5], row[1:5]):
+                append(float(value))
+            appends[5](float(row[10]))
+    return [np.frombuffer(ids, dtype=np.int64)] + [np.frombuffer(c, dtype=np.float64) for c in columns]
+
+
+def _readEdges(path):
+    sources = array('q')
+    targets = array('q')
+    addSource = sources.append
+    addTarget = targets.append
+    with open(path, 'r') as edgefile:
+        for line in edgefile:
+            fields = line.split(',')
+            if len(fields) < 2:
+                continue
+            addSource(int(fields[0]))
+            addTarget(int(fields[1]))
+    return np.frombuffer(sources, dtype=np.int64), np.frombuffer(targets, dtype=np.int64)
+
+
+def buildRoadGraph(nodesPath='nodes.csv', edgesPath='edges.csv'):
+    """
+    Parses the csv files into a RoadGraph. Edges naming a segment that is not
+    in nodes.csv are dropped.
+    """
+    ids, lat1, lon1, lat2, lon2, length = _readNodes(nodesPath)
+    order = np.argsort(ids, kind='stable')
+    ids, lat1, lon1, lat2, lon2, length = (a[order] for a in (ids, lat1, lon1, lat2, lon2, length))
+
+    sources, targets = _readEdges(edgesPath)
+    graph = RoadGraph(ids, lat1, lon1, lat2, lon2, length,
+                      np.zeros(len(ids) + 1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                      np.empty(0, dtype=np.float64))
+    sources = graph.indexes(sources)
+    targets = graph.indexes(targets)
+    keep = (sources >= 0) & (targets >= 0)
+    sources = sources[keep]
+    targets = targets[keep]
+    del keep
+
+    #group the edges by source, keeping file order within a source
+    order = np.argsort(sources, kind='stable')
+    sources = sources[order]
+    targets = targets[order].astype(np.int32)
+    del order
+    offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(ids)), out=offsets[1:])
+    weights = (length[sources] + length[targets]) / 2.0
+    return RoadGraph(ids, lat1, lon1, lat2, lon2, length, offsets, targets, weights)
+
+
+def graphDigest(graph):
+    """
+    sha1 hex digest of the graph's edges (offsets, targets and weights), the
+    same for any two graphs a route can't tell apart
+    """
+    digest = hashlib.sha1()
+    for a in (graph.offsets, graph.targets, graph.weights):
+        digest.update(np.ascontiguousarray(a).data)
+    return digest.hexdigest()
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def saveArrays(path, magic, arrays, meta=None):
+    """
+    Writes named arrays (a list of (name, array)) and a json-able meta dict
+    in the cache layout, through a temporary file so readers never see half
+    a file.
+    """
+    header = {"version": VERSION, "meta": meta or {}, "arrays": {}}
+    offset = 0
+    for name, a in arrays:
+        a = np.ascontiguousarray(a)
+        header["arrays"][name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+    headerBytes = json.dumps(header).encode('utf-8')
+    dataStart = _align(len(magic) + 8 + len(headerBytes))
+
+    tmpPath = path + '.tmp'
+    with open(tmpPath, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<Q', len(headerBytes)))
+        f.write(headerBytes)
+        for name, a in arrays:
+            f.seek(dataStart + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(a).tobytes())
+        f.truncate(dataStart + offset)
+    os.replace(tmpPath, path)
+
+
+def loadArrays(path, magic):
+    """
+    Memory maps a file written by saveArrays.
+    Returns:
+        (dict of name -> read only array view, meta dict)
+    Raises:
+        ValueError if path is not a cache file of this kind and version.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError("%s is not a %s file" % (path, magic.decode('ascii')))
+        try:
+            headerLength, = struct.unpack('<Q', f.read(8))
+        except struct.error:
+            raise ValueError("%s is a truncated %s file" % (path, magic.decode('ascii')))
+        header = json.loads(f.read(headerLength).decode('utf-8'))
+    if header.get("version") != VERSION:
+        raise ValueError("%s is version %s, expected %s" % (path, header.get("version"), VERSION))
+
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    dataStart = _align(len(magic) + 8 + headerLength)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        start = dataStart + info["offset"]
+        count = int(np.prod(info["shape"]))
+        arrays[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(info["shape"])
+    return arrays, header["meta"]
+
+
+def saveRoadGraph(graph, path):
+    saveArrays(path, MAGIC, [(name, getattr(graph, name)) for name in RoadGraph.ARRAYS])
+
+
+def loadRoadGraphCache(path):
+    arrays, _ = loadArrays(path, MAGIC)
+    return RoadGraph(*[arrays[name] for name in RoadGraph.ARRAYS])
+
+
+def isFresh(cachePath, *sourcePaths):
+    """
+    True when cachePath exists and is at least as new as every source file
+    """
+    if not os.path.exists(cachePath):
+        return False
+    cacheTime = os.path.getmtime(cachePath)
+    return all(os.path.getmtime(p) <= cacheTime for p in sourcePaths)
+
+
+def loadRoadGraph(nodesPath='nodes.csv', edgesPath='edges.csv', cachePath='roadgraph.bin'):
+    """
+    Maps the cached graph when it is newer than both csv files, otherwise
+    (or when the cache can't be read) parses the csv files and rewrites the
+    cache.
+    Returns:
+        A RoadGraph.
+    """
+    if isFresh(cachePath, nodesPath, edgesPath):
+        try:
+            return loadRoadGraphCache(cachePath)
+        except (ValueError, KeyError, OSError):
+            pass
+    graph = buildRoadGraph(nodesPath, edgesPath)
+    saveRoadGraph(graph, cachePath)
+    return graph
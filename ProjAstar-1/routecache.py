@@ -0,0 +1,66 @@
+"""
+@author - Christopher Silva
+@description - Cache of routing results for repeated origin/destination
+pairs. Results are keyed by (start, end, cost model), the least recently
+used ones are dropped once the cache goes over its memory budget, and the
+whole cache is dropped when the graph's weights change (RoadGraph.version
+moves). Hits, misses, evictions and invalidations are counted for
+monitoring. RouteCache is the LRUCache in shared/lrucache.py.
+"""
+import os
+import sys
+
+from routing import Route
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'shared'))
+from lrucache import LRUCache as RouteCache
+
+#bytes an int in a cached path costs on top of the list slot that holds it
+INT_BYTES = 28
+
+
+def pathBytes(path):
+    """
+    Rough memory held by a list or tuple of node indexes or ids
+    """
+    return sys.getsizeof(path) + INT_BYTES * len(path)
+
+
+class CachedRouter:
+    """
+    A RoadRouter (or anything with the same routeNodes/resolve/graph) with
+    a RouteCache in front. costModel names the search and weights the
+    results came from, so routers with different settings can share one
+    cache without mixing their answers.
+    """
+    def __init__(self, router, costModel='length', cache=None, maxBytes=64 << 20):
+        self.router = router
+        self.costModel = costModel
+        self.cache = cache if cache is not None else RouteCache(maxBytes)
+        self.version = router.graph.version
+
+    def routeNodes(self, source, target):
+        """
+        Same as RoadRouter.routeNodes, from the cache when possible. A cached
+        answer reports 0 nodes expanded.
+        """
+        if self.version != self.router.graph.version:
+            self.cache.invalidate()
+            self.version = self.router.graph.version
+        key = (source, target, self.costModel)
+        found = self.cache.get(key)
+        if found is not None:
+            path, cost = found
+            return list(path), cost, 0
+        path, cost, expanded = self.router.routeNodes(source, target)
+        #kept as a tuple so a caller changing its list can't change the cache
+        stored = tuple(path)
+        self.cache.put(key, (stored, cost), pathBytes(stored))
+        return path, cost, expanded
+
+    def route(self, start, end):
+        """
+        Same as RoadRouter.route, from the cache when possible
+        """
+        path, cost, expanded = self.routeNodes(self.router.resolve(start), self.router.resolve(end))
+        return Route([int(self.router.graph.ids[u]) for u in path], cost, expanded)
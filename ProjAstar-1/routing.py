@@ -0,0 +1,303 @@
+"""
+@author - Christopher Silva
+@description - A* routing over the road network loaded by roadgraph. Routes
+go between segments given by id or by a (lat, lon) point, which is moved to
+the segment whose center is closest. The heuristic is the great circle
+distance to the goal's center scaled by the graph's lengthPerKm(), a lower
+bound on the road length left to drive. Given landmarks (see landmarks.py)
+the router uses the larger of that and the landmark bound.
+
+Usage:
+    python routing.py startId endId
+    python routing.py startLat,startLon endLat,endLon
+"""
+import heapq
+import math
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from roadgraph import EARTH_RADIUS_KM, haversineKm, loadRoadGraph
+
+INF = float('inf')
+
+#path is the list of segment ids from start to end (empty when there is no
+#route), cost its length and expanded the number of nodes the search settled
+Route = namedtuple('Route', ['path', 'cost', 'expanded'])
+
+
+def astar(offsets, targets, weights, source, target, potential=None):
+    """
+    A* over csr adjacency (anything indexable, memoryviews are fastest).
+    Args:
+        potential: Function of a node giving a lower bound on its cost to
+                   target (inf when it can't reach target at all). A bound
+                   that drops by no more than an edge's weight across that
+                   edge settles every node once, a slightly looser one may
+                   reopen nodes but still finds the shortest route. None
+                   searches like Dijkstra.
+    Returns:
+        (cost, parents, expanded) with parents mapping every reached node to
+        the node it was reached from (source maps to -1).
+    """
+    cost = {source: 0.0}
+    parents = {source: -1}
+    done = set()
+    expanded = 0
+    h = potential(source) if potential else 0.0
+    open = [(h, source)]
+    push = heapq.heappush
+    pop = heapq.heappop
+    while open:
+        _, u = pop(open)
+        if u in done:
+            continue
+        done.add(u)
+        expanded += 1
+        if u == target:
+            return cost[u], parents, expanded
+        costU = cost[u]
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            newCost = costU + weights[e]
+            if newCost < cost.get(v, INF):
+                cost[v] = newCost
+                parents[v] = u
+                priority = newCost + (potential(v) if potential else 0.0)
+                if priority < INF:
+                    done.discard(v)
+                    push(open, (priority, v))
+    return INF, parents, expanded
+
+
+def bidirectionalAstar(forward, backward, source, target, toTarget=None, fromSource=None):
+    """
+    A* from both ends at once over forward and backward csr arrays (each an
+    (offsets, ends, weights) triple, backward from RoadGraph.reverse()).
+    Both searches use half the difference of toTarget(u) and fromSource(u)
+    (lower bounds on cost(u, target) and cost(source, u)), which keeps them
+    consistent with each other, so the search is done as soon as the two
+    smallest keys add up to the cheapest meeting found so far. Without
+    bounds it is bidirectional Dijkstra.
+    Returns:
+        (cost, meeting node or -1, forward parents, backward parents,
+         expanded)
+    """
+    if toTarget and fromSource:
+        def potential(u):
+            return (toTarget(u) - fromSource(u)) / 2.0
+    else:
+        def potential(u):
+            return 0.0
+    costs = ({source: 0.0}, {target: 0.0})
+    parents = ({source: -1}, {target: -1})
+    opens = ([(potential(source), source)], [(-potential(target), target)])
+    done = (set(), set())
+    edges = (forward, backward)
+    signs = (1.0, -1.0)
+    best = 0.0 if source == target else INF
+    meet = source if source == target else -1
+    expanded = 0
+    push = heapq.heappush
+    pop = heapq.heappop
+    while opens[0] and opens[1]:
+        side = 0 if opens[0][0][0] <= opens[1][0][0] else 1
+        if opens[0][0][0] + opens[1][0][0] >= best:
+            break
+        _, u = pop(opens[side])
+        if u in done[side]:
+            continue
+        done[side].add(u)
+        expanded += 1
+        cost = costs[side]
+        other = costs[1 - side]
+        parent = parents[side]
+        offsets, ends, weights = edges[side]
+        sign = signs[side]
+        costU = cost[u]
+        for e in range(offsets[u], offsets[u + 1]):
+            v = ends[e]
+            newCost = costU + weights[e]
+            if newCost < cost.get(v, INF):
+                cost[v] = newCost
+                parent[v] = u
+                push(opens[side], (newCost + sign * potential(v), v))
+                if v in other and newCost + other[v] < best:
+                    best = newCost + other[v]
+                    meet = v
+    return best, meet, parents[0], parents[1], expanded
+
+
+def dijkstraArray(offsets, targets, weights, nodeCount, source):
+    """
+    Cost from source to every node as a float64 array, inf where unreachable
+    """
+    cost = [INF] * nodeCount
+    cost[source] = 0.0
+    open = [(0.0, source)]
+    push = heapq.heappush
+    pop = heapq.heappop
+    while open:
+        c, u = pop(open)
+        if c > cost[u]:
+            continue
+        for e in range(offsets[u], offsets[u + 1]):
+            v = targets[e]
+            newCost = c + weights[e]
+            if newCost < cost[v]:
+                cost[v] = newCost
+                push(open, (newCost, v))
+    return np.array(cost, dtype=np.float64)
+
+
+def tracePath(parents, target):
+    """
+    The nodes from the search's source to target, following parents
+    """
+    path = []
+    while target != -1:
+        path.append(target)
+        target = parents[target]
+    path.reverse()
+    return path
+
+
+class RoadRouter:
+    """
+    Answers routing queries on one RoadGraph. The heuristic is built per goal
+    and evaluated lazily, only for the nodes the search reaches.
+    """
+    def __init__(self, graph, landmarks=None):
+        self.graph = graph
+        self.landmarks = landmarks
+        self._refresh()
+        self.latRad = np.radians(graph.lat)
+        self.lonRad = np.radians(graph.lon)
+        self._latRad = memoryview(self.latRad)
+        self._lonRad = memoryview(self.lonRad)
+        self._cosLat = memoryview(np.cos(self.latRad))
+
+    def _refresh(self):
+        #views of the current weights, redone when the graph's version moves
+        self.version = self.graph.version
+        self.offsets = memoryview(np.ascontiguousarray(self.graph.offsets))
+        self.targets = memoryview(np.ascontiguousarray(self.graph.targets))
+        self.weights = memoryview(np.ascontiguousarray(self.graph.weights))
+        self._reverse = None
+
+    def nearestNode(self, lat, lon):
+        """
+        Index of the segment whose center is closest to (lat, lon)
+        """
+        return int(np.argmin(haversineKm(lat, lon, self.graph.lat, self.graph.lon)))
+
+    def resolve(self, point):
+        """
+        Node index of a segment id or of the segment nearest a (lat, lon)
+        pair.
+        Raises:
+            KeyError for an id that is not in the graph.
+        """
+        if isinstance(point, (tuple, list)) and len(point) == 2:
+            return self.nearestNode(float(point[0]), float(point[1]))
+        return self.graph.index(int(point))
+
+    def potential(self, target):
+        """
+        The lower bound on the cost of reaching node target, haversine or
+        with landmarks the larger of haversine and ALT
+        """
+        if self.landmarks is not None:
+            return self.landmarks.potential(target, self.geoPotential(target))
+        return self.geoPotential(target)
+
+    def geoPotential(self, target):
+        """
+        The haversine lower bound on the cost of reaching node target
+        """
+        scale = 2.0 * EARTH_RADIUS_KM * self.graph.lengthPerKm()
+        latRad = self._latRad
+        lonRad = self._lonRad
+        cosLat = self._cosLat
+        latT = latRad[target]
+        lonT = lonRad[target]
+        cosT = cosLat[target]
+        sin = math.sin
+
+        def h(u):
+            a = sin((latRad[u] - latT) / 2.0) ** 2 + cosLat[u] * cosT * sin((lonRad[u] - lonT) / 2.0) ** 2
+            return scale * math.asin(math.sqrt(min(a, 1.0)))
+        return h
+
+    def routeNodes(self, source, target, potential=None):
+        """
+        A* between two node indexes.
+        Returns:
+            (list of node indexes, cost, expanded)
+        """
+        if self.version != self.graph.version:
+            self._refresh()
+        cost, parents, expanded = astar(self.offsets, self.targets, self.weights, source, target,
+                                        potential or self.potential(target))
+        if cost == INF:
+            return [], cost, expanded
+        return tracePath(parents, target), cost, expanded
+
+    def routeBidirectional(self, source, target, bounds=True):
+        """
+        Bidirectional A* (or Dijkstra with bounds=False) between two node
+        indexes. It uses the haversine bounds, the landmark bound only works
+        toward a target.
+        Returns:
+            (list of node indexes, cost, expanded)
+        """
+        if self.version != self.graph.version:
+            self._refresh()
+        if self._reverse is None:
+            self._reverse = tuple(memoryview(np.ascontiguousarray(a)) for a in self.graph.reverse())
+        toTarget = self.geoPotential(target) if bounds else None
+        fromSource = self.geoPotential(source) if bounds else None
+        cost, meet, forward, backward, expanded = bidirectionalAstar(
+            (self.offsets, self.targets, self.weights), self._reverse, source, target, toTarget, fromSource)
+        if meet == -1:
+            return [], cost, expanded
+        path = tracePath(forward, meet)
+        u = backward[meet]
+        while u != -1:
+            path.append(u)
+            u = backward[u]
+        return path, cost, expanded
+
+    def route(self, start, end):
+        """
+        Shortest route between two segment ids or (lat, lon) points.
+        Returns:
+            A Route with the path as segment ids.
+        """
+        path, cost, expanded = self.routeNodes(self.resolve(start), self.resolve(end))
+        return Route([int(self.graph.ids[u]) for u in path], cost, expanded)
+
+
+def parsePoint(text):
+    """
+    "lat,lon" text as a (lat, lon) tuple, anything else as a segment id
+    """
+    if ',' in text:
+        lat, lon = text.split(',')
+        return (float(lat), float(lon))
+    return int(text)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    router = RoadRouter(loadRoadGraph('nodes.csv', 'edges.csv', 'roadgraph.bin'))
+    begin = time.perf_counter()
+    route = router.route(parsePoint(sys.argv[1]), parsePoint(sys.argv[2]))
+    seconds = time.perf_counter() - begin
+    print('cost %.3f, %d segments, %d nodes expanded in %.2f ms' %
+          (route.cost, len(route.path), route.expanded, seconds * 1000.0))
+    print(' '.join(map(str, route.path)))
@@ -0,0 +1,269 @@
+"""
+@author - Christopher Silva
+@description - Snaps GPS fixes to the nearest road segment. Segments are
+treated as straight lines between their end points (nodes.csv columns 2-5)
+and filed in a uniform lat/lon grid under every cell their bounding box
+touches. A lookup checks the rings of cells around the fix, nearest first,
+until no unchecked cell can hold anything closer, and projects the fix onto
+each candidate. Distances use a flat projection around the fix (east-west
+degrees shrunk by the cosine of its latitude), which is plenty for the
+short hops involved.
+
+The batch call does every step for all fixes at once with numpy. The same
+segments are also filed in coarser grids, each with cells four times wider,
+up to one a cell or two across. A fix starts on the finest grid with roads a
+few rings away and moves to the next coarser one when a few rings there find
+nothing, so fixes far from any road widen their search in big cells instead
+of comparing with every segment. The rings stop at the extent of the roads,
+so an answer always comes back.
+
+Usage:
+    python snapping.py lat,lon [lat,lon ...]
+"""
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from roadgraph import EARTH_RADIUS_KM, haversineKm, loadRoadGraph
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180.0
+
+#node is the segment's node index (-1 if the graph is empty), segmentId its
+#id, lat/lon the point on it closest to the fix, fraction how far along it
+#that point is (0 at the start point, 1 at the end point), offset the same in
+#the units of the length column and distance the km from the fix
+Snap = namedtuple('Snap', ['node', 'segmentId', 'lat', 'lon', 'fraction', 'offset', 'distance'])
+
+
+class _CellGrid:
+    """
+    Grid of cellSize degree cells. keys is the sorted key of every non empty
+    cell and the segments filed under keys[i] are
+    segments[starts[i]:starts[i+1]]. rows and cols are the lowest and highest
+    row and column any segment touches.
+    """
+    def __init__(self, graph, cellSize):
+        self.cellSize = cellSize
+        lat1, lon1, lat2, lon2 = graph.lat1, graph.lon1, graph.lat2, graph.lon2
+        rowLow, colLow = self.cells(np.minimum(lat1, lat2), np.minimum(lon1, lon2))
+        rowHigh, colHigh = self.cells(np.maximum(lat1, lat2), np.maximum(lon1, lon2))
+        rows = rowHigh - rowLow + 1
+        cols = colHigh - colLow + 1
+        counts = rows * cols
+        #one (cell, segment) pair for every cell a segment's box touches
+        segment = np.repeat(np.arange(graph.nodeCount, dtype=np.int32), counts)
+        within = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        row = np.repeat(rowLow, counts) + within // np.repeat(cols, counts)
+        col = np.repeat(colLow, counts) + within % np.repeat(cols, counts)
+        keys = self.key(row, col)
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+        self.segments = segment[order]
+        first = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.keys = keys[first]
+        self.starts = np.r_[first, len(keys)].astype(np.int64)
+        if graph.nodeCount:
+            self.rows = (int(rowLow.min()), int(rowHigh.max()))
+            self.cols = (int(colLow.min()), int(colHigh.max()))
+        else:
+            self.rows = self.cols = (0, 0)
+
+    def cells(self, lat, lon):
+        return (np.floor(np.asarray(lat) / self.cellSize).astype(np.int64),
+                np.floor(np.asarray(lon) / self.cellSize).astype(np.int64))
+
+    @staticmethod
+    def key(row, col):
+        return row * (1 << 32) + col
+
+    def rings(self, row, col):
+        #(nearest, farthest) ring around each cell that reaches the grid's
+        #extent, every filed segment is seen by the time farthest is checked
+        rowLow, rowHigh = self.rows
+        colLow, colHigh = self.cols
+        nearest = np.maximum(np.maximum(rowLow - row, row - rowHigh), np.maximum(colLow - col, col - colHigh))
+        farthest = np.maximum(np.maximum(row - rowLow, rowHigh - row), np.maximum(col - colLow, colHigh - col))
+        return np.maximum(nearest, 0), farthest
+
+    def candidates(self, fixes, row, col, ring):
+        #(fix, segment) pairs for every segment in the cells of ring[i] around
+        #fixes[i], grouped by fix
+        owners, keys = [], []
+        for r in np.unique(ring):
+            at = ring == r
+            if r == 0:
+                offsets = np.zeros((1, 2), dtype=np.int64)
+            else:
+                side = np.arange(-r, r + 1)
+                offsets = np.concatenate([np.stack([np.full(len(side), -r), side], 1),
+                                          np.stack([np.full(len(side), r), side], 1),
+                                          np.stack([side[1:-1], np.full(len(side) - 2, -r)], 1),
+                                          np.stack([side[1:-1], np.full(len(side) - 2, r)], 1)])
+            keys.append(self.key((row[at, None] + offsets[:, 0]).ravel(), (col[at, None] + offsets[:, 1]).ravel()))
+            owners.append(np.repeat(fixes[at], len(offsets)))
+        owner = np.concatenate(owners)
+        keys = np.concatenate(keys)
+        slot = np.searchsorted(self.keys, keys)
+        slot[slot == len(self.keys)] = 0
+        hit = self.keys[slot] == keys
+        slot = slot[hit]
+        owner = owner[hit]
+        first = self.starts[slot]
+        lengths = self.starts[slot + 1] - first
+        total = int(lengths.sum())
+        positions = np.repeat(first - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return np.repeat(owner, lengths), self.segments[positions]
+
+
+class SegmentIndex:
+    """
+    levels[0] is a _CellGrid of cellSize degree cells and each next level
+    has cells LEVEL_FACTOR times wider, up to one whose extent is a cell or
+    two across. keys is the finest level's.
+    """
+    #rings searched at one level with nothing found before moving the fix
+    #to the next coarser one
+    MAX_RING = 3
+    LEVEL_FACTOR = 4
+
+    def __init__(self, graph, cellSize=0.01):
+        self.graph = graph
+        self.cellSize = cellSize
+        self.levels = [_CellGrid(graph, cellSize)]
+        while True:
+            top = self.levels[-1]
+            if top.rows[1] - top.rows[0] <= 1 and top.cols[1] - top.cols[0] <= 1:
+                break
+            self.levels.append(_CellGrid(graph, top.cellSize * self.LEVEL_FACTOR))
+        self.keys = self.levels[0].keys
+
+    def _project(self, lat, lon, segment):
+        #(squared flat km, fraction) from each fix to the matching segment
+        g = self.graph
+        scale = np.cos(np.radians(lat))
+        ax = (g.lon1[segment] - lon) * scale
+        ay = g.lat1[segment] - lat
+        dx = (g.lon2[segment] - g.lon1[segment]) * scale
+        dy = g.lat2[segment] - g.lat1[segment]
+        length2 = dx * dx + dy * dy
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fraction = np.where(length2 > 0, -(ax * dx + ay * dy) / length2, 0.0)
+        fraction = np.clip(fraction, 0.0, 1.0)
+        px = ax + fraction * dx
+        py = ay + fraction * dy
+        return (px * px + py * py) * KM_PER_DEGREE ** 2, fraction
+
+    @staticmethod
+    def _keepBest(fix, dist, fraction, segment, best, bestFraction, bestSegment):
+        #folds candidate (fix, dist) pairs, grouped by fix, into the per fix
+        #best arrays
+        if len(fix) == 0:
+            return
+        starts = np.flatnonzero(np.r_[True, fix[1:] != fix[:-1]])
+        group = np.cumsum(np.r_[True, fix[1:] != fix[:-1]]) - 1
+        low = np.minimum.reduceat(dist, starts)
+        #first candidate of each group reaching the group's minimum
+        hits = np.flatnonzero(dist == low[group])
+        hits = hits[np.r_[True, group[hits][1:] != group[hits][:-1]]]
+        fix, dist = fix[hits], dist[hits]
+        better = dist < best[fix]
+        fix = fix[better]
+        hits = hits[better]
+        best[fix] = dist[better]
+        bestFraction[fix] = fraction[hits]
+        bestSegment[fix] = segment[hits]
+
+    def snapMany(self, lat, lon):
+        """
+        Snaps arrays of fixes.
+        Returns:
+            (nodes, lat, lon, fraction, offset, distance km) arrays, one entry
+            per fix, see Snap.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        n = len(lat)
+        best = np.full(n, np.inf)
+        bestFraction = np.zeros(n)
+        bestSegment = np.full(n, -1, dtype=np.int64)
+        levels = self.levels
+        shrink = np.minimum(1.0, np.cos(np.radians(lat)))
+        #each fix starts on the finest level with the roads a few rings away
+        level = np.zeros(n, dtype=np.int64)
+        farther = np.arange(n)
+        for k in range(len(levels) - 1):
+            nearest, _ = levels[k].rings(*levels[k].cells(lat[farther], lon[farther]))
+            farther = farther[nearest > self.MAX_RING]
+            if not len(farther):
+                break
+            level[farther] = k + 1
+        #cell, ring searched next, first ring, last ring and flat km from the
+        #fix to the outside of its first ring of cells, on the fix's level
+        row = np.zeros(n, dtype=np.int64)
+        col = np.zeros(n, dtype=np.int64)
+        ring = np.zeros(n, dtype=np.int64)
+        farthest = np.zeros(n, dtype=np.int64)
+        edge = np.zeros(n)
+
+        def place(fixes, k):
+            grid = levels[k]
+            level[fixes] = k
+            row[fixes], col[fixes] = grid.cells(lat[fixes], lon[fixes])
+            ring[fixes], farthest[fixes] = grid.rings(row[fixes], col[fixes])
+            edge[fixes] = grid.cellSize * KM_PER_DEGREE * shrink[fixes]
+
+        for k in np.unique(level):
+            place(np.flatnonzero(level == k), k)
+        first = ring.copy()
+        pending = np.arange(n) if len(self.keys) else np.arange(0)
+        while len(pending):
+            still = []
+            for k in np.flatnonzero(np.bincount(level[pending])):
+                fixes = pending[level[pending] == k]
+                fix, segment = levels[k].candidates(fixes, row[fixes], col[fixes], ring[fixes])
+                dist, fraction = self._project(lat[fix], lon[fix], segment)
+                self._keepBest(fix, dist, fraction, segment, best, bestFraction, bestSegment)
+                #anything not seen yet lies outside the rings checked so far,
+                #and past the farthest ring there is nothing left to see
+                fixes = fixes[(best[fixes] > (ring[fixes] * edge[fixes]) ** 2) & (ring[fixes] < farthest[fixes])]
+                ring[fixes] += 1
+                #nothing found yet, the rest of the search is cheaper in
+                #bigger cells
+                up = fixes[np.isinf(best[fixes]) & (ring[fixes] > first[fixes] + self.MAX_RING)]
+                if len(up) and k + 1 < len(levels):
+                    place(up, k + 1)
+                    first[up] = ring[up]
+                still.append(fixes)
+            pending = np.sort(np.concatenate(still)) if len(still) > 1 else still[0]
+
+        g = self.graph
+        found = bestSegment >= 0
+        seg = np.where(found, bestSegment, 0)
+        snapLat = np.where(found, g.lat1[seg] + bestFraction * (g.lat2[seg] - g.lat1[seg]), np.nan)
+        snapLon = np.where(found, g.lon1[seg] + bestFraction * (g.lon2[seg] - g.lon1[seg]), np.nan)
+        offset = np.where(found, bestFraction * g.length[seg], np.nan)
+        distance = np.where(found, haversineKm(lat, lon, snapLat, snapLon), np.inf)
+        return bestSegment, snapLat, snapLon, bestFraction, offset, distance
+
+    def snap(self, lat, lon):
+        """
+        Snaps one fix.
+        Returns:
+            A Snap.
+        """
+        nodes, snapLat, snapLon, fraction, offset, distance = self.snapMany([lat], [lon])
+        node = int(nodes[0])
+        segmentId = int(self.graph.ids[node]) if node >= 0 else -1
+        return Snap(node, segmentId, float(snapLat[0]), float(snapLon[0]), float(fraction[0]),
+                    float(offset[0]), float(distance[0]))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    index = SegmentIndex(loadRoadGraph('nodes.csv', 'edges.csv', 'roadgraph.bin'))
+    for text in sys.argv[1:]:
+        lat, lon = (float(v) for v in text.split(','))
+        print(index.snap(lat, lon))
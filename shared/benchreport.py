@@ -0,0 +1,91 @@
+"""
+@author - Christopher Silva
+@description - The json reports the benchmark suites of NoGisAstar and
+ProjAstar-1 write, and the comparison of two of them. The grid results are
+named by size, workload and search and the road results by workload and
+search, each with its own key for the p50, p95 and expansions, so the
+comparison takes those names as arguments.
+"""
+import json
+import platform
+import subprocess
+
+
+def percentile(values, p):
+    """
+    Percentile p of a list of values, interpolated like numpy's
+    """
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def gitCommit():
+    """
+    The commit the code being measured is at, None outside a git checkout
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def writeReport(suite, results, outputPath=None, **fields):
+    """
+    The report of one suite run: its results, the commit, python and machine
+    they were measured on and any other fields, written as json to
+    outputPath when one is given.
+    Returns:
+        The report as a dict.
+    """
+    report = {"suite": suite, "commit": gitCommit(), "python": platform.python_version(),
+              "machine": platform.machine(), "results": results}
+    report.update(fields)
+    if outputPath:
+        with open(outputPath, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("results written to %s" % outputPath)
+    return report
+
+
+def compareResults(oldPath, newPath, columns, metrics, threshold=0.1, noiseMs=0.0):
+    """
+    Prints the p50 and p95 latencies and mean expansions of every search in
+    two reports side by side, flagging any whose p50 got more than threshold
+    (and noiseMs) slower.
+    Args:
+        columns: (key, width) of each field naming a result, e.g.
+            (("workload", 8), ("search", 12)).
+        metrics: the keys of the p50 ms, p95 ms and mean expansions.
+    Returns:
+        The number flagged.
+    """
+    with open(oldPath, 'r') as f:
+        old = json.load(f)
+    with open(newPath, 'r') as f:
+        new = json.load(f)
+    names = [key for key, _ in columns]
+    label = " ".join("%%-%ds" % width for _, width in columns)
+    p50, p95, expanded = metrics
+    before = dict((tuple(r[key] for key in names), r) for r in old["results"])
+    print("%s -> %s" % (old.get("commit"), new.get("commit")))
+    print(label % tuple(names) + " %10s %10s %8s %10s %10s %8s" %
+          ("old p50", "new p50", "ratio", "old p95", "new p95", "expand"))
+    flagged = 0
+    for r in new["results"]:
+        name = tuple(r[key] for key in names)
+        o = before.get(name)
+        if o is None:
+            print(label % name + " %10s %10.3f   (new)" % ("-", r[p50]))
+            continue
+        ratio = r[p50] / o[p50] if o[p50] else float('inf')
+        slower = ratio > 1.0 + threshold and r[p50] - o[p50] > noiseMs
+        flagged += slower
+        print(label % name + " %10.3f %10.3f %7.2fx %10.3f %10.3f %7.2fx%s" %
+              (o[p50], r[p50], ratio, o[p95], r[p95],
+               r[expanded] / o[expanded] if o[expanded] else float('inf'),
+               "  SLOWER" if slower else ""))
+    return flagged
@@ -0,0 +1,107 @@
+"""
+@author - Christopher Silva
+@description - Polygons around a set of points or grid cells, used by the
+isochrones of NoGisAstar and ProjAstar-1: the convex hull of the points, or
+the outline of the union of the cells, which follows the shape of the area
+instead of spanning its gaps. Both come back as (k, 2) corner arrays,
+counter clockwise.
+"""
+import numpy as np
+
+
+def convexHull(x, y):
+    """
+    Corners of the convex hull of points (x, y), counter clockwise, as a
+    (k, 2) array of (x, y). Fewer than three distinct points come back as
+    they are.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(x) == 0:
+        return np.empty((0, 2), dtype=x.dtype)
+    #only the lowest and highest point of each x can be a corner
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+    split = np.flatnonzero(x[1:] != x[:-1]) + 1
+    keep = np.r_[0, split, split - 1, len(x) - 1]
+    points = np.unique(np.column_stack([x[keep], y[keep]]), axis=0)
+    if len(points) < 3:
+        return points
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    #Andrew's monotone chain, the points are already sorted by x then y
+    lower = []
+    upper = []
+    for p in points.tolist():
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(points.tolist()):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+#direction of each boundary edge leaving a corner, turning right before
+#going straight before turning left
+_RIGHT = {(1, 0): (0, -1), (0, 1): (1, 0), (-1, 0): (0, 1), (0, -1): (-1, 0)}
+
+
+def cellOutline(cellX, cellY):
+    """
+    Outline of the union of unit cells (cellX[i], cellY[i]) as integer
+    corners, counter clockwise. Cells that only touch at a corner stay in
+    one outline, holes are left out and of several separate pieces the one
+    with the largest area is returned.
+    Returns:
+        A (k, 2) array of (x, y) corners.
+    """
+    cells = set(zip(np.asarray(cellX).tolist(), np.asarray(cellY).tolist()))
+    if not cells:
+        return np.empty((0, 2), dtype=np.int64)
+    #boundary edges with the cell on their left, start corner -> directions
+    edges = {}
+    for x, y in cells:
+        if (x, y - 1) not in cells:
+            edges.setdefault((x, y), []).append((1, 0))
+        if (x + 1, y) not in cells:
+            edges.setdefault((x + 1, y), []).append((0, 1))
+        if (x, y + 1) not in cells:
+            edges.setdefault((x + 1, y + 1), []).append((-1, 0))
+        if (x - 1, y) not in cells:
+            edges.setdefault((x, y + 1), []).append((0, -1))
+
+    best = None
+    bestArea = 0.0
+    #every ring starts at its lowest corner, taken in order
+    for corner in sorted(edges):
+        if corner not in edges:
+            continue
+        direction = None
+        ring = []
+        while True:
+            choices = edges.get(corner)
+            if not choices:
+                break
+            if direction is None or len(choices) == 1:
+                step = choices[0]
+            else:
+                right = _RIGHT[direction]
+                left = (-right[0], -right[1])
+                step = next(d for d in (right, direction, left) if d in choices)
+            choices.remove(step)
+            if not choices:
+                del edges[corner]
+            if step != direction:
+                ring.append(corner)
+            direction = step
+            corner = (corner[0] + step[0], corner[1] + step[1])
+        ring = np.array(ring, dtype=np.int64)
+        x, y = ring[:, 0], ring[:, 1]
+        area = 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+        if area > bestArea:
+            best, bestArea = ring, area
+    return best if best is not None else np.empty((0, 2), dtype=np.int64)
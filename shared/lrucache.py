@@ -0,0 +1,80 @@
+"""
+@author - Christopher Silva
+@description - Least recently used cache under a memory budget, shared by
+the route caches of NoGisAstar and ProjAstar-1. The folders are run from
+their own directories, so the modules that use it add this folder to
+sys.path before importing it.
+"""
+from collections import OrderedDict
+
+#bytes every entry costs besides its value (key tuple, dict and order slots)
+ENTRY_BYTES = 240
+
+
+class LRUCache:
+    """
+    Least recently used mapping of key -> value under a budget of maxBytes,
+    the size of each value given when it is stored. Hits, misses, evictions
+    and invalidations are counted for monitoring.
+    """
+    def __init__(self, maxBytes=64 << 20):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        The value stored under key (now the most recently used), or None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value, size):
+        """
+        Stores value under key, dropping the least recently used entries
+        until the cache fits its budget. size is the value's size, the
+        entry's own overhead is added to it. A value bigger than the whole
+        budget is not kept.
+        """
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        size += ENTRY_BYTES
+        if size > self.maxBytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.maxBytes:
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self.bytes -= dropped
+            self.evictions += 1
+
+    def invalidate(self):
+        """
+        Drops every entry
+        """
+        self._entries.clear()
+        self.bytes = 0
+        self.invalidations += 1
+
+    def stats(self):
+        """
+        The counters as a dict, e.g. for a metrics endpoint
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self.bytes, "maxBytes": self.maxBytes,
+                "hits": self.hits, "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations}